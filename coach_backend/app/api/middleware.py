@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import time
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth.deps import admin_from_token
+from app.core.telemetry import RequestStats, request_stats_var, route_metrics
+from app.db.pool_metrics import db_holder_var
+from app.db.session import SessionLocal
+from app.services import profiling
+
+
+class RequestTelemetryMiddleware:
+    """
+    Telemetría de cada petición: latencia por ruta, status y consultas / tiempo
+    en Postgres (los suma db/query_metrics.py en el RequestStats de la petición).
+    También asocia la petición a las conexiones que saca del pool (ver
+    db/pool_metrics.py). Guarda el scope y no la ruta: la ruta aún no se ha
+    resuelto aquí, y el router la deja en el mismo scope.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        holder_token = db_holder_var.set(scope)
+        stats_token = request_stats_var.set(stats)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - t0
+            request_stats_var.reset(stats_token)
+            db_holder_var.reset(holder_token)
+            route = scope.get("route")
+            # sin ruta (404) se agrupa todo: la URL no sirve de etiqueta
+            path = getattr(route, "path", None) or "<unmatched>"
+            route_metrics.observe(scope["method"], path, status, elapsed, stats)
+
+
+def _wants_profile(scope: Scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value not in (b"", b"0")
+    query = scope["query_string"]
+    return b"profile=" in query and parse_qs(query.decode("latin-1")).get("profile", ["0"])[-1] not in ("", "0")
+
+
+def _admin_request(scope: Scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return False
+            with SessionLocal() as db:
+                return admin_from_token(db, token) is not None
+    return False
+
+
+def _athlete_id(scope: Scope) -> int | None:
+    value = scope.get("path_params", {}).get("athlete_id")
+    if value is None:
+        value = parse_qs(scope["query_string"].decode("latin-1")).get("athlete_id", [None])[-1]
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    Perfil bajo demanda (services/profiling.py) de la petición de un admin con
+    `X-Profile: 1` o `?profile=1`. Se guarda al empezar la respuesta, cuando ya se
+    conocen la ruta y el atleta, y su nombre vuelve en X-Profile-Id. Sin la cabecera
+    ni el parámetro solo se miran las cabeceras; un no admin que lo pida recibe la
+    respuesta normal, sin perfil.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not _wants_profile(scope) or not await run_in_threadpool(_admin_request, scope):
+            await self.app(scope, receive, send)
+            return
+
+        s = profiling.request_sampler()
+        saved = False
+
+        def finish() -> str | None:
+            nonlocal saved
+            saved = True
+            s.stop()
+            route = scope.get("route")
+            label = f'{scope["method"]} {getattr(route, "path", None) or "<unmatched>"}'
+            return profiling.save(s, label, _athlete_id(scope))
+
+        async def send_with_profile(message: Message) -> None:
+            if message["type"] == "http.response.start" and not saved:
+                name = finish()
+                if name is not None:
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", name.encode())]}
+            await send(message)
+
+        token = profiling.profiling_var.set(True)
+        try:
+            with s:
+                await self.app(scope, receive, send_with_profile)
+        finally:
+            profiling.profiling_var.reset(token)
+            if not saved:
+                finish()
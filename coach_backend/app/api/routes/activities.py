@@ -1,100 +1,168 @@
 from __future__ import annotations
 
-from datetime import date
+import base64
+import json
+from datetime import date, datetime
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select, and_, desc
+from sqlalchemy import select, and_, desc, tuple_
 
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 from app.models.activity import Activity
 from app.schemas.activity_write import ActivityCreate, ActivityPatch
+from app.services.activity_fields import activity_to_dict, afetch_dicts, fetch_dicts, parse_fields, select_fields
+from app.services.data_version import DataVersion, async_athlete_data_version, athlete_data_version
 from app.services.metrics_calculator import compute_activity_day  # ya lo tienes
+from app.services.dirty_days import mark_dirty
+from app.services.mean_max import move_activity_curve
+from app.services.response_cache import get_response_cache, invalidate_on_commit
+from app.services.zones import rollup_days
 
 
 router = APIRouter(tags=["activities"])
 
 
-def activity_to_dict(a: Activity) -> dict[str, Any]:
-    """Devuelve TODOS los campos del modelo Activity"""
-    return {c.name: getattr(a, c.name) for c in a.__table__.columns}
+def encode_cursor(start_date: datetime, activity_id: int) -> str:
+    """Cursor opaco de paginación: (start_date, id) de la última fila de la página."""
+    raw = json.dumps([start_date.isoformat(), activity_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        start_date, activity_id = json.loads(raw)
+        start = datetime.fromisoformat(start_date)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="cursor no válido")
+    # un cursor editado a mano que aún se decodifica no debe acabar en un 500 de la
+    # BD: id BIGINT positivo y start_date sin zona, como la columna
+    if type(activity_id) is not int or not 0 < activity_id < 2**63 or start.tzinfo is not None:
+        raise HTTPException(status_code=400, detail="cursor no válido")
+    return start, activity_id
+
+
+FIELDS_DESCRIPTION = "Columnas separadas por comas (p. ej. id,name,start_date,tss). Sin fields: todas."
+
+
+def _fields(fields: str | None) -> tuple[str, ...]:
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/athletes/{athlete_id}/activities")
-def list_activities(
+async def list_activities(
     athlete_id: int,
     from_day: date | None = Query(default=None),
     to_day: date | None = Query(default=None),
     limit: int = Query(default=50, ge=1, le=500),
-    offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
+    offset: int = Query(default=0, ge=0, description="Obsoleto: usar cursor"),
+    cursor: str | None = Query(default=None, description="next_cursor de la página anterior"),
+    fields: str | None = Query(default=None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
+    version: DataVersion = Depends(async_athlete_data_version),
 ):
-    q = (
-        select(Activity)
-        .where(Activity.athlete_id == athlete_id)
-    )
+    """
+    Actividades de la más nueva a la más antigua. Paginación por cursor (keyset
+    sobre (start_date, id), índice idx_activities_athlete_start_date_id): cada
+    página cuesta lo mismo sea cual sea su profundidad. `offset` se mantiene por
+    compatibilidad y se ignora si viene `cursor`.
+
+    Solo se leen las columnas de `fields` (SELECT Core, sin objetos ORM) y la
+    respuesta se serializa con orjson (y se cachea, ver services/response_cache.py).
+    Ruta async: sesión async y sin pasar por el threadpool.
+    """
+    names = _fields(fields)
+    # el cursor necesita start_date e id aunque no se pidan
+    extra = [n for n in ("start_date", "id") if n not in names]
+    q = select_fields((*names, *extra)).where(Activity.athlete_id == athlete_id)
 
     if from_day:
         q = q.where(Activity.day >= from_day)
     if to_day:
         q = q.where(Activity.day <= to_day)
 
+    if cursor:
+        after_start, after_id = decode_cursor(cursor)
+        q = q.where(tuple_(Activity.start_date, Activity.id) < tuple_(after_start, after_id))
+        offset = 0
+
+    # una fila de más para saber si hay página siguiente
     q = (
-        q.order_by(desc(Activity.start_date))
-        .limit(limit)
+        q.order_by(desc(Activity.start_date), desc(Activity.id))
+        .limit(limit + 1)
         .offset(offset)
     )
 
-    rows = db.execute(q).scalars().all()
-
-    return {
-        "athlete_id": athlete_id,
-        "count": len(rows),
-        "limit": limit,
-        "offset": offset,
-        "from_day": str(from_day) if from_day else None,
-        "to_day": str(to_day) if to_day else None,
-        "activities": [activity_to_dict(a) for a in rows],
+    async def build() -> dict[str, Any]:
+        rows = await afetch_dicts(db, q)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["start_date"], rows[-1]["id"]) if has_more else None
+        for row in rows:
+            for n in extra:
+                del row[n]
+
+        return {
+            "athlete_id": athlete_id,
+            "count": len(rows),
+            "limit": limit,
+            "offset": offset,
+            "from_day": str(from_day) if from_day else None,
+            "to_day": str(to_day) if to_day else None,
+            "next_cursor": next_cursor,
+            "activities": rows,
+        }
+
+    params = {
+        "v": version.version, "from": from_day, "to": to_day, "limit": limit, "offset": offset,
+        "cursor": cursor, "fields": ",".join(names),
     }
+    return await get_response_cache().aresponse(athlete_id, "activities", params, build, version.headers)
+
+
+def _one(db: Session, q, headers: dict[str, str] | None = None) -> ORJSONResponse:
+    rows = fetch_dicts(db, q.limit(1))
+    if not rows:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    return ORJSONResponse(rows[0], headers=headers)
 
 
 @router.get("/activities/{activity_id}")
 def get_activity(
     activity_id: int,
+    fields: str | None = Query(default=None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db),
 ):
     """
-    Devuelve una actividad por ID interno (activities.id) con TODOS los campos.
+    Devuelve una actividad por ID interno (activities.id) con TODOS los campos
+    (o los de `fields`).
     """
-    a = db.get(Activity, activity_id)
-    if not a:
-        raise HTTPException(status_code=404, detail="Activity not found")
-    return activity_to_dict(a)
+    return _one(db, select_fields(_fields(fields)).where(Activity.id == activity_id))
 
 
 @router.get("/athletes/{athlete_id}/activities/{strava_activity_id}")
-def get_activity(
+def get_athlete_activity(
     athlete_id: int,
     strava_activity_id: int,
+    fields: str | None = Query(default=None, description=FIELDS_DESCRIPTION),
     db: Session = Depends(get_db),
+    version: DataVersion = Depends(athlete_data_version),
 ):
     q = (
-        select(Activity)
+        select_fields(_fields(fields))
         .where(
             Activity.athlete_id == athlete_id,
             Activity.strava_activity_id == strava_activity_id,
         )
     )
-
-    a = db.execute(q).scalars().first()
-    if not a:
-        raise HTTPException(status_code=404, detail="Activity not found")
-
-    return activity_to_dict(a)
-
-def activity_to_dict(a: Activity) -> dict[str, Any]:
-    return {c.name: getattr(a, c.name) for c in a.__table__.columns}
+    return _one(db, q, version.headers)
 
 
 @router.post("/athletes/{athlete_id}/activities")
@@ -150,6 +218,8 @@ def create_activity(
     a.day = compute_activity_day(a)
 
     db.add(a)
+    mark_dirty(db, athlete_id, [a.day])
+    invalidate_on_commit(db, athlete_id)
     db.commit()
     db.refresh(a)
 
@@ -172,6 +242,7 @@ def patch_activity(
         raise HTTPException(status_code=404, detail="Activity not found")
 
     data = payload.model_dump(exclude_unset=True)
+    old_day = a.day
 
     # Aplicar cambios campo a campo (solo lo que venga)
     for k, v in data.items():
@@ -182,6 +253,13 @@ def patch_activity(
         a.day = compute_activity_day(a)
 
     db.add(a)
+    mark_dirty(db, athlete_id, [old_day, a.day])
+    if a.day != old_day:
+        # las envolventes mensuales de curvas y daily_zones van por día de la actividad
+        db.flush()
+        move_activity_curve(db, athlete_id, [old_day, a.day])
+        rollup_days(db, athlete_id, [old_day, a.day])
+    invalidate_on_commit(db, athlete_id)
     db.commit()
     db.refresh(a)
 
@@ -1,7 +1,5 @@
 from __future__ import annotations
 
-from typing import Any
-
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import select
@@ -9,16 +7,17 @@ from sqlalchemy import select
 from app.db.session import get_db
 from app.models.activity import Activity
 from app.schemas.activity_write import ActivityCreate, ActivityPatch
+from app.services.activity_fields import activity_to_dict
 from app.services.metrics_calculator import compute_activity_day  # ya lo tienes
+from app.services.dirty_days import mark_dirty
+from app.services.mean_max import move_activity_curve
+from app.services.response_cache import invalidate_on_commit
+from app.services.zones import rollup_days
 
 
 router = APIRouter(tags=["activities-write"])
 
 
-def activity_to_dict(a: Activity) -> dict[str, Any]:
-    return {c.name: getattr(a, c.name) for c in a.__table__.columns}
-
-
 @router.post("/athletes/{athlete_id}/activities")
 def create_activity(
     athlete_id: int,
@@ -72,6 +71,8 @@ def create_activity(
     a.day = compute_activity_day(a)
 
     db.add(a)
+    mark_dirty(db, athlete_id, [a.day])
+    invalidate_on_commit(db, athlete_id)
     db.commit()
     db.refresh(a)
 
@@ -94,6 +95,7 @@ def patch_activity(
         raise HTTPException(status_code=404, detail="Activity not found")
 
     data = payload.model_dump(exclude_unset=True)
+    old_day = a.day
 
     # Aplicar cambios campo a campo (solo lo que venga)
     for k, v in data.items():
@@ -104,6 +106,13 @@ def patch_activity(
         a.day = compute_activity_day(a)
 
     db.add(a)
+    mark_dirty(db, athlete_id, [old_day, a.day])
+    if a.day != old_day:
+        # las envolventes mensuales de curvas y daily_zones van por día de la actividad
+        db.flush()
+        move_activity_curve(db, athlete_id, [old_day, a.day])
+        rollup_days(db, athlete_id, [old_day, a.day])
+    invalidate_on_commit(db, athlete_id)
     db.commit()
     db.refresh(a)
 
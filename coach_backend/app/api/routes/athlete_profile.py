@@ -1,19 +1,30 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, func
 
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
+from app.models.activity import Activity
 from app.models.athlete_profile import AthleteProfile
+from app.services.data_version import DataVersion, async_athlete_data_version
+from app.services.dirty_days import mark_dirty
+from app.services.jobs import KIND_REZONE, enqueue
+from app.services.response_cache import invalidate_on_commit
+from app.services.zones import ZONE_THRESHOLDS
 from app.schemas.athlete_profile import AthleteProfileUpsert, AthleteProfileOut
 
 router = APIRouter(prefix="/athletes", tags=["athlete-profile"])
 
 
 @router.get("/{athlete_id}/profile", response_model=AthleteProfileOut)
-def get_profile(athlete_id: int, db: Session = Depends(get_db)):
-    row = db.get(AthleteProfile, athlete_id)
+async def get_profile(
+    athlete_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    _version: DataVersion = Depends(async_athlete_data_version),
+):
+    row = await db.get(AthleteProfile, athlete_id)
     if not row:
         raise HTTPException(status_code=404, detail="athlete_profile no existe")
     return AthleteProfileOut(
@@ -22,6 +33,8 @@ def get_profile(athlete_id: int, db: Session = Depends(get_db)):
         lthr_bpm=row.lthr_bpm,
         threshold_pace_sec_per_km=row.threshold_pace_sec_per_km,
         target_weekly_tss=row.target_weekly_tss,
+        ctl_time_constant=row.ctl_time_constant,
+        atl_time_constant=row.atl_time_constant,
         name=row.name,
         surname1=row.surname1,
         surname2=row.surname2,
@@ -39,6 +52,20 @@ def upsert_profile(athlete_id: int, payload: AthleteProfileUpsert, db: Session =
     if row is None:
         row = AthleteProfile(athlete_id=athlete_id)
 
+    # Si cambian los umbrales o las constantes de tiempo cambia todo el histórico
+    thresholds = (
+        "ftp_watts", "lthr_bpm", "threshold_pace_sec_per_km",
+        "ctl_time_constant", "atl_time_constant",
+    )
+    thresholds_changed = any(
+        getattr(payload, f) is not None and getattr(payload, f) != getattr(row, f)
+        for f in thresholds
+    )
+    zones_changed = any(
+        getattr(payload, f) is not None and getattr(payload, f) != getattr(row, f)
+        for f in ZONE_THRESHOLDS.values()
+    )
+
     # Solo actualiza campos que vengan en el request (None => no cambia)
     if payload.ftp_watts is not None:
         row.ftp_watts = payload.ftp_watts
@@ -48,15 +75,32 @@ def upsert_profile(athlete_id: int, payload: AthleteProfileUpsert, db: Session =
         row.threshold_pace_sec_per_km = payload.threshold_pace_sec_per_km
     if payload.target_weekly_tss is not None:
         row.target_weekly_tss = payload.target_weekly_tss
+    if payload.ctl_time_constant is not None:
+        row.ctl_time_constant = payload.ctl_time_constant
+    if payload.atl_time_constant is not None:
+        row.atl_time_constant = payload.atl_time_constant
+
+    if thresholds_changed:
+        first_day = db.execute(
+            select(func.min(Activity.day)).where(Activity.athlete_id == athlete_id)
+        ).scalar()
+        mark_dirty(db, athlete_id, [first_day])
 
     db.add(row)
+    invalidate_on_commit(db, athlete_id)
     db.commit()
     db.refresh(row)
 
+    # el tiempo en zona se recalcula desde los streams locales en el worker
+    if zones_changed:
+        enqueue(db, KIND_REZONE, athlete_id)
+
     return AthleteProfileOut(
         athlete_id=row.athlete_id,
         ftp_watts=row.ftp_watts,
         lthr_bpm=row.lthr_bpm,
         threshold_pace_sec_per_km=row.threshold_pace_sec_per_km,
         target_weekly_tss=row.target_weekly_tss,
+        ctl_time_constant=row.ctl_time_constant,
+        atl_time_constant=row.atl_time_constant,
     )
@@ -152,7 +152,7 @@ def link_athlete(
     db.add(AppUserAthlete(
         app_user_id=current_user.id,
         athlete_id=payload.athlete_id,
-        role=payload.role,
+        role="athlete",
     ))
     db.commit()
     return {"ok": True, "linked": True}
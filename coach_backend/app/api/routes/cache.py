@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+
+from app.auth.deps import require_admin
+from app.services.response_cache import get_response_cache
+
+router = APIRouter(prefix="/cache", tags=["cache"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/stats")
+def cache_stats():
+    """Aciertos / fallos / expulsiones y ocupación de la caché de respuestas de este proceso."""
+    return get_response_cache().stats()
+
+
+@router.post("/clear")
+def cache_clear():
+    cache = get_response_cache()
+    cache.backend.clear()
+    return cache.stats()
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.services.mean_max import curve_for_window
+
+router = APIRouter(tags=["curves"])
+
+
+@router.get("/athletes/{athlete_id}/curves")
+def get_curves(
+    athlete_id: int,
+    from_day: date | None = Query(default=None, description="YYYY-MM-DD"),
+    to_day: date | None = Query(default=None, description="YYYY-MM-DD"),
+    db: Session = Depends(get_db),
+):
+    """
+    Curvas de máximos medios (potencia, velocidad y ritmo de carrera) de 1 s a 5 h
+    entre from_day y to_day. Sin fechas: todo el histórico.
+    """
+    if from_day and to_day and from_day > to_day:
+        raise HTTPException(status_code=400, detail="from_day debe ser <= to_day")
+    return curve_for_window(db, athlete_id, from_day, to_day)
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
-from typing import Any
+from datetime import date
+from typing import Any, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import select, desc
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Date, select, desc, func, cast
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models.daily_metrics import DailyMetric
+from app.services.data_version import DataVersion, async_athlete_data_version
+from app.services.response_cache import get_response_cache
 
 router = APIRouter(tags=["daily-metrics"])
 
@@ -18,20 +22,135 @@ def daily_metrics_to_dict(dm: DailyMetric) -> dict[str, Any]:
 
 
 @router.get("/athletes/{athlete_id}/daily-metrics/latest")
-def get_latest_daily_metrics(
+async def get_latest_daily_metrics(
     athlete_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    version: DataVersion = Depends(async_athlete_data_version),
 ):
-    q = (
-        select(DailyMetric)
-        .where(DailyMetric.athlete_id == athlete_id)
-        .order_by(desc(DailyMetric.day))
-        .limit(1)
+    async def build():
+        q = (
+            select(DailyMetric)
+            .where(DailyMetric.athlete_id == athlete_id)
+            .order_by(desc(DailyMetric.day))
+            .limit(1)
+        )
+
+        dm = (await db.execute(q)).scalars().first()
+
+        if not dm:
+            raise HTTPException(status_code=404, detail="No daily_metrics found for athlete")
+
+        return daily_metrics_to_dict(dm)
+
+    return await get_response_cache().aresponse(
+        athlete_id, "daily-metrics/latest", {"v": version.version}, build, version.headers
     )
 
-    dm = db.execute(q).scalars().first()
 
-    if not dm:
-        raise HTTPException(status_code=404, detail="No daily_metrics found for athlete")
+# columnas de la serie y decimales al responder
+SERIES_COLUMNS = {"tss": 1, "ctl": 1, "atl": 1, "tsb": 1, "duration_s": 0, "work_kj": 1}
+
+
+def _last(col):
+    """Valor del último día del grupo."""
+    return func.array_agg(aggregate_order_by(col, DailyMetric.day.desc()))[1]
+
+
+def _series_query(athlete_id: int, from_day: date | None, to_day: date | None, resolution: str):
+    """
+    Serie de daily_metrics por día, semana (lunes) o mes. La agregación va en SQL:
+    tss / duración / trabajo suman, ctl y atl son los del último día del periodo
+    (el estado de carga al cerrarlo) y tsb es la media. El rango usa la PK
+    (athlete_id, day).
+    """
+    where = [DailyMetric.athlete_id == athlete_id]
+    if from_day is not None:
+        where.append(DailyMetric.day >= from_day)
+    if to_day is not None:
+        where.append(DailyMetric.day <= to_day)
+
+    if resolution == "day":
+        return (
+            select(
+                DailyMetric.day,
+                DailyMetric.tss,
+                DailyMetric.ctl,
+                DailyMetric.atl,
+                DailyMetric.tsb,
+                DailyMetric.duration_s,
+                DailyMetric.work_kj,
+            )
+            .where(*where)
+            .order_by(DailyMetric.day)
+        )
+
+    bucket = cast(func.date_trunc(resolution, DailyMetric.day), Date).label("day")
+    return (
+        select(
+            bucket,
+            func.sum(DailyMetric.tss).label("tss"),
+            _last(DailyMetric.ctl).label("ctl"),
+            _last(DailyMetric.atl).label("atl"),
+            func.avg(DailyMetric.tsb).label("tsb"),
+            func.sum(DailyMetric.duration_s).label("duration_s"),
+            func.sum(DailyMetric.work_kj).label("work_kj"),
+        )
+        .where(*where)
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+
+
+def _round(value, digits: int):
+    if value is None:
+        return None
+    return int(value) if digits == 0 else round(float(value), digits)
+
+
+@router.get("/athletes/{athlete_id}/daily-metrics")
+@router.get("/athletes/{athlete_id}/daily-metrics/", include_in_schema=False)
+async def get_daily_metrics_range(
+    athlete_id: int,
+    from_day: date | None = Query(default=None, description="YYYY-MM-DD"),
+    to_day: date | None = Query(default=None, description="YYYY-MM-DD"),
+    resolution: Literal["day", "week", "month"] = Query(default="day"),
+    format: Literal["rows", "columns"] = Query(
+        default="rows", description="rows: lista de objetos; columns: arrays paralelos por campo"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+    version: DataVersion = Depends(async_athlete_data_version),
+):
+    """
+    Serie de CTL / ATL / TSB / TSS entre from_day y to_day, por día o agregada
+    por semana / mes (5 años: ~260 semanas en vez de ~1.800 días). `day` es el
+    primer día del periodo.
+    """
+    if from_day and to_day and from_day > to_day:
+        raise HTTPException(status_code=400, detail="from_day debe ser <= to_day")
+
+    async def build() -> dict[str, Any]:
+        rows = (await db.execute(_series_query(athlete_id, from_day, to_day, resolution))).all()
+        days = [r.day for r in rows]
+        columns = {
+            name: [_round(r[i], digits) for r in rows]
+            for i, (name, digits) in enumerate(SERIES_COLUMNS.items(), start=1)
+        }
+
+        payload: dict[str, Any] = {
+            "athlete_id": athlete_id,
+            "from_day": from_day,
+            "to_day": to_day,
+            "resolution": resolution,
+            "count": len(rows),
+        }
+        if format == "columns":
+            payload["columns"] = {"day": days, **columns}
+        else:
+            payload["metrics"] = [
+                {"day": d, **{name: values[i] for name, values in columns.items()}}
+                for i, d in enumerate(days)
+            ]
+        return payload
 
-    return daily_metrics_to_dict(dm)
+    params = {"v": version.version, "from": from_day, "to": to_day, "resolution": resolution, "format": format}
+    return await get_response_cache().aresponse(athlete_id, "daily-metrics", params, build, version.headers)
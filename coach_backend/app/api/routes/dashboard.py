@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_async_db
+from app.services.activity_fields import parse_fields
+from app.services.dashboard import DASHBOARD_SECTIONS, dashboard_query, parse_sections
+from app.services.data_version import DataVersion, async_athlete_data_version_today
+from app.services.response_cache import get_response_cache
+
+router = APIRouter(tags=["dashboard"])
+
+
+@router.get("/athletes/{athlete_id}/dashboard")
+async def get_dashboard(
+    athlete_id: int,
+    sections: str | None = Query(
+        default=None, description=f"Secciones separadas por comas ({','.join(DASHBOARD_SECTIONS)}). Sin sections: todas."
+    ),
+    history_days: int = Query(default=7, ge=1, le=3650, description="Últimos N días de CTL / ATL / TSB"),
+    activities_days: int = Query(default=7, ge=0, le=3650, description="Actividades desde hoy - N días"),
+    activities_limit: int = Query(default=50, ge=1, le=500),
+    activity_fields: str | None = Query(default=None, description="Columnas de las actividades (como fields en /activities)"),
+    weeks: int = Query(default=4, ge=1, le=104, description="Semanas del resumen semanal"),
+    db: AsyncSession = Depends(get_async_db),
+    version: DataVersion = Depends(async_athlete_data_version_today),
+):
+    """
+    Lo que pinta el dashboard en una sola petición (en vez de latest + historial +
+    actividades por separado): una sesión, una consulta y un único ETag.
+    `latest` es null si el atleta aún no tiene daily_metrics. La ventana de
+    actividades acaba hoy, así que ETag y caché llevan también la fecha.
+    """
+    try:
+        names = parse_sections(sections)
+        fields = parse_fields(activity_fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    params = {
+        "v": version.version, "sections": ",".join(names), "history_days": history_days,
+        "activities_days": activities_days, "activities_limit": activities_limit,
+        "fields": ",".join(fields), "weeks": weeks, "today": version.day.isoformat(),
+    }
+    q = dashboard_query(
+        athlete_id, version.version, names, history_days, activities_days, activities_limit, fields, weeks,
+        today=version.day,
+    )
+
+    async def build() -> bytes:
+        return (await db.execute(q)).scalar_one().encode()
+
+    return await get_response_cache().aresponse(athlete_id, "dashboard", params, build, version.headers)
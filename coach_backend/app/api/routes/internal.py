@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from app.auth.deps import require_admin
+from app.core.telemetry import render, route_metrics
+from app.db.pool_metrics import pools_prometheus, pools_snapshot
+from app.db.query_metrics import queries_prometheus, slow_queries
+from app.services.profiling import profile_store
+
+router = APIRouter(prefix="/internal", tags=["internal"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/pool")
+def pool_status():
+    """Pools de conexiones de este proceso: uso, overflow, espera en checkout y conexiones retenidas."""
+    return {"pools": pools_snapshot()}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Métricas de este proceso en formato de texto de Prometheus: rutas, consultas y pools."""
+    body = render([route_metrics.prometheus(), queries_prometheus(), pools_prometheus()])
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/slow-queries")
+def slow_query_log():
+    """Consultas lentas agrupadas por huella (la misma que en db_slow_queries_total)."""
+    return {"queries": slow_queries()}
+
+
+@router.get("/profiles")
+def list_profiles(
+    route: str | None = Query(None, description="subcadena de la ruta o trabajo, p. ej. metrics_rebuild"),
+    athlete_id: int | None = None,
+):
+    """Perfiles guardados (X-Profile: 1 / ?profile=1), del más nuevo al más viejo."""
+    return {"profiles": profile_store.list(route, athlete_id)}
+
+
+@router.get("/profiles/{name}")
+def download_profile(name: str):
+    """Descarga un perfil; se abre en https://www.speedscope.app."""
+    path = profile_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="profile not found")
+    return FileResponse(path, media_type="application/json", filename=name)
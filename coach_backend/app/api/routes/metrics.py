@@ -1,24 +1,44 @@
 from datetime import date
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, status
 from sqlalchemy.orm import Session
+from app.auth.deps import require_admin
 from app.db.session import get_db
-from app.services.metrics_calculator import rebuild_daily_metrics
+from app.services.jobs import KIND_METRICS_REBUILD, KIND_METRICS_REBUILD_ALL, enqueue, job_to_dict
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
 
-@router.post("/{athlete_id}/rebuild")
+@router.post("/rebuild-all", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_admin)])
+def rebuild_all_athletes(
+    athlete_id: list[int] | None = Query(default=None, description="Limitar a estos atletas"),
+    workers: int | None = Query(default=None, ge=1),
+    incremental: bool = Query(default=False),
+    force: bool = Query(default=False),
+    db: Session = Depends(get_db),
+):
+    """
+    Encola el rebuild de todos los atletas (o los indicados); lo ejecuta un worker
+    (app/cli/worker.py) en un pool de procesos. Si ya hay uno en cola se fusionan.
+    Progreso y resultado en GET /jobs/{id}.
+    """
+    params = {"athlete_ids": athlete_id, "workers": workers, "incremental": incremental, "force": force}
+    job, created = enqueue(db, KIND_METRICS_REBUILD_ALL, None, params)
+    return {**job_to_dict(job), "created": created}
+
+
+@router.post("/{athlete_id}/rebuild", status_code=status.HTTP_202_ACCEPTED)
 def rebuild(
     athlete_id: int,
     from_day: date | None = Query(default=None, description="YYYY-MM-DD"),
     to_day: date | None = Query(default=None, description="YYYY-MM-DD"),
     force: bool = Query(default=False, description="Recalcula tss/day aunque ya existan"),
+    incremental: bool = Query(default=False, description="Recalcula solo desde el primer día modificado"),
     db: Session = Depends(get_db),
 ):
-    return rebuild_daily_metrics(
-        db=db,
-        athlete_id=athlete_id,
-        day_from=from_day,
-        day_to=to_day,
-        force=force,
-    )
+    """
+    Encola el rebuild (lo ejecuta app/cli/worker.py). Si ya hay uno en cola para el
+    atleta se fusionan: el que queda cubre lo que pedían los dos.
+    """
+    params = {"from_day": from_day, "to_day": to_day, "force": force, "incremental": incremental}
+    job, created = enqueue(db, KIND_METRICS_REBUILD, athlete_id, params)
+    return {**job_to_dict(job), "created": created}
@@ -3,11 +3,13 @@ from __future__ import annotations
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
 
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models.daily_metrics import DailyMetric  # ajusta si tu archivo se llama distinto
+from app.services.data_version import DataVersion, async_athlete_data_version
+from app.services.response_cache import get_response_cache
 
 router = APIRouter(tags=["metrics-summary"])
 
@@ -22,31 +24,37 @@ def daily_metric_to_dict(dm: DailyMetric) -> dict[str, Any]:
 
 
 @router.get("/athletes/{athlete_id}/metrics/ctl-atl/last-7-days")
-def get_ctl_atl_last_7_days(
+async def get_ctl_atl_last_7_days(
     athlete_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    version: DataVersion = Depends(async_athlete_data_version),
 ):
     """
     Devuelve CTL / ATL / TSB de los últimos 7 días disponibles.
     Ordenado por día ascendente.
     """
-    q = (
-        select(DailyMetric)
-        .where(DailyMetric.athlete_id == athlete_id)
-        .order_by(desc(DailyMetric.day))
-        .limit(7)
+    async def build():
+        q = (
+            select(DailyMetric)
+            .where(DailyMetric.athlete_id == athlete_id)
+            .order_by(desc(DailyMetric.day))
+            .limit(7)
+        )
+
+        rows = (await db.execute(q)).scalars().all()
+
+        if not rows:
+            raise HTTPException(status_code=404, detail="No daily metrics found")
+
+        # los pedimos DESC para el limit, pero devolvemos ASC para gráficas
+        rows = list(reversed(rows))
+
+        return {
+            "athlete_id": athlete_id,
+            "days": len(rows),
+            "metrics": [daily_metric_to_dict(dm) for dm in rows],
+        }
+
+    return await get_response_cache().aresponse(
+        athlete_id, "metrics/ctl-atl/last-7-days", {"v": version.version}, build, version.headers
     )
-
-    rows = db.execute(q).scalars().all()
-
-    if not rows:
-        raise HTTPException(status_code=404, detail="No daily metrics found")
-
-    # los pedimos DESC para el limit, pero devolvemos ASC para gráficas
-    rows = list(reversed(rows))
-
-    return {
-        "athlete_id": athlete_id,
-        "days": len(rows),
-        "metrics": [daily_metric_to_dict(dm) for dm in rows],
-    }
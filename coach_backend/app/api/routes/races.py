@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 
-from app.db.session import get_db  # ajusta
+from app.db.session import get_async_db, get_db  # ajusta
 from app.models.race_goal import RaceGoal  # ajusta
 from app.schemas.races import RaceGoalCreate, RaceGoalOut, RaceGoalPatch  # ajusta
 
@@ -22,21 +23,21 @@ def create_race(payload: RaceGoalCreate, db: Session = Depends(get_db)):
 
 
 @router.get("", response_model=list[RaceGoalOut])
-def get_all_races(
+async def get_all_races(
     athlete_id: int = Query(..., description="Strava athlete id"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    races = db.execute(
+    races = (await db.execute(
         select(RaceGoal)
         .where(RaceGoal.athlete_id == athlete_id)
         .order_by(RaceGoal.race_date.asc())
-    ).scalars().all()
+    )).scalars().all()
     return races
 
 
 @router.get("/{race_id}", response_model=RaceGoalOut)
-def get_race_by_id(race_id: int, db: Session = Depends(get_db)):
-    race = db.execute(select(RaceGoal).where(RaceGoal.id == race_id)).scalar_one_or_none()
+async def get_race_by_id(race_id: int, db: AsyncSession = Depends(get_async_db)):
+    race = (await db.execute(select(RaceGoal).where(RaceGoal.id == race_id))).scalar_one_or_none()
     if not race:
         raise HTTPException(status_code=404, detail="race not found")
     return race
@@ -1,35 +1,28 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, status
 from sqlalchemy.orm import Session
+from app.auth.deps import require_admin
 from app.db.session import get_db
-from app.services.strava_client import StravaClient
-from app.services.activity_importer import upsert_activities
+from app.services.jobs import KIND_STRAVA_IMPORT, enqueue, job_to_dict
+from app.services.strava_rate_limit import get_rate_limiter
 
 router = APIRouter(prefix="/strava", tags=["strava-activities"])
 
 
-@router.post("/{athlete_id}/import-activities")
-def import_activities(athlete_id: int, db: Session = Depends(get_db)):
-    client = StravaClient(db)
-    access_token = client.get_valid_access_token(athlete_id)
+@router.get("/rate-limit", dependencies=[Depends(require_admin)])
+def rate_limit_status():
+    """Presupuesto de la API de Strava que le queda a este proceso."""
+    return get_rate_limiter().snapshot()
 
-    total_fetched = 0
-    total_saved = 0
-    page = 1
-    per_page = 200
 
-    while True:
-        items = client.list_activities(access_token, page=page, per_page=per_page)
-        if not items:
-            break
-        total_fetched += len(items)
-        total_saved += upsert_activities(db, athlete_id=athlete_id, activities=items)
-        if len(items) < per_page:
-            break
-        page += 1
-
-    return {
-        "athlete_id": athlete_id,
-        "fetched": total_fetched,
-        "saved_or_updated": total_saved,
-        "pages": page,
-    }
+@router.post("/{athlete_id}/import-activities", status_code=status.HTTP_202_ACCEPTED)
+def import_activities(
+    athlete_id: int,
+    full: bool = Query(False, description="Ignora el cursor y recorre todo el histórico"),
+    db: Session = Depends(get_db),
+):
+    """
+    Encola el import (lo ejecuta app/cli/worker.py). Si ya hay uno en cola para el
+    atleta se reutiliza. Al terminar encola un rebuild incremental de métricas.
+    """
+    job, created = enqueue(db, KIND_STRAVA_IMPORT, athlete_id, {"full": full})
+    return {**job_to_dict(job), "created": created}
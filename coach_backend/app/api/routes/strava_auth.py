@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.services.strava_client import StravaClient
+from app.services.strava_tokens import token_cache
 from app.models.athlete_token import AthleteToken
 
 router = APIRouter(prefix="/strava", tags=["strava-auth"])
@@ -36,4 +37,5 @@ def strava_callback(code: str = Query(...), db: Session = Depends(get_db)):
         db.add(token_row)
 
     db.commit()
+    token_cache.put(athlete_id, token_row.access_token, token_row.expires_at)
     return {"ok": True, "athlete_id": athlete_id}
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.services.zones import zones_for_range
+
+router = APIRouter(tags=["zones"])
+
+
+@router.get("/athletes/{athlete_id}/zones")
+def get_zones(
+    athlete_id: int,
+    from_day: date | None = Query(default=None, description="YYYY-MM-DD"),
+    to_day: date | None = Query(default=None, description="YYYY-MM-DD"),
+    db: Session = Depends(get_db),
+):
+    """
+    Tiempo en zona (s) de HR, potencia y ritmo por día y en total, con los límites
+    de zona del perfil actual.
+    """
+    if from_day and to_day and from_day > to_day:
+        raise HTTPException(status_code=400, detail="from_day debe ser <= to_day")
+    return zones_for_range(db, athlete_id, from_day, to_day)
@@ -29,3 +29,25 @@ def get_current_user(
     if not user or not user.is_active:
         raise HTTPException(status_code=401, detail="user not found or inactive")
     return user
+
+
+def require_admin(current_user: AppUser = Depends(get_current_user)) -> AppUser:
+    # solo app_users.is_admin (se asigna en la BD); el role de app_user_athletes
+    # es por atleta y no da permisos de administración
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="admin only")
+    return current_user
+
+
+def admin_from_token(db: Session, token: str) -> AppUser | None:
+    """Admin activo del token de acceso, o None. Para código fuera de Depends (middleware)."""
+    try:
+        payload = decode_access_token(token)
+    except ValueError:
+        return None
+    if payload.get("type") != "access":
+        return None
+    user = db.execute(select(AppUser).where(AppUser.id == int(payload["sub"]))).scalar_one_or_none()
+    if not user or not user.is_active or not user.is_admin:
+        return None
+    return user
@@ -0,0 +1,55 @@
+"""
+Rebuild de daily_metrics para todos los atletas (o un subconjunto) en paralelo.
+
+Uso (desde coach_backend/):
+    python -m app.cli.rebuild_all --workers 8
+    python -m app.cli.rebuild_all --athlete-id 123 --athlete-id 456 --force
+    python -m app.cli.rebuild_all --incremental
+"""
+from __future__ import annotations
+
+import argparse
+import json
+
+from app.db.session import SessionLocal
+from app.services.bulk_rebuild import rebuild_all
+
+
+def _print_progress(done: int, total: int, chunk_results: list[dict]) -> None:
+    for r in chunk_results:
+        status = "ok" if r["ok"] else f"ERROR {r['error']}"
+        print(f"  athlete {r['athlete_id']}: {r['seconds']:.3f}s {status}")
+    print(f"[{done}/{total}] chunks completados", flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--athlete-id", type=int, action="append", dest="athlete_ids",
+                        help="limitar a estos atletas (se puede repetir)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="procesos (por defecto nº de CPUs, limitado por REBUILD_MAX_DB_CONNECTIONS)")
+    parser.add_argument("--incremental", action="store_true", help="solo desde el primer día sucio")
+    parser.add_argument("--force", action="store_true", help="recalcula day/tss aunque ya existan")
+    parser.add_argument("--json", action="store_true", help="imprime el resumen completo en JSON")
+    args = parser.parse_args()
+
+    summary = rebuild_all(
+        SessionLocal(),
+        athlete_ids=args.athlete_ids,
+        workers=args.workers,
+        incremental=args.incremental,
+        force=args.force,
+        on_progress=None if args.json else _print_progress,
+    )
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(
+            f"{summary['athletes']} atletas, {summary['failed']} con error, "
+            f"{summary['workers']} procesos, {summary['chunks']} chunks, {summary['seconds']:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
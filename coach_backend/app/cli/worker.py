@@ -0,0 +1,168 @@
+"""
+Worker de la cola de trabajos (tabla jobs): imports de Strava y rebuilds de métricas.
+
+Uso (desde coach_backend/):
+    python -m app.cli.worker
+    python -m app.cli.worker --kind strava_import --kind metrics_rebuild
+    python -m app.cli.worker --once          # procesa lo que haya en cola y termina
+    python -m app.cli.worker --kind metrics_rebuild_all   # rebuild de todos los atletas (pool de procesos)
+
+Se pueden lanzar tantos como se quiera, en uno o varios nodos: cada trabajo se
+reclama con FOR UPDATE SKIP LOCKED. SIGTERM/SIGINT terminan tras el trabajo en curso.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Iterator
+
+from app.core.config import settings
+from app.db.pool_metrics import db_holder
+from app.db.session import SessionLocal
+from app.services import jobs
+from app.services.job_runners import RUNNERS
+from app.services.profiling import profiled
+from app.services.strava_client import close_http_clients
+from app.services.strava_rate_limit import StravaRateLimited
+
+logger = logging.getLogger("app.worker")
+
+
+class Worker:
+    def __init__(self, kinds: tuple[str, ...] | None = None):
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.kinds = kinds
+        self.stopping = False
+        # un único event loop para todo el proceso: el cliente HTTP async compartido
+        # (y su pool de conexiones) queda ligado a él
+        self.loop = asyncio.new_event_loop()
+        self._last_stale_check = 0.0
+
+    def stop(self, *_args) -> None:
+        logger.info("worker %s: parando tras el trabajo en curso", self.name)
+        self.stopping = True
+
+    def _maybe_requeue_stale(self, db) -> None:
+        now = time.monotonic()
+        if now - self._last_stale_check < settings.JOB_STALE_AFTER_S / 4:
+            return
+        self._last_stale_check = now
+        n = jobs.requeue_stale(db, settings.JOB_STALE_AFTER_S, settings.JOB_MAX_ATTEMPTS)
+        if n:
+            logger.warning("worker %s: %d trabajos abandonados recuperados", self.name, n)
+
+    def run_one(self, jobs_db) -> bool:
+        """Reclama y ejecuta un trabajo. False si no había ninguno listo."""
+        job = jobs.claim(jobs_db, self.name, self.kinds)
+        if job is None:
+            return False
+
+        runner = RUNNERS.get(job.kind)
+        t0 = time.perf_counter()
+        logger.info("job %d (%s, atleta %s): empieza", job.id, job.kind, job.athlete_id)
+
+        # la sesión de trabajo es aparte: sus commits/rollbacks no tocan el estado del job
+        db = SessionLocal()
+        try:
+            if runner is None:
+                raise ValueError(f"tipo de trabajo desconocido: {job.kind}")
+            # las conexiones retenidas mucho tiempo se registran con el tipo de trabajo
+            with db_holder(f"job:{job.kind}"), self._heartbeat(job.id), self._maybe_profiled(job):
+                result = runner(db, job, lambda p: jobs.report_progress(jobs_db, job.id, self.name, p), self.loop)
+            if jobs.finish(jobs_db, job.id, self.name, result):
+                logger.info("job %d: ok en %.2fs", job.id, time.perf_counter() - t0)
+            else:
+                logger.warning("job %d: terminado en %.2fs, pero ya no es de este worker: resultado descartado",
+                               job.id, time.perf_counter() - t0)
+        except StravaRateLimited as e:
+            db.rollback()
+            retry_at = datetime.fromtimestamp(e.retry_at, tz=timezone.utc)
+            next_job = jobs.defer(jobs_db, job, self.name, retry_at, str(e))
+            logger.warning("job %d: aplazado hasta %s como job %d", job.id, retry_at.isoformat(), next_job.id)
+        except Exception as e:
+            db.rollback()
+            jobs_db.rollback()
+            if not jobs.fail(jobs_db, job.id, self.name, f"{type(e).__name__}: {e}"):
+                logger.warning("job %d: ya no es de este worker, el error no se guarda", job.id)
+            logger.exception("job %d: error", job.id)
+        finally:
+            db.close()
+        return True
+
+    @contextmanager
+    def _heartbeat(self, job_id: int) -> Iterator[None]:
+        """
+        Latido del trabajo cada JOB_HEARTBEAT_S en un hilo aparte (con su propia
+        sesión) mientras corre: los runners no informan de progreso en las esperas
+        al limitador de Strava ni en etapas largas, y sin latido requeue_stale
+        devolvería a la cola un trabajo vivo.
+        """
+        stop = threading.Event()
+
+        def beat() -> None:
+            with SessionLocal() as db:
+                while not stop.wait(settings.JOB_HEARTBEAT_S):
+                    try:
+                        if not jobs.heartbeat(db, job_id, self.name):
+                            logger.error("job %d: ya no es de este worker (dado por abandonado)", job_id)
+                            return
+                    except Exception:
+                        db.rollback()
+                        logger.exception("job %d: error en el latido", job_id)
+
+        thread = threading.Thread(target=beat, name=f"heartbeat-{job_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    @staticmethod
+    def _maybe_profiled(job):
+        # params["profile"]: lo encoló una petición perfilada (services/profiling.py)
+        if (job.params or {}).get("profile"):
+            return profiled(f"job:{job.kind}", job.athlete_id)
+        return nullcontext()
+
+    def run(self, once: bool = False) -> None:
+        jobs_db = SessionLocal()
+        try:
+            while not self.stopping:
+                self._maybe_requeue_stale(jobs_db)
+                if self.run_one(jobs_db):
+                    continue
+                if once:
+                    break
+                time.sleep(settings.JOB_POLL_INTERVAL_S)
+        finally:
+            jobs_db.close()
+            self.loop.run_until_complete(close_http_clients())
+            self.loop.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kind", action="append", dest="kinds", choices=sorted(RUNNERS),
+                        help="solo estos tipos de trabajo (se puede repetir)")
+    parser.add_argument("--once", action="store_true", help="vacía la cola y termina")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    worker = Worker(tuple(args.kinds) if args.kinds else None)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,77 @@ class Settings(BaseSettings):
     STRAVA_CLIENT_ID: str
     STRAVA_CLIENT_SECRET: str
     STRAVA_REDIRECT_URI: str
+    # Permite apuntar a un doble local de Strava (scripts/strava_stub.py)
+    STRAVA_BASE_URL: str = "https://www.strava.com"
+
+    # Presupuesto de la API (services/strava_rate_limit.py). Por defecto el límite de
+    # lectura de Strava; se corrige solo con las cabeceras X-*RateLimit-* de cada respuesta.
+    STRAVA_RATE_LIMIT_15MIN: int = 100
+    STRAVA_RATE_LIMIT_DAILY: int = 1000
+    # peticiones que dejamos sin usar en cada ventana (otros procesos / margen)
+    STRAVA_RATE_LIMIT_RESERVE: int = 2
+    # si la ventana agotada tarda más que esto en reiniciarse, se difiere en vez de esperar
+    STRAVA_RATE_LIMIT_MAX_WAIT_S: int = 60
+
+    # Sync con Strava (services/strava_sync.py): incremental desde el cursor del
+    # atleta, con un margen para actividades subidas tarde, y completo cada N días.
+    STRAVA_FULL_SYNC_DAYS: int = 7
+    STRAVA_SYNC_OVERLAP_HOURS: int = 48
+
+    # Streams de actividades: ficheros columnares por atleta (services/stream_store.py)
+    STREAMS_DIR: str = "data/streams"
+    # actividades cuyos streams se descargan por trabajo (1 petición a Strava por actividad)
+    STREAMS_PER_JOB: int = 50
+
+    # Pools de conexiones (db/session.py; uno sync y otro async por proceso). El
+    # total por proceso es hasta 2 * (POOL_SIZE + MAX_OVERFLOW): cuenta contra
+    # max_connections de Postgres junto con workers y rebuilds.
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    # espera máxima por una conexión libre antes de fallar (TimeoutError)
+    DB_POOL_TIMEOUT_S: float = 30.0
+    # conexiones más viejas que esto se reabren (evita cortes de proxies / firewalls)
+    DB_POOL_RECYCLE_S: int = 1800
+    # pre-ping al sacar una conexión: always (en cada checkout), idle (solo si lleva
+    # más de DB_POOL_PRE_PING_IDLE_S en el pool) o never
+    DB_POOL_PRE_PING: str = "idle"
+    DB_POOL_PRE_PING_IDLE_S: float = 60.0
+    # una conexión retenida más que esto se registra (log + /internal/pool) con su ruta o trabajo
+    DB_POOL_LONG_HELD_S: float = 30.0
+    # consultas más lentas que esto se registran por huella (log + /internal/slow-queries)
+    DB_SLOW_QUERY_MS: float = 500.0
+
+    # Cola de trabajos (services/jobs.py, app/cli/worker.py)
+    JOB_POLL_INTERVAL_S: float = 2.0
+    # un trabajo running sin latido durante este tiempo se da por abandonado
+    JOB_STALE_AFTER_S: int = 900
+    # latido del worker mientras corre un trabajo (hilo aparte en app/cli/worker.py)
+    JOB_HEARTBEAT_S: float = 30.0
+    JOB_MAX_ATTEMPTS: int = 3
+
+    # Rebuild masivo (services/bulk_rebuild.py): cada proceso usa 1 conexión,
+    # así que el nº de procesos nunca supera este presupuesto de conexiones.
+    REBUILD_MAX_DB_CONNECTIONS: int = 8
+
+    # ETag de los endpoints de lectura (services/data_version.py): con LISTEN en
+    # Postgres, las versiones se cachean en proceso y comprobarlas no cuesta consultas
+    DATA_VERSION_LISTEN: bool = True
+
+    # Caché de respuestas del dashboard (services/response_cache.py). Sin URL es un
+    # LRU en memoria de cada proceso; con RESPONSE_CACHE_URL (redis://...) se comparte
+    # entre procesos y las invalidaciones del worker llegan a la API.
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_URL: str = ""
+    RESPONSE_CACHE_TTL_S: float = 300.0
+    RESPONSE_CACHE_MAX_MB: int = 64
+
+    # Perfiles bajo demanda (services/profiling.py): un admin los pide con la cabecera
+    # X-Profile: 1 o ?profile=1, y también se perfilan los trabajos que encole esa
+    # petición. Con PROFILING_ENABLED=False el middleware ni se instala.
+    PROFILING_ENABLED: bool = True
+    PROFILE_DIR: str = "data/profiles"
+    PROFILE_MAX_FILES: int = 50
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
 
 
 settings = Settings()
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Iterable, Sequence
+
+# límites (s) de la latencia por ruta
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """
+    Histograma de buckets fijos (límites superiores inclusivos, como Prometheus).
+    Observar es un bisect y tres sumas bajo un lock: se puede llamar en cada
+    petición o checkout sin coste apreciable.
+    """
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def cumulative(self) -> tuple[list[tuple[float, int]], float, int]:
+        """([(le, nº de observaciones <= le)...] terminando en +Inf, suma, total)."""
+        with self._lock:
+            counts, total_sum, total = list(self._counts), self._sum, self._count
+        out, acc = [], 0
+        for le, c in zip((*self.bounds, float("inf")), counts):
+            acc += c
+            out.append((le, acc))
+        return out, total_sum, total
+
+    def quantile(self, q: float) -> float | None:
+        """Límite superior del bucket donde cae el cuantil q (None sin datos)."""
+        buckets, _, total = self.cumulative()
+        if total == 0:
+            return None
+        rank = q * total
+        for le, acc in buckets:
+            if acc >= rank:
+                return le
+        return float("inf")
+
+    def snapshot(self) -> dict[str, Any]:
+        buckets, total_sum, total = self.cumulative()
+        return {
+            "count": total,
+            "sum": round(total_sum, 3),
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": [["+Inf" if le == float("inf") else le, acc] for le, acc in buckets],
+        }
+
+
+class RequestStats:
+    """Consultas y tiempo en Postgres de la petición en curso (los suma db/query_metrics.py)."""
+
+    __slots__ = ("queries", "db_s")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_s = 0.0
+
+
+# lo fija el middleware (api/middleware.py); None fuera de una petición (worker, scripts)
+request_stats_var: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+# --- Formato de texto de Prometheus -------------------------------------------
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def metric_family(name: str, kind: str, help_text: str) -> list[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def sample(name: str, labels: dict[str, Any], value: float) -> str:
+    return f"{name}{_labels(labels)} {_number(value)}"
+
+
+def histogram_samples(name: str, labels: dict[str, Any], hist: Histogram, scale: float = 1.0) -> list[str]:
+    """Líneas _bucket/_sum/_count de `hist`; `scale` pasa sus unidades a las de la métrica (ms -> s)."""
+    buckets, total_sum, total = hist.cumulative()
+    lines = [sample(f"{name}_bucket", {**labels, "le": _number(le * scale)}, acc) for le, acc in buckets]
+    lines.append(sample(f"{name}_sum", labels, total_sum * scale))
+    lines.append(sample(f"{name}_count", labels, total))
+    return lines
+
+
+def render(blocks: Iterable[list[str]]) -> str:
+    return "\n".join(line for block in blocks for line in block) + "\n"
+
+
+# --- Métricas por ruta ---------------------------------------------------------
+
+
+class RouteMetrics:
+    """
+    Latencia (histograma), peticiones por status y consultas / tiempo en Postgres
+    por ruta. La ruta es la plantilla de FastAPI ("/athletes/{athlete_id}/..."),
+    así que el nº de series está acotado por el nº de endpoints.
+    """
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS_S):
+        self.bounds = tuple(bounds)
+        self._latency: dict[tuple[str, str], Histogram] = {}
+        self._requests: Counter[tuple[str, str, int]] = Counter()
+        self._queries: Counter[tuple[str, str]] = Counter()
+        self._db_s: Counter[tuple[str, str]] = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, elapsed_s: float, stats: RequestStats) -> None:
+        key = (method, route)
+        hist = self._latency.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._latency.setdefault(key, Histogram(self.bounds))
+        hist.observe(elapsed_s)
+        with self._lock:
+            self._requests[(method, route, status)] += 1
+            self._queries[key] += stats.queries
+            self._db_s[key] += stats.db_s
+
+    def prometheus(self) -> list[str]:
+        with self._lock:
+            latency = sorted(self._latency.items())
+            requests = sorted(self._requests.items())
+            queries = sorted(self._queries.items())
+            db_s = sorted(self._db_s.items())
+        lines = metric_family("http_request_duration_seconds", "histogram", "Latencia por ruta.")
+        for (method, route), hist in latency:
+            lines += histogram_samples("http_request_duration_seconds", {"method": method, "route": route}, hist)
+        lines += metric_family("http_requests_total", "counter", "Peticiones por ruta y status.")
+        lines += [
+            sample("http_requests_total", {"method": m, "route": r, "status": st}, n)
+            for (m, r, st), n in requests
+        ]
+        lines += metric_family("http_request_db_queries_total", "counter", "Consultas a Postgres hechas por las peticiones de cada ruta.")
+        lines += [sample("http_request_db_queries_total", {"method": m, "route": r}, n) for (m, r), n in queries]
+        lines += metric_family("http_request_db_seconds_total", "counter", "Tiempo en Postgres de las peticiones de cada ruta.")
+        lines += [sample("http_request_db_seconds_total", {"method": m, "route": r}, v) for (m, r), v in db_s]
+        return lines
+
+
+route_metrics = RouteMetrics()
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Dialect, Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.telemetry import Histogram, histogram_samples, metric_family, sample
+
+logger = logging.getLogger(__name__)
+
+# límites (ms) de los buckets de espera al pedir una conexión al pool
+WAIT_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+# conexiones retenidas más que esto que se listan en el snapshot
+HELD_LISTED = 20
+
+# Quién tiene la conexión: el scope ASGI de la petición (api/middleware.py; la ruta
+# se resuelve al leerlo) o una etiqueta ("job:strava_import" en el worker).
+db_holder_var: ContextVar[Any] = ContextVar("db_holder", default=None)
+
+
+@contextmanager
+def db_holder(label: str) -> Iterator[None]:
+    token = db_holder_var.set(label)
+    try:
+        yield
+    finally:
+        db_holder_var.reset(token)
+
+
+def current_holder() -> str:
+    holder = db_holder_var.get()
+    if holder is None:
+        return "-"
+    if isinstance(holder, str):
+        return holder
+    route = holder.get("route")
+    return f'{holder.get("method", "")} {getattr(route, "path", None) or holder.get("path", "")}'
+
+
+class PoolMetrics:
+    """
+    Telemetría de un pool: espera al pedir conexión (histograma), timeouts,
+    conexiones en uso / overflow y conexiones retenidas demasiado tiempo, con la
+    ruta o el trabajo que las tiene.
+    """
+
+    def __init__(self, name: str, long_held_s: float):
+        self.name = name
+        self.long_held_s = long_held_s
+        self.engine: Engine | None = None
+        self.wait_ms = Histogram(WAIT_BUCKETS_MS)
+        self.timeouts = 0
+        self.long_held: Counter[str] = Counter()
+        self._held: dict[int, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def on_checkout(self, dbapi_connection, record, proxy) -> None:
+        with self._lock:
+            self._held[id(record)] = (time.monotonic(), current_holder())
+
+    def on_checkin(self, dbapi_connection, record) -> None:
+        now = time.monotonic()
+        record.info["checked_in_at"] = now
+        with self._lock:
+            held = self._held.pop(id(record), None)
+        if held is None:
+            return
+        since, holder = held
+        if now - since >= self.long_held_s:
+            with self._lock:
+                self.long_held[holder] += 1
+            logger.warning("pool %s: conexión retenida %.1fs por %s", self.name, now - since, holder)
+
+    def snapshot(self) -> dict[str, Any]:
+        pool = self.engine.pool if self.engine is not None else None
+        now = time.monotonic()
+        with self._lock:
+            held = sorted(self._held.values())
+            long_held = dict(self.long_held)
+        return {
+            "pool": self.name,
+            "size": pool.size() if pool is not None else None,
+            "checked_out": pool.checkedout() if pool is not None else None,
+            "checked_in": pool.checkedin() if pool is not None else None,
+            "overflow": max(0, pool.overflow()) if pool is not None else None,
+            "timeouts": self.timeouts,
+            "wait_ms": self.wait_ms.snapshot(),
+            "long_held_s": self.long_held_s,
+            "long_held_total": long_held,
+            "held_now": [
+                {"holder": holder, "held_s": round(now - since, 1)}
+                for since, holder in held[:HELD_LISTED]
+                if now - since >= self.long_held_s
+            ],
+        }
+
+
+class _TimedGet:
+    """Mide la espera de cada checkout (no hay evento de pool para el inicio)."""
+
+    metrics: PoolMetrics | None = None
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.timeouts += 1
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.wait_ms.observe((time.perf_counter() - t0) * 1000)
+
+
+class TimedQueuePool(_TimedGet, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedGet, AsyncAdaptedQueuePool):
+    pass
+
+
+def timed_pool_class(base: type, metrics: PoolMetrics) -> type:
+    # subclase por engine: Pool.recreate() (engine.dispose) instancia self.__class__
+    # y así conserva las métricas
+    return type(base.__name__, (base,), {"metrics": metrics})
+
+
+def ping_if_idle(dialect: Dialect, idle_s: float):
+    """
+    Pre-ping solo si la conexión lleva más de idle_s segundos en el pool (las que
+    acaban de volver no se comprueban). Usa el do_ping del dialecto, como el
+    pool_pre_ping de SQLAlchemy: con psycopg hace el SELECT 1 en autocommit y no
+    deja una transacción abierta. DisconnectionError hace que el pool la descarte
+    y abra otra.
+    """
+    def on_checkout(dbapi_connection, record, proxy) -> None:
+        last = record.info.get("checked_in_at")
+        if last is None or time.monotonic() - last < idle_s:
+            return
+        try:
+            dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            raise exc.DisconnectionError() from e
+
+    return on_checkout
+
+
+pool_metrics: dict[str, PoolMetrics] = {}
+
+
+def instrument(engine: Engine, metrics: PoolMetrics, pre_ping_idle_s: float | None = None) -> None:
+    """Engancha los eventos del pool de `engine` (el sync_engine en el caso async)."""
+    metrics.engine = engine
+    if pre_ping_idle_s is not None:
+        event.listen(engine, "checkout", ping_if_idle(engine.dialect, pre_ping_idle_s))
+    event.listen(engine, "checkout", metrics.on_checkout)
+    event.listen(engine, "checkin", metrics.on_checkin)
+    pool_metrics[metrics.name] = metrics
+
+
+def pools_snapshot() -> list[dict[str, Any]]:
+    return [m.snapshot() for m in pool_metrics.values()]
+
+
+def pools_prometheus() -> list[str]:
+    snaps = [(m, m.snapshot()) for m in pool_metrics.values()]
+    lines = []
+    for name, key, help_text in (
+        ("db_pool_size", "size", "Conexiones fijas del pool."),
+        ("db_pool_checked_out", "checked_out", "Conexiones en uso."),
+        ("db_pool_overflow", "overflow", "Conexiones abiertas por encima de pool_size."),
+    ):
+        lines += metric_family(name, "gauge", help_text)
+        lines += [sample(name, {"pool": m.name}, s[key]) for m, s in snaps if s[key] is not None]
+    lines += metric_family("db_pool_checkout_timeouts_total", "counter", "Checkouts que agotaron pool_timeout.")
+    lines += [sample("db_pool_checkout_timeouts_total", {"pool": m.name}, m.timeouts) for m, _ in snaps]
+    lines += metric_family("db_pool_checkout_wait_seconds", "histogram", "Espera al pedir una conexión al pool.")
+    for m, _ in snaps:
+        lines += histogram_samples("db_pool_checkout_wait_seconds", {"pool": m.name}, m.wait_ms, scale=0.001)
+    lines += metric_family("db_pool_long_held_total", "counter", "Conexiones retenidas más de DB_POOL_LONG_HELD_S, por ruta o trabajo.")
+    for m, s in snaps:
+        lines += [
+            sample("db_pool_long_held_total", {"pool": m.name, "holder": holder}, n)
+            for holder, n in sorted(s["long_held_total"].items())
+        ]
+    return lines
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.telemetry import (
+    Histogram,
+    histogram_samples,
+    metric_family,
+    request_stats_var,
+    sample,
+)
+from app.db.pool_metrics import current_holder
+
+logger = logging.getLogger(__name__)
+
+# límites (s) de la duración de cada consulta
+QUERY_BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# huellas distintas de consultas lentas que se guardan (las nuevas se cuentan en "other")
+SLOW_FINGERPRINTS = 200
+# caracteres de la consulta que se guardan / se escriben en el log
+STATEMENT_CHARS = 2000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+|:\w+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> tuple[str, str]:
+    """
+    (huella, consulta normalizada): literales y parámetros pasan a ?, las listas
+    de IN (?, ?, ...) a (?+) y los espacios se colapsan, así que la misma
+    consulta con otros valores comparte huella.
+    """
+    normalized = _STRING.sub("?", statement)
+    normalized = _PARAM.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _LIST.sub("(?+)", normalized)
+    normalized = _SPACE.sub(" ", normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+@dataclass
+class SlowQuery:
+    fingerprint: str
+    statement: str
+    count: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+    last_holder: str = "-"
+
+
+class QueryMetrics:
+    """
+    Duración de cada consulta de un engine (histograma), suma de consultas y
+    tiempo en la petición en curso (RequestStats) y registro de consultas lentas
+    agrupadas por huella.
+    """
+
+    def __init__(self, name: str, slow_s: float):
+        self.name = name
+        self.slow_s = slow_s
+        self.duration = Histogram(QUERY_BUCKETS_S)
+        self.slow: dict[str, SlowQuery] = {}
+        self.slow_other = 0
+        self._lock = threading.Lock()
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            context._query_t0 = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        t0 = getattr(context, "_query_t0", None)
+        if t0 is None:
+            return
+        elapsed = time.perf_counter() - t0
+        self.duration.observe(elapsed)
+        stats = request_stats_var.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_s += elapsed
+        if elapsed >= self.slow_s:
+            self._record_slow(statement, elapsed)
+
+    def _record_slow(self, statement: str, elapsed: float) -> None:
+        fp, normalized = fingerprint(statement)
+        holder = current_holder()
+        logger.warning(
+            "consulta lenta %s (%s): %.0f ms por %s: %s",
+            fp, self.name, elapsed * 1000, holder, normalized[:STATEMENT_CHARS],
+        )
+        with self._lock:
+            entry = self.slow.get(fp)
+            if entry is None:
+                if len(self.slow) >= SLOW_FINGERPRINTS:
+                    self.slow_other += 1
+                    return
+                entry = self.slow[fp] = SlowQuery(fp, normalized[:STATEMENT_CHARS])
+            entry.count += 1
+            entry.total_s += elapsed
+            entry.max_s = max(entry.max_s, elapsed)
+            entry.last_holder = holder
+
+
+query_metrics: dict[str, QueryMetrics] = {}
+
+
+def instrument_queries(engine: Engine, metrics: QueryMetrics) -> None:
+    """Engancha before/after_cursor_execute de `engine` (el sync_engine en el caso async)."""
+    event.listen(engine, "before_cursor_execute", metrics.before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", metrics.after_cursor_execute)
+    query_metrics[metrics.name] = metrics
+
+
+def slow_queries() -> list[dict[str, Any]]:
+    """Consultas lentas de todos los engines, de más a menos tiempo total."""
+    out = []
+    for m in query_metrics.values():
+        with m._lock:
+            entries = list(m.slow.values())
+        out += [
+            {
+                "engine": m.name,
+                "fingerprint": e.fingerprint,
+                "count": e.count,
+                "total_s": round(e.total_s, 3),
+                "max_s": round(e.max_s, 3),
+                "last_holder": e.last_holder,
+                "statement": e.statement,
+            }
+            for e in entries
+        ]
+    return sorted(out, key=lambda e: e["total_s"], reverse=True)
+
+
+def queries_prometheus() -> list[str]:
+    lines = metric_family("db_query_duration_seconds", "histogram", "Duración de las consultas a Postgres.")
+    for m in query_metrics.values():
+        lines += histogram_samples("db_query_duration_seconds", {"engine": m.name}, m.duration)
+    lines += metric_family("db_slow_queries_total", "counter", "Consultas lentas por huella (ver /internal/slow-queries).")
+    for m in query_metrics.values():
+        with m._lock:
+            entries = sorted(m.slow.items())
+            other = m.slow_other
+        lines += [sample("db_slow_queries_total", {"engine": m.name, "fingerprint": fp}, e.count) for fp, e in entries]
+        if other:
+            lines.append(sample("db_slow_queries_total", {"engine": m.name, "fingerprint": "other"}, other))
+    lines += metric_family("db_slow_query_seconds_total", "counter", "Tiempo en consultas lentas por huella.")
+    for m in query_metrics.values():
+        with m._lock:
+            entries = sorted(m.slow.items())
+        lines += [sample("db_slow_query_seconds_total", {"engine": m.name, "fingerprint": fp}, e.total_s) for fp, e in entries]
+    return lines
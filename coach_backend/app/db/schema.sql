@@ -228,4 +228,207 @@ CREATE TABLE IF NOT EXISTS app_refresh_tokens (
     created_at TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
-CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON app_refresh_tokens(app_user_id);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON app_refresh_tokens(app_user_id);
+
+-- ===== daily_metrics: primer día pendiente de recalcular (rebuild incremental) =====
+CREATE TABLE IF NOT EXISTS metrics_dirty_days (
+    athlete_id BIGINT PRIMARY KEY,
+    dirty_from DATE NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- ===== athlete_profile: constantes de tiempo CTL/ATL por atleta (NULL => 42 / 7) =====
+ALTER TABLE athlete_profile
+  ADD COLUMN IF NOT EXISTS ctl_time_constant DOUBLE PRECISION,
+  ADD COLUMN IF NOT EXISTS atl_time_constant DOUBLE PRECISION;
+
+-- ===== Administradores (auth/deps.py require_admin) =====
+-- Lo único que da acceso a los endpoints de admin. Se asigna a mano, nunca desde la API:
+--   UPDATE app_users SET is_admin = TRUE WHERE email = '...';
+-- El role de app_user_athletes es por atleta y no da permisos de administración.
+ALTER TABLE app_users
+  ADD COLUMN IF NOT EXISTS is_admin BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- ===== Strava: cursor de sincronización incremental por atleta =====
+CREATE TABLE IF NOT EXISTS strava_sync_state (
+    athlete_id BIGINT PRIMARY KEY,
+    last_start_date TIMESTAMPTZ,
+    last_full_sync_at TIMESTAMPTZ,
+    last_sync_at TIMESTAMPTZ
+);
+
+-- ===== Cola de trabajos (imports de Strava, rebuilds) =====
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(40) NOT NULL,
+    athlete_id BIGINT,
+    params JSONB NOT NULL DEFAULT '{}'::jsonb,
+
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',   -- queued | running | done | failed | deferred
+    progress JSONB,
+    result JSONB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker VARCHAR(120),
+
+    run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    heartbeat_at TIMESTAMPTZ
+);
+
+-- como mucho un trabajo en cola por (kind, atleta): los duplicados se fusionan
+CREATE UNIQUE INDEX IF NOT EXISTS uq_jobs_queued_kind_athlete
+  ON jobs (kind, athlete_id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_queued_run_after
+  ON jobs (run_after, id) WHERE status = 'queued';
+
+-- ===== Streams de actividades: índice de los ficheros columnares (services/stream_store.py) =====
+CREATE TABLE IF NOT EXISTS activity_stream_index (
+    activity_id BIGINT PRIMARY KEY REFERENCES activities(id) ON DELETE CASCADE,
+    athlete_id BIGINT NOT NULL,
+    "offset" BIGINT NOT NULL,        -- primera muestra en los ficheros del atleta
+    length INTEGER NOT NULL,         -- nº de muestras (0 = la actividad no tiene streams)
+    streams TEXT[] NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_activity_stream_index_athlete
+  ON activity_stream_index (athlete_id, "offset");
+
+-- ===== Curvas de máximos medios (potencia / velocidad) (services/mean_max.py) =====
+-- un valor por duración de CURVE_DURATIONS_S; NULL si la actividad es más corta
+CREATE TABLE IF NOT EXISTS activity_curves (
+    activity_id BIGINT PRIMARY KEY REFERENCES activities(id) ON DELETE CASCADE,
+    athlete_id BIGINT NOT NULL,
+    power REAL[],                    -- W
+    speed REAL[],                    -- m/s, solo carrera
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_activity_curves_athlete
+  ON activity_curves (athlete_id);
+
+-- envolvente mensual: máximo por duración de las curvas de las actividades del mes
+CREATE TABLE IF NOT EXISTS athlete_curve_months (
+    athlete_id BIGINT NOT NULL,
+    month DATE NOT NULL,             -- día 1 del mes
+    power REAL[],
+    speed REAL[],
+    activities INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (athlete_id, month)
+);
+
+-- ===== Tiempo en zona (HR / potencia / ritmo) desde streams (services/zones.py) =====
+-- segundos por zona; NULL si falta el stream o el umbral del perfil
+CREATE TABLE IF NOT EXISTS activity_zones (
+    activity_id BIGINT PRIMARY KEY REFERENCES activities(id) ON DELETE CASCADE,
+    athlete_id BIGINT NOT NULL,
+    hr_s INTEGER[],
+    power_s INTEGER[],
+    pace_s INTEGER[],
+    -- umbrales con los que se calcularon
+    lthr_bpm DOUBLE PRECISION,
+    ftp_watts DOUBLE PRECISION,
+    threshold_pace_sec_per_km DOUBLE PRECISION,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_activity_zones_athlete
+  ON activity_zones (athlete_id);
+
+-- suma diaria de activity_zones
+CREATE TABLE IF NOT EXISTS daily_zones (
+    athlete_id BIGINT NOT NULL,
+    day DATE NOT NULL,
+    hr_s INTEGER[],
+    power_s INTEGER[],
+    pace_s INTEGER[],
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (athlete_id, day)
+);
+
+-- ===== Listado de actividades paginado por cursor (routes/activities.py) =====
+-- ORDER BY start_date DESC, id DESC con WHERE (start_date, id) < cursor: index scan
+-- que empieza en el cursor, coste constante a cualquier profundidad.
+CREATE INDEX IF NOT EXISTS idx_activities_athlete_start_date_id
+  ON activities (athlete_id, start_date DESC, id DESC);
+-- lo cubre el anterior
+DROP INDEX IF EXISTS idx_activities_athlete_start_date;
+
+-- ===== Versión de datos por atleta para ETag / 304 (services/data_version.py) =====
+CREATE TABLE IF NOT EXISTS athlete_data_versions (
+    athlete_id BIGINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- +1 a la versión de cada atleta y NOTIFY (se entrega al hacer commit) para las
+-- cachés de versión de los procesos de la API. Orden por athlete_id: sin deadlocks
+-- entre transacciones que tocan varios atletas.
+CREATE OR REPLACE FUNCTION bump_athlete_data_versions(ids BIGINT[]) RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    b RECORD;
+BEGIN
+    FOR b IN
+        INSERT INTO athlete_data_versions AS v (athlete_id, version, updated_at)
+        SELECT id, 1, now() FROM unnest(ids) AS id WHERE id IS NOT NULL ORDER BY id
+        ON CONFLICT (athlete_id) DO UPDATE SET version = v.version + 1, updated_at = now()
+        RETURNING v.athlete_id, v.version, v.updated_at
+    LOOP
+        PERFORM pg_notify(
+            'athlete_data_version',
+            b.athlete_id || ':' || b.version || ':' || extract(epoch FROM b.updated_at)
+        );
+    END LOOP;
+END $$;
+
+-- triggers por sentencia (no por fila): sube la versión una vez por sentencia, así
+-- que las escrituras en bloque deben ser sentencias multi-fila (INSERT ... VALUES
+-- por trozos, UPDATE ... FROM (VALUES ...), o executemany con RETURNING, que
+-- SQLAlchemy agrupa). Un executemany sin RETURNING va fila a fila con psycopg y
+-- dispararía el trigger (y un NOTIFY) por cada fila. Las transition tables no
+-- admiten varios eventos por trigger.
+CREATE OR REPLACE FUNCTION bump_athlete_data_version_new() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM bump_athlete_data_versions(ARRAY(SELECT DISTINCT athlete_id FROM new_rows));
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION bump_athlete_data_version_old() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM bump_athlete_data_versions(ARRAY(SELECT DISTINCT athlete_id FROM old_rows));
+    RETURN NULL;
+END $$;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['activities', 'daily_metrics', 'athlete_profile'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_version_ins', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_version_upd', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_version_del', t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS new_rows '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_athlete_data_version_new()', t || '_version_ins', t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER UPDATE ON %I REFERENCING NEW TABLE AS new_rows '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_athlete_data_version_new()', t || '_version_upd', t);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS old_rows '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_athlete_data_version_old()', t || '_version_del', t);
+    END LOOP;
+END $$;
+
+-- ===== Cola de trabajos: trabajos sin atleta (metrics_rebuild_all) =====
+-- En un índice único los NULL son distintos entre sí: con (kind, athlete_id) se
+-- podían encolar varios metrics_rebuild_all a la vez. COALESCE los cuenta como uno.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_jobs_queued_kind_athlete_key
+  ON jobs (kind, COALESCE(athlete_id, 0)) WHERE status = 'queued';
+DROP INDEX IF EXISTS uq_jobs_queued_kind_athlete;
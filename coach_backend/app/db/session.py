@@ -1,11 +1,43 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool_metrics import (
+    PoolMetrics,
+    TimedAsyncAdaptedQueuePool,
+    TimedQueuePool,
+    instrument,
+    timed_pool_class,
+)
+from app.db.query_metrics import QueryMetrics, instrument_queries
+
+PRE_PING_POLICIES = ("always", "idle", "never")
+if settings.DB_POOL_PRE_PING not in PRE_PING_POLICIES:
+    raise ValueError(f"DB_POOL_PRE_PING debe ser uno de {PRE_PING_POLICIES}")
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_S,
+        "pool_recycle": settings.DB_POOL_RECYCLE_S,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING == "always",
+    }
+
 
+def _idle_ping_s() -> float | None:
+    return settings.DB_POOL_PRE_PING_IDLE_S if settings.DB_POOL_PRE_PING == "idle" else None
+
+
+sync_pool_metrics = PoolMetrics("sync", settings.DB_POOL_LONG_HELD_S)
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,
+    poolclass=timed_pool_class(TimedQueuePool, sync_pool_metrics),
+    **_pool_options(),
 )
+instrument(engine, sync_pool_metrics, _idle_ping_s())
+instrument_queries(engine, QueryMetrics("sync", settings.DB_SLOW_QUERY_MS / 1000))
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -20,3 +52,27 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Motor async (psycopg3 en modo async, misma DATABASE_URL) para las rutas de lectura
+# más llamadas: se ejecutan en el event loop en vez de ocupar un hilo del threadpool
+# mientras esperan a Postgres. Import, rebuild y worker siguen con el motor sync.
+async_pool_metrics = PoolMetrics("async", settings.DB_POOL_LONG_HELD_S)
+async_engine = create_async_engine(
+    settings.DATABASE_URL,
+    poolclass=timed_pool_class(TimedAsyncAdaptedQueuePool, async_pool_metrics),
+    **_pool_options(),
+)
+instrument(async_engine.sync_engine, async_pool_metrics, _idle_ping_s())
+instrument_queries(async_engine.sync_engine, QueryMetrics("async", settings.DB_SLOW_QUERY_MS / 1000))
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes.health import router as health_router
@@ -11,10 +13,34 @@ from app.api.routes.metrics_summary import router as metrics_summary_router
 from app.api.routes.activity_write import router as activity_write_router
 from app.api.routes.races import router as races
 from app.api.routes.auth import router as auth
+from app.api.routes.jobs import router as jobs_router
+from app.api.routes.curves import router as curves_router
+from app.api.routes.zones import router as zones_router
+from app.api.routes.cache import router as cache_router
+from app.api.routes.dashboard import router as dashboard_router
+from app.api.routes.internal import router as internal_router
+from app.api.middleware import ProfilingMiddleware, RequestTelemetryMiddleware
+from app.core.config import settings
+from app.db.session import async_engine
+from app.services.data_version import data_versions
+from app.services.strava_client import close_http_clients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DATA_VERSION_LISTEN:
+        data_versions.start()
+    yield
+    data_versions.stop()
+    await close_http_clients()
+    await async_engine.dispose()
 
 
+app = FastAPI(title="Coach AI Backend", lifespan=lifespan)
 
-app = FastAPI(title="Coach AI Backend")
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestTelemetryMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -39,3 +65,9 @@ app.include_router(metrics_summary_router)
 #app.include_router(activity_write_router)
 app.include_router(races)
 app.include_router(auth)
+app.include_router(jobs_router)
+app.include_router(curves_router)
+app.include_router(zones_router)
+app.include_router(cache_router)
+app.include_router(dashboard_router)
+app.include_router(internal_router)
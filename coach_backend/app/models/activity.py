@@ -1,4 +1,4 @@
-from sqlalchemy import String, BigInteger, Float, DateTime, Boolean, UniqueConstraint, Date
+from sqlalchemy import String, BigInteger, Float, DateTime, Boolean, UniqueConstraint, Date, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime, date
 from app.db.base import Base
@@ -8,6 +8,10 @@ class Activity(Base):
     __tablename__ = "activities"
     __table_args__ = (
         UniqueConstraint("strava_activity_id", name="uq_activity_strava_id"),
+        # listado paginado por cursor: ORDER BY start_date DESC, id DESC
+        Index("idx_activities_athlete_start_date_id", "athlete_id", text("start_date DESC"), text("id DESC")),
+        # filtros from_day / to_day
+        Index("idx_activities_athlete_day", "athlete_id", "day"),
     )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
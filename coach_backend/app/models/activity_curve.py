@@ -0,0 +1,28 @@
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, REAL
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.db.base import Base
+
+
+class ActivityCurve(Base):
+    """
+    Curvas de máximos medios de una actividad (services/mean_max.py): un valor por
+    duración de CURVE_DURATIONS_S, NULL si la actividad es más corta.
+    """
+    __tablename__ = "activity_curves"
+    __table_args__ = (
+        Index("idx_activity_curves_athlete", "athlete_id"),
+    )
+
+    activity_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True
+    )
+    athlete_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    # W; solo si la actividad tiene stream de potencia
+    power: Mapped[list[float] | None] = mapped_column(ARRAY(REAL), nullable=True)
+    # m/s; solo carrera (el ritmo se deriva al responder)
+    speed: Mapped[list[float] | None] = mapped_column(ARRAY(REAL), nullable=True)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
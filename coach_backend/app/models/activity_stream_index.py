@@ -0,0 +1,29 @@
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index, Integer, Text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.db.base import Base
+
+
+class ActivityStreamIndex(Base):
+    """
+    Dónde están los streams de una actividad dentro de los ficheros columnares del
+    atleta (services/stream_store.py): muestras [offset, offset + length).
+    length = 0 => Strava no tiene streams para la actividad (manual...), no se reintenta.
+    """
+    __tablename__ = "activity_stream_index"
+    __table_args__ = (
+        Index("idx_activity_stream_index_athlete", "athlete_id", "offset"),
+    )
+
+    activity_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True
+    )
+    athlete_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    offset: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    length: Mapped[int] = mapped_column(Integer, nullable=False)
+    # streams que traía Strava; el resto de columnas del segmento van con valor "sin dato"
+    streams: Mapped[list[str]] = mapped_column(ARRAY(Text), nullable=False, default=list)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,32 @@
+from sqlalchemy import BigInteger, DateTime, Float, ForeignKey, Index, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.db.base import Base
+
+
+class ActivityZones(Base):
+    """
+    Tiempo en zona (s) de una actividad calculado de sus streams (services/zones.py).
+    Un array por tipo de zona; NULL si falta el stream o el umbral del perfil.
+    """
+    __tablename__ = "activity_zones"
+    __table_args__ = (
+        Index("idx_activity_zones_athlete", "athlete_id"),
+    )
+
+    activity_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True
+    )
+    athlete_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    hr_s: Mapped[list[int] | None] = mapped_column(ARRAY(Integer), nullable=True)
+    power_s: Mapped[list[int] | None] = mapped_column(ARRAY(Integer), nullable=True)
+    pace_s: Mapped[list[int] | None] = mapped_column(ARRAY(Integer), nullable=True)
+
+    # umbrales con los que se calcularon las zonas
+    lthr_bpm: Mapped[float | None] = mapped_column(Float, nullable=True)
+    ftp_watts: Mapped[float | None] = mapped_column(Float, nullable=True)
+    threshold_pace_sec_per_km: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
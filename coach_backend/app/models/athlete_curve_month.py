@@ -0,0 +1,23 @@
+from sqlalchemy import BigInteger, Date, DateTime, Integer, REAL
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime, date
+from app.db.base import Base
+
+
+class AthleteCurveMonth(Base):
+    """
+    Envolvente mensual de las curvas de máximos medios de un atleta: el máximo por
+    duración de las activity_curves del mes. Las consultas por rango de fechas
+    combinan estas filas en vez de todas las actividades.
+    """
+    __tablename__ = "athlete_curve_months"
+
+    athlete_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    month: Mapped[date] = mapped_column(Date, primary_key=True)   # día 1 del mes
+
+    power: Mapped[list[float] | None] = mapped_column(ARRAY(REAL), nullable=True)
+    speed: Mapped[list[float] | None] = mapped_column(ARRAY(REAL), nullable=True)
+    activities: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,17 @@
+from sqlalchemy import BigInteger, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.db.base import Base
+
+
+class AthleteDataVersion(Base):
+    """
+    Versión de los datos de un atleta (activities, daily_metrics, athlete_profile).
+    La suben los triggers de schema.sql en cada cambio; es la base del ETag de los
+    endpoints de lectura (services/data_version.py).
+    """
+    __tablename__ = "athlete_data_versions"
+
+    athlete_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -14,6 +14,10 @@ class AthleteProfile(Base):
     threshold_pace_sec_per_km: Mapped[float | None] = mapped_column(Float, nullable=True)
     target_weekly_tss: Mapped[float | None] = mapped_column(Float, nullable=True)
 
+    # Constantes de tiempo (días) del modelo CTL/ATL; NULL => 42 / 7
+    ctl_time_constant: Mapped[float | None] = mapped_column(Float, nullable=True)
+    atl_time_constant: Mapped[float | None] = mapped_column(Float, nullable=True)
+
     name: Mapped[str | None] = mapped_column(String, nullable=True)
     surname1: Mapped[str | None] = mapped_column(String, nullable=True)
     surname2: Mapped[str | None] = mapped_column(String, nullable=True)
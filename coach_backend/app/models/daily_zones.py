@@ -0,0 +1,19 @@
+from sqlalchemy import BigInteger, Date, DateTime, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime, date
+from app.db.base import Base
+
+
+class DailyZones(Base):
+    """Tiempo en zona (s) por día: suma de las activity_zones de las actividades del día."""
+    __tablename__ = "daily_zones"
+
+    athlete_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    hr_s: Mapped[list[int] | None] = mapped_column(ARRAY(Integer), nullable=True)
+    power_s: Mapped[list[int] | None] = mapped_column(ARRAY(Integer), nullable=True)
+    pace_s: Mapped[list[int] | None] = mapped_column(ARRAY(Integer), nullable=True)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
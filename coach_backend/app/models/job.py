@@ -0,0 +1,41 @@
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.db.base import Base
+
+
+class Job(Base):
+    """
+    Trabajo en segundo plano (import de Strava, rebuild de métricas...). Lo ejecuta
+    un worker (app/cli/worker.py) que lo reclama con FOR UPDATE SKIP LOCKED.
+    Estados: queued -> running -> done | failed | deferred.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # como mucho un trabajo en cola por (kind, atleta): los duplicados se fusionan.
+        # COALESCE: los trabajos sin atleta (metrics_rebuild_all) también son únicos
+        Index(
+            "uq_jobs_queued_kind_athlete_key", "kind", text("COALESCE(athlete_id, 0)"),
+            unique=True, postgresql_where=text("status = 'queued'"),
+        ),
+        Index("idx_jobs_queued_run_after", "run_after", "id", postgresql_where=text("status = 'queued'")),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(40), nullable=False)
+    athlete_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    params: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="queued")
+    progress: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    result: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    worker: Mapped[str | None] = mapped_column(String(120), nullable=True)
+
+    run_after: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,18 @@
+from sqlalchemy import BigInteger, Date, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime, date
+from app.db.base import Base
+
+
+class MetricsDirtyDay(Base):
+    """
+    Primer día (por atleta) cuyas daily_metrics han quedado desactualizadas.
+    Solo guardamos el más antiguo: CTL/ATL se arrastran hacia delante, así que
+    todo lo posterior hay que recalcularlo igualmente.
+    """
+    __tablename__ = "metrics_dirty_days"
+
+    athlete_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    dirty_from: Mapped[date] = mapped_column(Date, nullable=False)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,20 @@
+from sqlalchemy import BigInteger, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from app.db.base import Base
+
+
+class StravaSyncState(Base):
+    """
+    Cursor de sincronización con Strava por atleta: el start_date más reciente
+    importado (los syncs normales piden solo lo posterior con `after`) y cuándo
+    fue el último sync completo (para recoger ediciones de actividades antiguas; las
+    borradas en Strava no se detectan y se quedan en la BD).
+    """
+    __tablename__ = "strava_sync_state"
+
+    athlete_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+
+    last_start_date: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_full_sync_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_sync_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -8,6 +8,8 @@ class AthleteProfileUpsert(BaseModel):
     lthr_bpm: float | None = Field(default=None, ge=0)
     threshold_pace_sec_per_km: float | None = Field(default=None, ge=0)
     target_weekly_tss: float | None = Field(default=None, ge=0)
+    ctl_time_constant: float | None = Field(default=None, ge=1)
+    atl_time_constant: float | None = Field(default=None, ge=1)
 
 
 class AthleteProfileOut(BaseModel):
@@ -16,6 +18,8 @@ class AthleteProfileOut(BaseModel):
     lthr_bpm: float | None
     threshold_pace_sec_per_km: float | None
     target_weekly_tss: float | None
+    ctl_time_constant: float | None = None
+    atl_time_constant: float | None = None
     name: str | None
     surname1: str | None
     surname2: str | None
@@ -33,4 +33,3 @@ class MeOut(BaseModel):
 
 class LinkAthleteIn(BaseModel):
     athlete_id: int
-    role: str = "athlete"
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.activity import Activity
+
+
+ACTIVITY_COLUMNS = Activity.__table__.c
+ACTIVITY_FIELDS: tuple[str, ...] = tuple(ACTIVITY_COLUMNS.keys())
+
+
+def activity_to_dict(a: Activity) -> dict[str, Any]:
+    """Devuelve TODOS los campos del modelo Activity"""
+    return {name: getattr(a, name) for name in ACTIVITY_FIELDS}
+
+
+def parse_fields(fields: str | None) -> tuple[str, ...]:
+    """
+    `fields=id,name,start_date` -> nombres de columna validados (en el orden pedido,
+    sin repetidos). Sin `fields`: todas. ValueError si alguno no existe.
+    """
+    if not fields:
+        return ACTIVITY_FIELDS
+    names = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [n for n in names if n not in ACTIVITY_COLUMNS]
+    if unknown:
+        raise ValueError(f"campos desconocidos: {', '.join(unknown)}")
+    return names or ACTIVITY_FIELDS
+
+
+def select_fields(names: Iterable[str]) -> Select:
+    """SELECT de solo esas columnas (Core: filas tuple, sin objetos ORM ni identity map)."""
+    return select(*(ACTIVITY_COLUMNS[n] for n in names))
+
+
+def fetch_dicts(db: Session, q: Select) -> list[dict[str, Any]]:
+    result = db.execute(q)
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+async def afetch_dicts(db: AsyncSession, q: Select) -> list[dict[str, Any]]:
+    result = await db.execute(q)
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
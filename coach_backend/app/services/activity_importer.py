@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 from datetime import datetime
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
 from sqlalchemy.dialects.postgresql import insert
 
 from app.models.activity import Activity
+from app.services.dirty_days import mark_dirty
+from app.services.metrics_calculator import compute_local_day
+from app.services.response_cache import invalidate_on_commit
 
 
 RUN_SPORTS = {"Run", "TrailRun", "VirtualRun", "RaceRun"}
@@ -37,14 +41,24 @@ def _normalize_running_cadence(sport_type: str, raw_cadence) -> float | None:
 
 
 def upsert_activities(db: Session, athlete_id: int, activities: list[dict]) -> int:
+    return len(upsert_activities_written(db, athlete_id, activities))
+
+
+def upsert_activities_written(db: Session, athlete_id: int, activities: list[dict]) -> list[int]:
+    """
+    Upsert de una página de actividades de Strava, con commit. Devuelve los id
+    (PK) de las filas insertadas o modificadas; las idénticas no se reescriben.
+    """
     if not activities:
-        return 0
+        return []
 
     rows = []
     for a in activities:
         sport_type = _normalize_sport_type(a)
 
         cadence = _normalize_running_cadence(sport_type, a.get("average_cadence"))
+        start_date = parse_dt(a["start_date"])
+        tz = a.get("timezone") or ""
 
         rows.append(
             {
@@ -53,8 +67,9 @@ def upsert_activities(db: Session, athlete_id: int, activities: list[dict]) -> i
 
                 "name": a.get("name") or "",
                 "sport_type": sport_type,
-                "start_date": parse_dt(a["start_date"]),
-                "timezone": a.get("timezone") or "",
+                "start_date": start_date,
+                "timezone": tz,
+                "day": compute_local_day(start_date, tz),
 
                 "distance_m": float(a.get("distance") or 0.0),
                 "moving_time_s": int(a.get("moving_time") or 0),
@@ -85,13 +100,19 @@ def upsert_activities(db: Session, athlete_id: int, activities: list[dict]) -> i
             }
         )
 
-    stmt = insert(Activity).values(rows)
+    # executemany en Core (insertmanyvalues): la sentencia se compila una vez y queda
+    # en la caché. Un .values(rows) de 200 filas se recompila entero en cada página, y
+    # el bulk insert del ORM agrupa las filas según qué campos traen None (una
+    # compilación por grupo).
+    activities_t = Activity.__table__
+    stmt = insert(activities_t)
 
     update_cols = {
         "name": stmt.excluded.name,
         "sport_type": stmt.excluded.sport_type,
         "start_date": stmt.excluded.start_date,
         "timezone": stmt.excluded.timezone,
+        "day": stmt.excluded.day,
         "distance_m": stmt.excluded.distance_m,
         "moving_time_s": stmt.excluded.moving_time_s,
         "elapsed_time_s": stmt.excluded.elapsed_time_s,
@@ -120,11 +141,35 @@ def upsert_activities(db: Session, athlete_id: int, activities: list[dict]) -> i
         "updated_at": datetime.utcnow(),
     }
 
+    # Solo reescribimos filas que han cambiado: un re-import idéntico no genera
+    # escrituras ni marca días para recalcular.
+    compared = [c for c in update_cols if c != "updated_at"]
+    changed = tuple_(*[activities_t.c[c] for c in compared]).is_distinct_from(
+        tuple_(*[stmt.excluded[c] for c in compared])
+    )
+
     stmt = stmt.on_conflict_do_update(
         constraint="uq_activity_strava_id",
         set_=update_cols,
+        where=changed,
+    ).returning(activities_t.c.id, activities_t.c.strava_activity_id, activities_t.c.day)
+
+    # day anterior de las que ya existían (si cambia start_date/timezone, el día viejo también cambia)
+    old_days = dict(
+        db.execute(
+            select(Activity.strava_activity_id, Activity.day).where(
+                Activity.strava_activity_id.in_([r["strava_activity_id"] for r in rows])
+            )
+        ).all()
     )
 
-    result = db.execute(stmt)
+    written = db.execute(stmt, rows).all()
+
+    dirty = [day for _, _, day in written]
+    dirty += [old_days.get(strava_id) for _, strava_id, _ in written]
+    mark_dirty(db, athlete_id, dirty)
+    if written:
+        invalidate_on_commit(db, athlete_id)
+
     db.commit()
-    return result.rowcount or len(rows)
+    return [activity_id for activity_id, _, _ in written]
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from typing import Callable, Iterable
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.models.activity import Activity
+from app.services.metrics_calculator import rebuild_daily_metrics, rebuild_dirty_daily_metrics
+
+logger = logging.getLogger(__name__)
+
+# Chunks por proceso: más chunks que procesos para que los atletas grandes no
+# dejen al resto de procesos ociosos al final.
+CHUNKS_PER_WORKER = 4
+
+
+@dataclass
+class RebuildChunk:
+    athlete_ids: list[int] = field(default_factory=list)
+    weight: int = 0
+
+
+def list_athletes(db: Session, athlete_ids: Iterable[int] | None = None) -> list[tuple[int, int]]:
+    """(athlete_id, nº actividades) de los atletas con actividades, opcionalmente filtrados."""
+    q = (
+        select(Activity.athlete_id, func.count(Activity.id))
+        .group_by(Activity.athlete_id)
+    )
+    if athlete_ids is not None:
+        q = q.where(Activity.athlete_id.in_(list(athlete_ids)))
+    return [(int(a), int(n)) for a, n in db.execute(q).all()]
+
+
+def plan_chunks(athletes: list[tuple[int, int]], n_chunks: int) -> list[RebuildChunk]:
+    """
+    Reparte los atletas en `n_chunks` chunks de peso (nº actividades) parecido:
+    greedy LPT, el atleta más grande va al chunk más ligero. Devuelve los chunks
+    de más a menos pesado, que es el orden en que conviene encolarlos.
+    """
+    n_chunks = max(1, min(n_chunks, len(athletes)))
+    heap: list[tuple[int, int]] = [(0, i) for i in range(n_chunks)]
+    chunks = [RebuildChunk() for _ in range(n_chunks)]
+
+    for athlete_id, n_acts in sorted(athletes, key=lambda a: a[1], reverse=True):
+        weight, i = heapq.heappop(heap)
+        chunks[i].athlete_ids.append(athlete_id)
+        # +1: los atletas sin histórico también cuestan una transacción
+        chunks[i].weight += n_acts + 1
+        heapq.heappush(heap, (chunks[i].weight, i))
+
+    return sorted((c for c in chunks if c.athlete_ids), key=lambda c: c.weight, reverse=True)
+
+
+def effective_workers(requested: int | None) -> int:
+    cpus = os.cpu_count() or 1
+    workers = requested or cpus
+    return max(1, min(workers, cpus, settings.REBUILD_MAX_DB_CONNECTIONS))
+
+
+# ---------- lado worker (un engine propio por proceso) ----------
+
+_worker_session: sessionmaker | None = None
+
+
+def _init_worker() -> None:
+    global _worker_session
+    engine = create_engine(
+        settings.DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=1,
+        max_overflow=0,
+    )
+    _worker_session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _rebuild_chunk(athlete_ids: list[int], incremental: bool, force: bool) -> list[dict]:
+    assert _worker_session is not None, "_init_worker no se ha ejecutado"
+    results = []
+    with _worker_session() as db:
+        for athlete_id in athlete_ids:
+            t0 = time.perf_counter()
+            try:
+                if incremental:
+                    r = rebuild_dirty_daily_metrics(db, athlete_id)
+                else:
+                    r = rebuild_daily_metrics(db, athlete_id, force=force)
+                results.append({
+                    "athlete_id": athlete_id,
+                    "ok": True,
+                    "seconds": round(time.perf_counter() - t0, 3),
+                    "daily_rows": r.get("daily_rows", 0),
+                })
+            except Exception as e:
+                db.rollback()
+                results.append({
+                    "athlete_id": athlete_id,
+                    "ok": False,
+                    "seconds": round(time.perf_counter() - t0, 3),
+                    "error": repr(e),
+                })
+    return results
+
+
+# ---------- orquestación ----------
+
+ProgressCallback = Callable[[int, int, list[dict]], None]
+
+
+def rebuild_all(
+    db: Session,
+    athlete_ids: Iterable[int] | None = None,
+    workers: int | None = None,
+    incremental: bool = False,
+    force: bool = False,
+    on_progress: ProgressCallback | None = None,
+) -> dict:
+    """
+    Rebuild de daily_metrics de todos los atletas (o los indicados) en un pool
+    de procesos. `db` solo se usa para listar atletas; cada proceso abre su
+    propio engine con una única conexión.
+    """
+    t0 = time.perf_counter()
+    athletes = list_athletes(db, athlete_ids)
+    db.close()
+
+    n_workers = effective_workers(workers)
+    chunks = plan_chunks(athletes, n_workers * CHUNKS_PER_WORKER)
+
+    results: list[dict] = []
+    if chunks:
+        # spawn: no heredamos conexiones ni hilos del proceso padre (p.ej. uvicorn)
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+        ) as pool:
+            futures = [pool.submit(_rebuild_chunk, c.athlete_ids, incremental, force) for c in chunks]
+            for done, fut in enumerate(as_completed(futures), start=1):
+                chunk_results = fut.result()
+                results.extend(chunk_results)
+                if on_progress:
+                    on_progress(done, len(futures), chunk_results)
+                logger.info("rebuild_all: chunk %d/%d (%d atletas)", done, len(futures), len(chunk_results))
+
+    failed = [r for r in results if not r["ok"]]
+    return {
+        "athletes": len(results),
+        "failed": len(failed),
+        "workers": n_workers,
+        "chunks": len(chunks),
+        "incremental": incremental,
+        "seconds": round(time.perf_counter() - t0, 3),
+        "results": sorted(results, key=lambda r: r["seconds"], reverse=True),
+    }
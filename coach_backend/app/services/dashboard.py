@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Iterable
+
+from sqlalchemy import Date, Numeric, Select, Text, cast, func, literal, select, text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from app.models.activity import Activity
+from app.models.athlete_profile import AthleteProfile
+from app.models.daily_metrics import DailyMetric
+from app.services.activity_fields import ACTIVITY_FIELDS, select_fields
+
+
+DASHBOARD_SECTIONS = ("latest", "history", "activities", "weekly")
+
+_EMPTY_JSON_ARRAY = text("'[]'::json")
+
+
+def parse_sections(sections: str | None) -> tuple[str, ...]:
+    """`sections=latest,history` -> secciones validadas. Sin `sections`: todas."""
+    if not sections:
+        return DASHBOARD_SECTIONS
+    names = tuple(dict.fromkeys(s.strip() for s in sections.split(",") if s.strip()))
+    unknown = [n for n in names if n not in DASHBOARD_SECTIONS]
+    if unknown:
+        raise ValueError(f"secciones desconocidas: {', '.join(unknown)}")
+    return names or DASHBOARD_SECTIONS
+
+
+def _json_array(sub, order_by):
+    """Filas de `sub` como array JSON ordenado ('[]' si no hay)."""
+    return (
+        select(func.coalesce(func.json_agg(aggregate_order_by(sub.table_valued(), *order_by)), _EMPTY_JSON_ARRAY))
+        .scalar_subquery()
+    )
+
+
+def _latest(athlete_id: int):
+    sub = (
+        select(DailyMetric)
+        .where(DailyMetric.athlete_id == athlete_id)
+        .order_by(DailyMetric.day.desc())
+        .limit(1)
+        .subquery("latest")
+    )
+    return select(func.row_to_json(sub.table_valued())).scalar_subquery()
+
+
+def _round1(col):
+    return func.round(cast(col, Numeric), 1)
+
+
+def _history(athlete_id: int, days: int):
+    # como /metrics/ctl-atl/last-7-days: los últimos `days` días guardados, ASC
+    sub = (
+        select(
+            DailyMetric.day,
+            _round1(DailyMetric.ctl).label("ctl"),
+            _round1(DailyMetric.atl).label("atl"),
+            _round1(DailyMetric.tsb).label("tsb"),
+        )
+        .where(DailyMetric.athlete_id == athlete_id)
+        .order_by(DailyMetric.day.desc())
+        .limit(days)
+        .subquery("history")
+    )
+    return _json_array(sub, [sub.c.day])
+
+
+def _activities(athlete_id: int, from_day: date, to_day: date, limit: int, fields: Iterable[str]):
+    fields = tuple(fields)
+    q = (
+        select_fields(fields)
+        .where(Activity.athlete_id == athlete_id, Activity.day >= from_day, Activity.day <= to_day)
+        .order_by(Activity.start_date.desc(), Activity.id.desc())
+        .limit(limit)
+    )
+    if "start_date" in fields and "id" in fields:
+        sub = q.subquery("activities")
+        return _json_array(sub, [sub.c.start_date.desc(), sub.c.id.desc()])
+
+    # sin las columnas de orden en fields: se leen aparte y el objeto se arma solo
+    # con las pedidas (json_build_object, algo menos compacto que row_to_json)
+    sub = q.add_columns(Activity.start_date.label("_order_start"), Activity.id.label("_order_id")).subquery("activities")
+    row = func.json_build_object(*(arg for n in fields for arg in (literal(n), sub.c[n])))
+    return (
+        select(func.coalesce(
+            func.json_agg(aggregate_order_by(row, sub.c._order_start.desc(), sub.c._order_id.desc())),
+            _EMPTY_JSON_ARRAY,
+        ))
+        .scalar_subquery()
+    )
+
+
+def _weekly(athlete_id: int, weeks: int):
+    """
+    Lo mismo que compute_weekly_summary hasta el último día con daily_metrics:
+    rampa de CTL a 7 días y TSS por semana (lunes) frente al objetivo del perfil.
+    """
+    dm = DailyMetric
+    to_day = select(func.max(dm.day)).where(dm.athlete_id == athlete_id).scalar_subquery()
+
+    def ctl_on(day):
+        return select(dm.ctl).where(dm.athlete_id == athlete_id, dm.day == day).scalar_subquery()
+
+    target = (
+        select(func.nullif(AthleteProfile.target_weekly_tss, 0.0))
+        .where(AthleteProfile.athlete_id == athlete_id)
+        .scalar_subquery()
+    )
+    week_start = cast(func.date_trunc("week", dm.day), Date)
+    first_week = cast(func.date_trunc("week", to_day), Date) - (weeks - 1) * 7
+    sub = (
+        select(week_start.label("week_start"), func.sum(dm.tss).label("tss_week"))
+        .where(dm.athlete_id == athlete_id, dm.day >= first_week, dm.day <= to_day)
+        .group_by(week_start)
+        .subquery("weeks")
+    )
+    week_rows = (
+        select(
+            func.coalesce(
+                func.json_agg(aggregate_order_by(
+                    func.json_build_object(
+                        "week_start", sub.c.week_start,
+                        "tss_week", sub.c.tss_week,
+                        "target_weekly_tss", target,
+                        "compliance", sub.c.tss_week / target,
+                    ),
+                    sub.c.week_start,
+                )),
+                _EMPTY_JSON_ARRAY,
+            )
+        )
+        .scalar_subquery()
+    )
+    return func.json_build_object(
+        "to_day", to_day,
+        "ramp_rate_7d", ctl_on(to_day) - ctl_on(to_day - 7),
+        "weeks", week_rows,
+    )
+
+
+def dashboard_query(
+    athlete_id: int,
+    version: int,
+    sections: Iterable[str] = DASHBOARD_SECTIONS,
+    history_days: int = 7,
+    activities_days: int = 7,
+    activities_limit: int = 50,
+    activity_fields: Iterable[str] = ACTIVITY_FIELDS,
+    weeks: int = 4,
+    today: date | None = None,
+) -> Select:
+    """
+    Todo el dashboard en una sola consulta: cada sección es una subconsulta escalar
+    dentro de un json_build_object y Postgres devuelve el documento ya serializado
+    (una fila, una columna de texto), que se responde tal cual sin pasar por
+    objetos Python.
+    """
+    today = today or date.today()
+    builders = {
+        "latest": lambda: _latest(athlete_id),
+        "history": lambda: _history(athlete_id, history_days),
+        "activities": lambda: _activities(
+            athlete_id, today - timedelta(days=activities_days), today, activities_limit, activity_fields
+        ),
+        "weekly": lambda: _weekly(athlete_id, weeks),
+    }
+    pairs = [literal("athlete_id"), literal(athlete_id), literal("version"), literal(version)]
+    for name in sections:
+        pairs += [literal(name), builders[name]()]
+    return select(cast(func.json_build_object(*pairs), Text))
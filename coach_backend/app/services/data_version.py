@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass, replace
+from datetime import date, datetime, time, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+import psycopg
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import get_async_db, get_db
+from app.models.athlete_data_version import AthleteDataVersion
+
+logger = logging.getLogger(__name__)
+
+# canal de los NOTIFY de los triggers de schema.sql (payload "athlete_id:version:epoch")
+CHANNEL = "athlete_data_version"
+# reintento de la conexión LISTEN tras un error
+LISTEN_RETRY_S = 5.0
+
+
+@dataclass(frozen=True)
+class DataVersion:
+    athlete_id: int
+    version: int
+    updated_at: datetime | None
+    # día de referencia de respuestas con ventanas relativas a hoy (ver for_day)
+    day: date | None = None
+
+    @property
+    def etag(self) -> str:
+        if self.day is not None:
+            return f'W/"a{self.athlete_id}-v{self.version}-d{self.day.isoformat()}"'
+        return f'W/"a{self.athlete_id}-v{self.version}"'
+
+    def for_day(self, day: date) -> DataVersion:
+        """
+        Validador para una respuesta que depende también de `day` (hoy): el ETag lleva
+        la fecha y Last-Modified no es anterior a su medianoche (hora del servidor),
+        así que al cambiar de día no hay 304 con la ventana del día anterior.
+        """
+        midnight = datetime.combine(day, time.min).astimezone()
+        updated_at = midnight if self.updated_at is None else max(self.updated_at, midnight)
+        return replace(self, updated_at=updated_at, day=day)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "ETag": self.etag,
+            # el navegador guarda la respuesta pero revalida siempre (If-None-Match)
+            "Cache-Control": "private, no-cache",
+        }
+        if self.updated_at is not None:
+            headers["Last-Modified"] = format_datetime(self.updated_at.astimezone(timezone.utc), usegmt=True)
+        return headers
+
+    def matches(self, request: Request) -> bool:
+        """¿La copia del cliente sigue vigente? If-None-Match manda sobre If-Modified-Since."""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = {t.strip() for t in if_none_match.split(",")}
+            return "*" in tags or self.etag in tags or self.etag.removeprefix("W/") in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and self.updated_at is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            # Last-Modified va con resolución de segundos
+            return self.updated_at.replace(microsecond=0) <= since
+        return False
+
+
+class DataVersionCache:
+    """
+    Versiones de datos por atleta (tabla athlete_data_versions, la mantienen triggers).
+
+    Sin caché, cada consulta es un SELECT por PK. Con el listener activo (LISTEN
+    athlete_data_version en una conexión propia), los NOTIFY de los triggers mantienen
+    las versiones al día en memoria y las consultas repetidas no tocan la BD. Si la
+    conexión LISTEN cae, se vacía la caché y se vuelve al SELECT hasta reconectar:
+    nunca se sirve una versión que podría estar desfasada.
+    """
+
+    def __init__(self):
+        self._versions: dict[int, DataVersion] = {}
+        self._lock = threading.Lock()
+        self._listening = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # cambia en cada (re)conexión del listener: un SELECT hecho antes no se cachea
+        self._generation = 0
+        self.counters = {"hits": 0, "db_reads": 0, "notifications": 0}
+
+    def get(self, db: Session, athlete_id: int) -> DataVersion:
+        generation, listening, cached = self._cached(athlete_id)
+        if cached is not None:
+            return cached
+        row = db.execute(self._select(athlete_id)).first()
+        return self._loaded(athlete_id, row, generation, listening)
+
+    async def aget(self, db: AsyncSession, athlete_id: int) -> DataVersion:
+        """Como get, con la sesión async."""
+        generation, listening, cached = self._cached(athlete_id)
+        if cached is not None:
+            return cached
+        row = (await db.execute(self._select(athlete_id))).first()
+        return self._loaded(athlete_id, row, generation, listening)
+
+    def _cached(self, athlete_id: int) -> tuple[int, bool, DataVersion | None]:
+        generation = self._generation
+        listening = self._listening.is_set()
+        cached = self._versions.get(athlete_id) if listening else None
+        if cached is not None:
+            self.counters["hits"] += 1
+        return generation, listening, cached
+
+    @staticmethod
+    def _select(athlete_id: int):
+        return (
+            select(AthleteDataVersion.version, AthleteDataVersion.updated_at)
+            .where(AthleteDataVersion.athlete_id == athlete_id)
+        )
+
+    def _loaded(self, athlete_id: int, row, generation: int, listening: bool) -> DataVersion:
+        self.counters["db_reads"] += 1
+        current = DataVersion(athlete_id, row.version if row else 0, row.updated_at if row else None)
+        if listening:
+            current = self._store(current, generation)
+        return current
+
+    def _store(self, v: DataVersion, generation: int | None = None) -> DataVersion:
+        # las versiones solo crecen: un NOTIFY puede llegar antes que el SELECT que
+        # leyó la versión anterior, y no debe pisarse con ella
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return v
+            cached = self._versions.get(v.athlete_id)
+            if cached is None or v.version > cached.version:
+                self._versions[v.athlete_id] = v
+                return v
+            return cached
+
+    def _on_notify(self, payload: str) -> None:
+        athlete_id, version, epoch = payload.split(":")
+        self.counters["notifications"] += 1
+        self._store(DataVersion(int(athlete_id), int(version), datetime.fromtimestamp(float(epoch), tz=timezone.utc)))
+
+    # ---------- listener ----------
+
+    def start(self, conninfo: str | None = None) -> None:
+        if self._thread is not None:
+            return
+        conninfo = conninfo or make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, args=(conninfo,), name="data-version-listen", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=LISTEN_RETRY_S + 1)
+            self._thread = None
+
+    def wait_listening(self, timeout: float) -> bool:
+        return self._listening.wait(timeout)
+
+    def _listen(self, conninfo: str) -> None:
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    with self._lock:
+                        self._generation += 1
+                    self._listening.set()
+                    while not self._stop.is_set():
+                        for n in conn.notifies(timeout=1.0):
+                            self._on_notify(n.payload)
+            except Exception:
+                logger.exception("LISTEN %s: conexión perdida, reintento en %.0fs", CHANNEL, LISTEN_RETRY_S)
+            finally:
+                self._listening.clear()
+                with self._lock:
+                    self._generation += 1
+                    self._versions.clear()
+            self._stop.wait(LISTEN_RETRY_S)
+
+
+data_versions = DataVersionCache()
+
+
+def athlete_data_version(
+    athlete_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+) -> DataVersion:
+    """
+    Dependencia para endpoints de lectura por atleta: si la copia del cliente sigue
+    vigente responde 304 antes de ejecutar el endpoint; si no, pone ETag /
+    Last-Modified en la respuesta. Los endpoints que devuelven un Response propio
+    deben copiar `version.headers`.
+    """
+    return _conditional(data_versions.get(db, athlete_id), request, response)
+
+
+async def async_athlete_data_version(
+    athlete_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+) -> DataVersion:
+    """athlete_data_version para las rutas async (sesión async)."""
+    return _conditional(await data_versions.aget(db, athlete_id), request, response)
+
+
+async def async_athlete_data_version_today(
+    athlete_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+) -> DataVersion:
+    """
+    async_athlete_data_version para respuestas con ventanas relativas a hoy: el
+    validador incluye la fecha (DataVersion.for_day) y el endpoint debe usar
+    `version.day` como hoy.
+    """
+    version = await data_versions.aget(db, athlete_id)
+    return _conditional(version.for_day(date.today()), request, response)
+
+
+def _conditional(version: DataVersion, request: Request, response: Response) -> DataVersion:
+    if version.matches(request):
+        raise HTTPException(status_code=304, headers=version.headers)
+    response.headers.update(version.headers)
+    return version
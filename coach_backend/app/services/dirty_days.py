@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Iterable
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.metrics_dirty_day import MetricsDirtyDay
+
+
+def mark_dirty(db: Session, athlete_id: int, days: Iterable[date | None]) -> date | None:
+    """
+    Marca como pendientes de recalcular las daily_metrics desde el día más antiguo
+    de `days`. No hace commit: se confirma junto con el cambio que lo provoca.
+    """
+    earliest = min((d for d in days if d is not None), default=None)
+    if earliest is None:
+        return None
+
+    stmt = insert(MetricsDirtyDay).values(
+        athlete_id=athlete_id,
+        dirty_from=earliest,
+        updated_at=datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["athlete_id"],
+        set_={
+            "dirty_from": func.least(MetricsDirtyDay.dirty_from, stmt.excluded.dirty_from),
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt)
+    return earliest
+
+
+def get_dirty(db: Session, athlete_id: int) -> MetricsDirtyDay | None:
+    return db.execute(
+        select(MetricsDirtyDay).where(MetricsDirtyDay.athlete_id == athlete_id)
+    ).scalars().first()
+
+
+def clear_dirty(db: Session, athlete_id: int, dirty_from: date, updated_at: datetime) -> None:
+    """
+    Borra la marca solo si sigue siendo la que leímos al empezar el rebuild.
+    Si entretanto otra escritura la ha movido, se queda para el siguiente rebuild.
+    """
+    db.execute(
+        delete(MetricsDirtyDay).where(
+            MetricsDirtyDay.athlete_id == athlete_id,
+            MetricsDirtyDay.dirty_from == dirty_from,
+            MetricsDirtyDay.updated_at == updated_at,
+        )
+    )
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.job import Job
+from app.services.bulk_rebuild import rebuild_all
+from app.services.jobs import (
+    KIND_METRICS_REBUILD,
+    KIND_METRICS_REBUILD_ALL,
+    KIND_REZONE,
+    KIND_STRAVA_IMPORT,
+    KIND_STRAVA_STREAMS,
+    enqueue,
+    params_day,
+)
+from app.services.mean_max import update_missing_curves
+from app.services.metrics_calculator import rebuild_daily_metrics, rebuild_dirty_daily_metrics
+from app.services.stream_ingest import ingest_streams
+from app.services.strava_sync import sync_activities
+from app.services.zones import rezone_athlete, update_missing_zones
+
+
+ProgressFn = Callable[[dict], None]
+
+# atletas más lentos que se guardan en el resultado de metrics_rebuild_all
+REBUILD_ALL_SLOWEST = 20
+
+
+def run_strava_import(db: Session, job: Job, on_progress: ProgressFn, loop: asyncio.AbstractEventLoop) -> dict:
+    params = job.params or {}
+    result = loop.run_until_complete(
+        sync_activities(db, job.athlete_id, full=bool(params.get("full")), on_progress=on_progress)
+    )
+    # las actividades nuevas han marcado días sucios: rebuild incremental a continuación
+    if result["saved_or_updated"]:
+        rebuild_job, _ = enqueue(db, KIND_METRICS_REBUILD, job.athlete_id, {"incremental": True})
+        result["rebuild_job_id"] = rebuild_job.id
+        streams_job, _ = enqueue(db, KIND_STRAVA_STREAMS, job.athlete_id)
+        result["streams_job_id"] = streams_job.id
+    return result
+
+
+def run_strava_streams(db: Session, job: Job, on_progress: ProgressFn, loop: asyncio.AbstractEventLoop) -> dict:
+    try:
+        result = loop.run_until_complete(
+            ingest_streams(db, job.athlete_id, limit=settings.STREAMS_PER_JOB, on_progress=on_progress)
+        )
+    except Exception:
+        # cortado a medias (p. ej. aplazado por el límite de Strava): lo ya escrito
+        # tiene IF/TSS con streams y días sucios, el rebuild no espera al reintento
+        db.rollback()
+        enqueue(db, KIND_METRICS_REBUILD, job.athlete_id, {"incremental": True})
+        raise
+    # curvas de máximos medios de las actividades con streams nuevos (y de las que falten)
+    result["curves_updated"] = update_missing_curves(db, job.athlete_id)
+    result["zones_updated"] = update_missing_zones(db, job.athlete_id)
+    # IF/TSS recalculados con streams han marcado días sucios
+    if result["metrics_updated"]:
+        rebuild_job, _ = enqueue(db, KIND_METRICS_REBUILD, job.athlete_id, {"incremental": True})
+        result["rebuild_job_id"] = rebuild_job.id
+    # por tandas, para no acaparar el presupuesto de Strava: la siguiente vuelve a la cola
+    if result["remaining"]:
+        next_job, _ = enqueue(db, KIND_STRAVA_STREAMS, job.athlete_id)
+        result["next_job_id"] = next_job.id
+    return result
+
+
+def run_metrics_rebuild(db: Session, job: Job, on_progress: ProgressFn, loop: asyncio.AbstractEventLoop) -> dict:
+    params = job.params or {}
+    on_progress({"stage": "rebuilding"})
+    if params.get("incremental"):
+        return rebuild_dirty_daily_metrics(db=db, athlete_id=job.athlete_id)
+    return rebuild_daily_metrics(
+        db=db,
+        athlete_id=job.athlete_id,
+        day_from=params_day(params.get("from_day")),
+        day_to=params_day(params.get("to_day")),
+        force=bool(params.get("force")),
+    )
+
+
+def run_metrics_rebuild_all(db: Session, job: Job, on_progress: ProgressFn, loop: asyncio.AbstractEventLoop) -> dict:
+    params = job.params or {}
+    summary = rebuild_all(
+        db,
+        athlete_ids=params.get("athlete_ids"),
+        workers=params.get("workers"),
+        incremental=bool(params.get("incremental")),
+        force=bool(params.get("force")),
+        on_progress=lambda done, total, _results: on_progress({"stage": "rebuilding", "chunks_done": done, "chunks": total}),
+    )
+    # en el resultado del trabajo, solo los errores y los atletas más lentos
+    results = summary.pop("results")
+    summary["errors"] = [r for r in results if not r["ok"]]
+    summary["slowest"] = results[:REBUILD_ALL_SLOWEST]
+    return summary
+
+
+def run_rezone(db: Session, job: Job, on_progress: ProgressFn, loop: asyncio.AbstractEventLoop) -> dict:
+    on_progress({"stage": "rezoning"})
+    return rezone_athlete(db, job.athlete_id)
+
+
+RUNNERS = {
+    KIND_STRAVA_IMPORT: run_strava_import,
+    KIND_METRICS_REBUILD: run_metrics_rebuild,
+    KIND_STRAVA_STREAMS: run_strava_streams,
+    KIND_REZONE: run_rezone,
+    KIND_METRICS_REBUILD_ALL: run_metrics_rebuild_all,
+}
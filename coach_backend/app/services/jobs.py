@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, update, exists, and_, func, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.job import Job
+from app.services.profiling import profiling_var
+
+
+KIND_STRAVA_IMPORT = "strava_import"
+KIND_METRICS_REBUILD = "metrics_rebuild"
+KIND_STRAVA_STREAMS = "strava_streams"
+KIND_REZONE = "rezone"
+# rebuild de todos los atletas en un pool de procesos (services/bulk_rebuild.py); athlete_id NULL
+KIND_METRICS_REBUILD_ALL = "metrics_rebuild_all"
+
+JOB_KINDS = (KIND_STRAVA_IMPORT, KIND_METRICS_REBUILD, KIND_STRAVA_STREAMS, KIND_REZONE, KIND_METRICS_REBUILD_ALL)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_DEFERRED = "deferred"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _merge_params(kind: str, queued: dict, new: dict) -> dict:
+    """
+    Params del trabajo en cola tras fusionar una petición duplicada: el resultado
+    hace al menos todo lo que pedían las dos.
+    """
+    if kind == KIND_STRAVA_IMPORT:
+        return {"full": bool(queued.get("full")) or bool(new.get("full"))}
+
+    if kind == KIND_METRICS_REBUILD:
+        merged = {
+            "incremental": bool(queued.get("incremental")) and bool(new.get("incremental")),
+            "force": bool(queued.get("force")) or bool(new.get("force")),
+        }
+        # rango: la unión; None (sin límite) gana
+        froms = [queued.get("from_day"), new.get("from_day")]
+        tos = [queued.get("to_day"), new.get("to_day")]
+        merged["from_day"] = None if None in froms else min(froms)
+        merged["to_day"] = None if None in tos else max(tos)
+        return merged
+
+    if kind == KIND_METRICS_REBUILD_ALL:
+        # atletas: la unión; None (todos) gana
+        ids = [queued.get("athlete_ids"), new.get("athlete_ids")]
+        return {
+            "athlete_ids": None if None in ids else sorted(set(ids[0]) | set(ids[1])),
+            "workers": new.get("workers") or queued.get("workers"),
+            "incremental": bool(queued.get("incremental")) and bool(new.get("incremental")),
+            "force": bool(queued.get("force")) or bool(new.get("force")),
+        }
+
+    return {**queued, **new}
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    athlete_id: int | None,
+    params: dict | None = None,
+    run_after: datetime | None = None,
+) -> tuple[Job, bool]:
+    """
+    Encola un trabajo y hace commit. Si ya hay uno en cola del mismo tipo para el
+    atleta, se fusionan los params en ese y se devuelve (job, False).
+    """
+    params = jsonable_encoder(params or {})
+    # encolado desde una petición perfilada: el worker perfila también el trabajo
+    if profiling_var.get():
+        params["profile"] = True
+    values = {"kind": kind, "athlete_id": athlete_id, "params": params, "status": STATUS_QUEUED}
+    if run_after is not None:
+        values["run_after"] = run_after
+
+    while True:
+        stmt = (
+            insert(Job)
+            .values(**values)
+            .on_conflict_do_nothing(
+                index_elements=[Job.kind, func.coalesce(Job.athlete_id, 0)],
+                index_where=text("status = 'queued'"),
+            )
+            .returning(Job.id)
+        )
+        job_id = db.execute(stmt).scalar()
+        if job_id is not None:
+            db.commit()
+            return db.get(Job, job_id), True
+
+        queued = db.execute(
+            select(Job)
+            .where(Job.kind == kind, Job.athlete_id == athlete_id, Job.status == STATUS_QUEUED)
+            .with_for_update()
+        ).scalars().first()
+        if queued is None:
+            # lo ha reclamado un worker entre el INSERT y el SELECT: reintentamos
+            db.rollback()
+            continue
+
+        merged = _merge_params(kind, queued.params or {}, params)
+        if (queued.params or {}).get("profile") or params.get("profile"):
+            merged["profile"] = True
+        queued.params = merged
+        if run_after is not None and run_after > queued.run_after:
+            queued.run_after = run_after
+        db.commit()
+        return queued, False
+
+
+def claim(db: Session, worker: str, kinds: tuple[str, ...] | None = None) -> Job | None:
+    """
+    Reclama el siguiente trabajo listo y lo pasa a running (con commit).
+
+    FOR UPDATE SKIP LOCKED: varios workers, en uno o varios nodos, se reparten la
+    cola sin bloquearse. No se reclama un trabajo si ya hay otro del mismo tipo y
+    atleta en marcha (el de la cola se queda esperando a que termine).
+    """
+    # alias: la subconsulta no debe correlacionarse con la tabla del UPDATE
+    q = aliased(Job, name="q")
+    running = aliased(Job, name="r")
+    busy = exists().where(
+        and_(
+            running.status == STATUS_RUNNING,
+            running.kind == q.kind,
+            running.athlete_id.is_not_distinct_from(q.athlete_id),
+        )
+    )
+    candidate = (
+        select(q.id)
+        .where(q.status == STATUS_QUEUED, q.run_after <= func.now(), ~busy)
+        .order_by(q.run_after, q.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    if kinds:
+        candidate = candidate.where(q.kind.in_(kinds))
+
+    now = _utcnow()
+    job_id = db.execute(
+        update(Job)
+        .where(Job.id == candidate.scalar_subquery())
+        .values(
+            status=STATUS_RUNNING,
+            worker=worker,
+            attempts=Job.attempts + 1,
+            started_at=now,
+            heartbeat_at=now,
+            progress=None,
+            error=None,
+        )
+        .returning(Job.id)
+    ).scalar()
+    db.commit()
+    return db.get(Job, job_id) if job_id is not None else None
+
+
+def _owned(job_id: int, worker: str):
+    # solo el worker que lo reclamó y mientras siga running: si requeue_stale lo ha
+    # devuelto a la cola, el worker antiguo ya no puede tocarlo
+    return and_(Job.id == job_id, Job.status == STATUS_RUNNING, Job.worker == worker)
+
+
+def heartbeat(db: Session, job_id: int, worker: str) -> bool:
+    """Latido del trabajo en curso. False si ya no es de `worker`."""
+    res = db.execute(update(Job).where(_owned(job_id, worker)).values(heartbeat_at=_utcnow()))
+    db.commit()
+    return res.rowcount == 1
+
+
+def report_progress(db: Session, job_id: int, worker: str, progress: dict) -> bool:
+    res = db.execute(
+        update(Job)
+        .where(_owned(job_id, worker))
+        .values(progress=jsonable_encoder(progress), heartbeat_at=_utcnow())
+    )
+    db.commit()
+    return res.rowcount == 1
+
+
+def finish(db: Session, job_id: int, worker: str, result: dict | None) -> bool:
+    """Marca el trabajo done. False (y no cambia nada) si ya no es de `worker`."""
+    res = db.execute(
+        update(Job)
+        .where(_owned(job_id, worker))
+        .values(status=STATUS_DONE, result=jsonable_encoder(result), finished_at=_utcnow())
+    )
+    db.commit()
+    return res.rowcount == 1
+
+
+def fail(db: Session, job_id: int, worker: str, error: str) -> bool:
+    """Marca el trabajo failed. False (y no cambia nada) si ya no es de `worker`."""
+    res = db.execute(
+        update(Job)
+        .where(_owned(job_id, worker))
+        .values(status=STATUS_FAILED, error=error, finished_at=_utcnow())
+    )
+    db.commit()
+    return res.rowcount == 1
+
+
+def defer(db: Session, job: Job, worker: str, retry_at: datetime, reason: str) -> Job:
+    """
+    Aplaza un trabajo (p. ej. sin presupuesto de Strava): este queda como deferred y
+    se encola (o se fusiona con el que ya esté en cola) para `retry_at`. Si ya no
+    es de `worker` solo se encola.
+    """
+    next_job, _ = enqueue(db, job.kind, job.athlete_id, job.params, run_after=retry_at)
+    db.execute(
+        update(Job)
+        .where(_owned(job.id, worker))
+        .values(
+            status=STATUS_DEFERRED,
+            error=reason,
+            result={"next_job_id": next_job.id, "retry_at": retry_at.isoformat()},
+            finished_at=_utcnow(),
+        )
+    )
+    db.commit()
+    return next_job
+
+
+def requeue_stale(db: Session, stale_after_s: int, max_attempts: int) -> int:
+    """
+    Trabajos running sin latido desde hace `stale_after_s` (worker caído): vuelven a
+    la cola (o se fusionan con el que ya esté en cola), o se marcan failed si ya
+    agotaron los intentos. Devuelve cuántos se han tratado.
+    """
+    cutoff = _utcnow() - timedelta(seconds=stale_after_s)
+    stale = db.execute(
+        select(Job)
+        .where(Job.status == STATUS_RUNNING, Job.heartbeat_at < cutoff)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    now = _utcnow()
+    for job in stale:
+        job.error = f"sin latido desde {job.heartbeat_at.isoformat()} (worker {job.worker})"
+        if job.attempts >= max_attempts:
+            job.status = STATUS_FAILED
+            job.finished_at = now
+            continue
+
+        queued = db.execute(
+            select(Job)
+            .where(Job.kind == job.kind, Job.athlete_id == job.athlete_id, Job.status == STATUS_QUEUED)
+            .with_for_update()
+        ).scalars().first()
+        if queued is not None:
+            queued.params = _merge_params(job.kind, queued.params or {}, job.params or {})
+            job.status = STATUS_DEFERRED
+            job.result = {"next_job_id": queued.id}
+            job.finished_at = now
+        else:
+            job.status = STATUS_QUEUED
+            job.run_after = now
+            job.worker = None
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # se ha encolado un duplicado a la vez: lo resolvemos en la siguiente pasada
+        db.rollback()
+        return 0
+    return len(stale)
+
+
+def get_job(db: Session, job_id: int) -> Job | None:
+    return db.get(Job, job_id)
+
+
+def job_to_dict(job: Job) -> dict:
+    end = job.finished_at or (_utcnow() if job.started_at else None)
+    duration_s = (end - job.started_at).total_seconds() if job.started_at and end else None
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "athlete_id": job.athlete_id,
+        "params": job.params,
+        "status": job.status,
+        "progress": job.progress,
+        "result": job.result,
+        "error": job.error,
+        "attempts": job.attempts,
+        "worker": job.worker,
+        "run_after": job.run_after,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "queued_s": (job.started_at - job.created_at).total_seconds() if job.started_at else None,
+        "duration_s": duration_s,
+    }
+
+
+def params_day(value: str | None) -> date | None:
+    return date.fromisoformat(value) if value else None
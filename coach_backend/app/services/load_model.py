@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from math import log
+
+import numpy as np
+
+from app.models.athlete_profile import AthleteProfile
+
+# Constantes de tiempo por defecto (días) del modelo de carga CTL/ATL
+DEFAULT_CTL_TC = 42.0
+DEFAULT_ATL_TC = 7.0
+
+# Crecimiento máximo de d^-k dentro de un bloque (ver _ewma)
+_MAX_BLOCK_GROWTH = 1e6
+
+
+@dataclass
+class LoadSeries:
+    ctl: np.ndarray
+    atl: np.ndarray
+    tsb: np.ndarray
+
+
+def time_constants(profile: AthleteProfile | None) -> tuple[float, float]:
+    """(ctl_tc, atl_tc) del atleta; los defaults si no tiene perfil o no las ha fijado."""
+    ctl_tc = float(getattr(profile, "ctl_time_constant", None) or DEFAULT_CTL_TC) if profile else DEFAULT_CTL_TC
+    atl_tc = float(getattr(profile, "atl_time_constant", None) or DEFAULT_ATL_TC) if profile else DEFAULT_ATL_TC
+    return ctl_tc, atl_tc
+
+
+def _ewma(x: np.ndarray, tc: np.ndarray, y0: np.ndarray) -> np.ndarray:
+    """
+    y[t] = y[t-1] + (x[t] - y[t-1]) / tc   sobre el último eje, para cada fila.
+
+    Con d = 1 - 1/tc la recurrencia tiene forma cerrada:
+        y[s+j] = d^(j+1) * y[s-1] + (1/tc) * d^j * cumsum(x[s+k] * d^-k)[j]
+    Se aplica por bloques de días para que d^-k no crezca más de _MAX_BLOCK_GROWTH
+    (precisión), arrastrando y entre bloques. Cada bloque es aritmética vectorizada
+    sobre todas las filas (atletas) y días del bloque.
+    """
+    n_days = x.shape[-1]
+    y = np.empty_like(x)
+    if n_days == 0:
+        return y
+
+    a = 1.0 / tc
+    d = 1.0 - a
+
+    # el decaimiento más rápido (tc más pequeño) es el que más crece d^-k
+    d_min = float(d.min())
+    block = 1 if d_min <= 0.0 else max(1, min(n_days, int(log(_MAX_BLOCK_GROWTH) / -log(d_min))))
+
+    k = np.arange(block, dtype=np.float64)
+    pw = d[:, None] ** k            # d^j
+    inv = d[:, None] ** -k          # d^-k
+    pw_next = pw * d[:, None]       # d^(j+1)
+
+    prev = y0.astype(np.float64, copy=True)
+    for s in range(0, n_days, block):
+        e = min(s + block, n_days)
+        m = e - s
+        c = np.cumsum(x[:, s:e] * inv[:, :m], axis=-1)
+        y[:, s:e] = pw_next[:, :m] * prev[:, None] + a[:, None] * pw[:, :m] * c
+        prev = y[:, e - 1]
+    return y
+
+
+def compute_load(
+    tss: np.ndarray,
+    ctl_tc: float | np.ndarray = DEFAULT_CTL_TC,
+    atl_tc: float | np.ndarray = DEFAULT_ATL_TC,
+    ctl0: float | np.ndarray = 0.0,
+    atl0: float | np.ndarray = 0.0,
+) -> LoadSeries:
+    """
+    CTL / ATL / TSB de una serie diaria de TSS (días consecutivos, sin huecos).
+
+    `tss` puede ser 1-D (un atleta) o 2-D (una fila por atleta); en 2-D las
+    constantes de tiempo y las semillas ctl0/atl0 pueden ser escalares o arrays
+    de una entrada por fila. Mismo modelo que el rebuild diario:
+        tsb[t] = ctl[t-1] - atl[t-1]
+        ctl[t] = ctl[t-1] + (tss[t] - ctl[t-1]) / ctl_tc
+        atl[t] = atl[t-1] + (tss[t] - atl[t-1]) / atl_tc
+    """
+    x = np.asarray(tss, dtype=np.float64)
+    one_d = x.ndim == 1
+    if one_d:
+        x = x[None, :]
+    if x.ndim != 2:
+        raise ValueError("tss debe ser 1-D (días) o 2-D (atletas x días)")
+
+    rows = x.shape[0]
+    ctl_tc_arr = np.broadcast_to(np.asarray(ctl_tc, dtype=np.float64), (rows,))
+    atl_tc_arr = np.broadcast_to(np.asarray(atl_tc, dtype=np.float64), (rows,))
+    if (ctl_tc_arr < 1.0).any() or (atl_tc_arr < 1.0).any():
+        raise ValueError("las constantes de tiempo deben ser >= 1 día")
+
+    ctl_seed = np.broadcast_to(np.asarray(ctl0, dtype=np.float64), (rows,))
+    atl_seed = np.broadcast_to(np.asarray(atl0, dtype=np.float64), (rows,))
+
+    ctl = _ewma(x, ctl_tc_arr, ctl_seed)
+    atl = _ewma(x, atl_tc_arr, atl_seed)
+
+    # TSB del día = forma de la mañana (CTL - ATL del día anterior)
+    tsb = np.empty_like(x)
+    if x.shape[1]:
+        tsb[:, 0] = ctl_seed - atl_seed
+        tsb[:, 1:] = ctl[:, :-1] - atl[:, :-1]
+
+    if one_d:
+        return LoadSeries(ctl=ctl[0], atl=atl[0], tsb=tsb[0])
+    return LoadSeries(ctl=ctl, atl=atl, tsb=tsb)
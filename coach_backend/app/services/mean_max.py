@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Sequence
+
+import numpy as np
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.activity import Activity
+from app.models.activity_curve import ActivityCurve
+from app.models.activity_stream_index import ActivityStreamIndex
+from app.models.athlete_curve_month import AthleteCurveMonth
+from app.services.metrics_calculator import SPORT_RUNNING, sport_buckets
+from app.services.stream_metrics import resample_1hz
+from app.services.stream_store import AthleteStreams, StreamSegment, stream_store
+
+
+# Duraciones (s) de las curvas, de 1 s a 5 h. Las curvas se guardan como arrays
+# alineados con esta tupla: si cambia, hay que recalcular (recompute_curves).
+CURVE_DURATIONS_S: tuple[int, ...] = (
+    1, 2, 3, 5, 10, 15, 20, 30, 45,
+    60, 90, 120, 180, 240, 300, 420, 600, 900, 1200, 1800, 2700,
+    3600, 5400, 7200, 10800, 14400, 18000,
+)
+CURVES = ("power", "speed")
+
+# actividades por tanda al calcular curvas pendientes
+CURVE_BATCH = 200
+
+
+def mean_max(values: np.ndarray, time_s: np.ndarray | None = None,
+             durations: Sequence[int] = CURVE_DURATIONS_S) -> np.ndarray:
+    """
+    Máximo de la media móvil para cada duración (NaN si la actividad es más corta).
+    Con sumas acumuladas cada duración es una resta y un max sobre el array:
+    O(n·k) para n muestras a 1 Hz y k duraciones, sin bucles Python por muestra.
+    Los huecos cortos y las muestras sin dato cuentan como 0.
+    """
+    (x,) = resample_1hz(time_s, values)
+    x = np.nan_to_num(x, nan=0.0)
+    c = np.cumsum(np.concatenate(([0.0], x)))
+    out = np.full(len(durations), np.nan, dtype=np.float32)
+    for j, d in enumerate(durations):
+        if d <= len(x):
+            out[j] = (c[d:] - c[:-d]).max() / d
+    return out
+
+
+def activity_curves(streams: AthleteStreams, seg: StreamSegment, sport: int) -> dict[str, np.ndarray | None]:
+    """Curvas de una actividad: potencia si hay watts; velocidad si es carrera."""
+    time_s = streams.segment(seg, "time")
+    power = mean_max(streams.segment(seg, "watts"), time_s) if "watts" in seg.streams else None
+    speed = None
+    if sport == SPORT_RUNNING and "velocity_smooth" in seg.streams:
+        speed = mean_max(streams.segment(seg, "velocity_smooth"), time_s)
+    return {"power": power, "speed": speed}
+
+
+def _to_db(curve: np.ndarray | None) -> list[float | None] | None:
+    if curve is None:
+        return None
+    return [None if x != x else x for x in curve.tolist()]
+
+
+def _from_db(values: list | None) -> np.ndarray | None:
+    # None (duración sin dato) -> NaN
+    return None if values is None else np.asarray(values, dtype=np.float64)
+
+
+def _envelope(curves: Sequence[np.ndarray | None]) -> np.ndarray | None:
+    """Máximo por duración ignorando NaN y curvas ausentes."""
+    curves = [c for c in curves if c is not None]
+    if not curves:
+        return None
+    with np.errstate(invalid="ignore"):
+        return np.fmax.reduce(np.vstack(curves), axis=0)
+
+
+def _month(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _next_month(m: date) -> date:
+    return date(m.year + (m.month == 12), m.month % 12 + 1, 1)
+
+
+def _lock(db: Session, athlete_id: int) -> None:
+    db.execute(select(func.pg_advisory_xact_lock(func.hashtextextended(f"curves:{athlete_id}", 0))))
+
+
+def _upsert_months(db: Session, rows: list[dict]) -> None:
+    if not rows:
+        return
+    stmt = insert(AthleteCurveMonth)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["athlete_id", "month"],
+        set_={
+            "power": stmt.excluded.power,
+            "speed": stmt.excluded.speed,
+            "activities": stmt.excluded.activities,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt, rows)
+
+
+def _rebuild_months(db: Session, athlete_id: int, months: set[date]) -> None:
+    """Envolventes de `months` desde las activity_curves del mes (sin leer streams)."""
+    rows = []
+    for m in sorted(months):
+        curves = db.execute(
+            select(ActivityCurve.power, ActivityCurve.speed)
+            .join(Activity, Activity.id == ActivityCurve.activity_id)
+            .where(ActivityCurve.athlete_id == athlete_id, Activity.day >= m, Activity.day < _next_month(m))
+        ).all()
+        rows.append({
+            "athlete_id": athlete_id,
+            "month": m,
+            "power": _to_db(_envelope([_from_db(r.power) for r in curves])),
+            "speed": _to_db(_envelope([_from_db(r.speed) for r in curves])),
+            "activities": len(curves),
+            "updated_at": datetime.utcnow(),
+        })
+    _upsert_months(db, rows)
+
+
+def update_curves(db: Session, athlete_id: int, activity_ids: Sequence[int]) -> int:
+    """
+    Calcula y guarda las curvas de `activity_ids` (las que tengan streams) y las
+    funde en las envolventes mensuales, con commit. Una actividad nueva se combina
+    con la envolvente guardada (máximo por duración) sin tocar el resto del
+    histórico; si la actividad ya tenía curva, su mes se recalcula desde
+    activity_curves. Devuelve cuántas actividades se han procesado.
+    """
+    if not activity_ids:
+        return 0
+    segs = stream_store.segments(db, athlete_id, activity_ids=activity_ids)
+    if not segs:
+        return 0
+
+    ids = [s.activity_id for s in segs]
+    sport_of = dict(db.execute(select(Activity.id, Activity.sport_type).where(Activity.id.in_(ids))).all())
+    sports = sport_buckets([sport_of[i] for i in ids])
+    streams = stream_store.open(athlete_id)
+    computed = [activity_curves(streams, seg, sports[n]) for n, seg in enumerate(segs)]
+
+    _lock(db, athlete_id)
+    existing = set(db.execute(select(ActivityCurve.activity_id).where(ActivityCurve.activity_id.in_(ids))).scalars())
+
+    now = datetime.utcnow()
+    stmt = insert(ActivityCurve)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["activity_id"],
+        set_={"power": stmt.excluded.power, "speed": stmt.excluded.speed, "updated_at": stmt.excluded.updated_at},
+    )
+    db.execute(stmt, [
+        {"activity_id": seg.activity_id, "athlete_id": athlete_id,
+         "power": _to_db(c["power"]), "speed": _to_db(c["speed"]), "updated_at": now}
+        for seg, c in zip(segs, computed)
+    ])
+
+    # actividades nuevas: máximo con la envolvente guardada del mes
+    new_by_month: dict[date, list[dict]] = {}
+    for seg, c in zip(segs, computed):
+        if seg.activity_id not in existing and seg.day is not None:
+            new_by_month.setdefault(_month(seg.day), []).append(c)
+    stored = {
+        r.month: r
+        for r in db.execute(
+            select(
+                AthleteCurveMonth.month, AthleteCurveMonth.power, AthleteCurveMonth.speed, AthleteCurveMonth.activities
+            )
+            .where(AthleteCurveMonth.athlete_id == athlete_id, AthleteCurveMonth.month.in_(list(new_by_month)))
+        ).all()
+    }
+    rows = []
+    for m, news in new_by_month.items():
+        old = stored.get(m)
+        rows.append({
+            "athlete_id": athlete_id,
+            "month": m,
+            **{
+                k: _to_db(_envelope([_from_db(getattr(old, k)) if old else None, *(c[k] for c in news)]))
+                for k in CURVES
+            },
+            "activities": (old.activities if old else 0) + len(news),
+            "updated_at": now,
+        })
+    _upsert_months(db, rows)
+
+    # actividades recalculadas: su valor puede haber bajado, el mes se rehace
+    _rebuild_months(db, athlete_id, {
+        _month(seg.day) for seg in segs if seg.activity_id in existing and seg.day is not None
+    })
+    db.commit()
+    return len(segs)
+
+
+def update_missing_curves(db: Session, athlete_id: int) -> int:
+    """Curvas de las actividades con streams que aún no la tienen (por tandas)."""
+    done = 0
+    while True:
+        ids = db.execute(
+            select(ActivityStreamIndex.activity_id)
+            .outerjoin(ActivityCurve, ActivityCurve.activity_id == ActivityStreamIndex.activity_id)
+            .where(
+                ActivityStreamIndex.athlete_id == athlete_id,
+                ActivityStreamIndex.length > 0,
+                ActivityCurve.activity_id.is_(None),
+            )
+            .order_by(ActivityStreamIndex.offset)
+            .limit(CURVE_BATCH)
+        ).scalars().all()
+        if not ids:
+            return done
+        n = update_curves(db, athlete_id, ids)
+        if n == 0:
+            return done
+        done += n
+
+
+def move_activity_curve(db: Session, athlete_id: int, days: Sequence[date | None]) -> None:
+    """
+    Una actividad ha cambiado de día: rehace las envolventes de los meses afectados.
+    No hace commit (va con el cambio que lo provoca).
+    """
+    months = {_month(d) for d in days if d is not None}
+    if months:
+        _lock(db, athlete_id)
+        _rebuild_months(db, athlete_id, months)
+
+
+def recompute_curves(db: Session, athlete_id: int) -> int:
+    """Borra y recalcula todas las curvas del atleta (p. ej. si cambian las duraciones)."""
+    _lock(db, athlete_id)
+    db.execute(ActivityCurve.__table__.delete().where(ActivityCurve.athlete_id == athlete_id))
+    db.execute(AthleteCurveMonth.__table__.delete().where(AthleteCurveMonth.athlete_id == athlete_id))
+    db.commit()
+    return update_missing_curves(db, athlete_id)
+
+
+def _curve_out(curve: np.ndarray | None, digits: int) -> list[float | None] | None:
+    if curve is None:
+        return None
+    return [None if x != x else round(x, digits) for x in curve.tolist()]
+
+
+def curve_for_window(db: Session, athlete_id: int, day_from: date | None, day_to: date | None) -> dict:
+    """
+    Curvas del atleta entre day_from y day_to (ambos incluidos; None = sin límite).
+    Los meses completos del rango salen de las envolventes mensuales; solo los días
+    sueltos de los extremos se leen de activity_curves.
+    """
+    # meses completos: [full_from, full_to)
+    full_from = _next_month(_month(day_from - timedelta(days=1))) if day_from else None
+    full_to = _month(day_to + timedelta(days=1)) if day_to else None
+
+    q = select(AthleteCurveMonth.power, AthleteCurveMonth.speed).where(AthleteCurveMonth.athlete_id == athlete_id)
+    if full_from is not None:
+        q = q.where(AthleteCurveMonth.month >= full_from)
+    if full_to is not None:
+        q = q.where(AthleteCurveMonth.month < full_to)
+    months = db.execute(q).all()
+
+    edge_days = []
+    if full_from is not None:
+        edge_days.append(Activity.day < full_from)
+    if full_to is not None:
+        edge_days.append(Activity.day >= full_to)
+    edges = []
+    if edge_days:
+        q = (
+            select(ActivityCurve.power, ActivityCurve.speed)
+            .join(Activity, Activity.id == ActivityCurve.activity_id)
+            .where(ActivityCurve.athlete_id == athlete_id, or_(*edge_days))
+        )
+        if day_from is not None:
+            q = q.where(Activity.day >= day_from)
+        if day_to is not None:
+            q = q.where(Activity.day <= day_to)
+        edges = db.execute(q).all()
+
+    rows = [*months, *edges]
+    power = _envelope([_from_db(r.power) for r in rows])
+    speed = _envelope([_from_db(r.speed) for r in rows])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pace = None if speed is None else np.where(speed > 0, 1000.0 / speed, np.nan)
+
+    return {
+        "athlete_id": athlete_id,
+        "from_day": day_from,
+        "to_day": day_to,
+        "durations_s": list(CURVE_DURATIONS_S),
+        "power_w": _curve_out(power, 1),
+        "speed_mps": _curve_out(speed, 3),
+        "pace_sec_per_km": _curve_out(pace, 1),
+        "months": len(months),
+        "edge_activities": len(edges),
+    }
@@ -3,15 +3,22 @@ from __future__ import annotations
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
 from math import sqrt
+from typing import Sequence
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import select, func, case
+import numpy as np
+from sqlalchemy import BigInteger, cast, column, select, func, case, update, values
 from sqlalchemy.orm import Session
 from sqlalchemy.dialects.postgresql import insert
 
 from app.models.activity import Activity
 from app.models.athlete_profile import AthleteProfile
 from app.models.daily_metrics import DailyMetric
+from app.services.dirty_days import mark_dirty, get_dirty, clear_dirty
+from app.services.load_model import compute_load, time_constants
+from app.services.response_cache import invalidate_on_commit
+from app.services.stream_metrics import normalized_power, normalized_graded_speed
+from app.services.stream_store import stream_store
 
 # ---------- helpers de timezone ----------
 
@@ -29,15 +36,19 @@ def _extract_tz_name(strava_tz: str | None) -> str | None:
     return s
 
 
-def compute_activity_day(activity: Activity) -> date:
-    tz_name = _extract_tz_name(getattr(activity, "timezone", None))
+def compute_local_day(start_date: datetime, strava_tz: str | None) -> date:
+    tz_name = _extract_tz_name(strava_tz)
     if tz_name:
         try:
             tz = ZoneInfo(tz_name)
-            return activity.start_date.astimezone(tz).date()
+            return start_date.astimezone(tz).date()
         except Exception:
             pass
-    return activity.start_date.date()
+    return start_date.date()
+
+
+def compute_activity_day(activity: Activity) -> date:
+    return compute_local_day(activity.start_date, getattr(activity, "timezone", None))
 
 
 # ---------- cálculo de TSS / IF / Work / EF ----------
@@ -173,6 +184,255 @@ def compute_activity_metrics(activity: Activity, profile: AthleteProfile | None)
     )
 
 
+# ---------- cálculo vectorizado (batch) ----------
+#
+# Misma lógica que compute_activity_metrics pero sobre arrays columnares de todas
+# las actividades a la vez. Los métodos se devuelven como códigos (índices en las
+# tuplas de abajo) y los valores nulos como NaN.
+
+SPORT_OTHER, SPORT_CYCLING, SPORT_RUNNING = 0, 1, 2
+_SPORT_CODES = {"other": SPORT_OTHER, "cycling": SPORT_CYCLING, "running": SPORT_RUNNING}
+
+TSS_METHODS: tuple[str, ...] = (
+    "no_duration",
+    "power_tss_weighted_watts",
+    "power_tss_avg_watts",
+    "pace_tss",
+    "no_distance",
+    "hr_tss",
+    "fallback_duration",
+    "power_tss_stream_np",
+    "pace_tss_stream_gap",
+)
+IF_METHODS: tuple[str | None, ...] = (
+    None,
+    "power_if_weighted_watts",
+    "power_if_avg_watts",
+    "pace_if",
+    "hr_if",
+    "fallback_if",
+    "power_if_stream_np",
+    "pace_if_stream_gap",
+)
+EF_METHODS: tuple[str | None, ...] = (None, "power_per_hr", "speed_per_hr")
+
+
+@dataclass
+class ActivityMetricsBatch:
+    tss: np.ndarray
+    if_value: np.ndarray
+    work_kj: np.ndarray
+    ef: np.ndarray
+    tss_method: np.ndarray
+    if_method: np.ndarray
+    ef_method: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.tss)
+
+    def row(self, i: int) -> ActivityMetrics:
+        return ActivityMetrics(
+            tss=float(self.tss[i]),
+            tss_method=TSS_METHODS[self.tss_method[i]],
+            if_value=_nan_to_none(self.if_value[i]),
+            if_method=IF_METHODS[self.if_method[i]],
+            work_kj=_nan_to_none(self.work_kj[i]),
+            ef=_nan_to_none(self.ef[i]),
+            ef_method=EF_METHODS[self.ef_method[i]],
+        )
+
+    def to_columns(self) -> dict[str, list]:
+        """Columnas como listas Python (None en vez de NaN), listas para la BD."""
+        return {
+            "tss": self.tss.tolist(),
+            "tss_method": [TSS_METHODS[c] for c in self.tss_method.tolist()],
+            "if_value": _column_to_list(self.if_value),
+            "if_method": [IF_METHODS[c] for c in self.if_method.tolist()],
+            "work_kj": _column_to_list(self.work_kj),
+            "ef": _column_to_list(self.ef),
+            "ef_method": [EF_METHODS[c] for c in self.ef_method.tolist()],
+        }
+
+
+def _nan_to_none(x) -> float | None:
+    x = float(x)
+    return None if x != x else x
+
+
+def _column_to_list(arr: np.ndarray) -> list[float | None]:
+    return [None if x != x else x for x in arr.tolist()]
+
+
+def _float_column(values: Sequence) -> np.ndarray:
+    # None -> NaN
+    return np.asarray(values, dtype=np.float64)
+
+
+def sport_buckets(sport_types: Sequence[str | None]) -> np.ndarray:
+    """Códigos SPORT_* por actividad; _sport_bucket solo se evalúa por valor distinto."""
+    codes = {s: _SPORT_CODES[_sport_bucket(s)] for s in set(sport_types)}
+    return np.fromiter((codes[s] for s in sport_types), dtype=np.int8, count=len(sport_types))
+
+
+def compute_activity_metrics_batch(
+    sport_type: Sequence[str | None],
+    moving_time_s: Sequence,
+    distance_m: Sequence,
+    average_watts: Sequence,
+    weighted_average_watts: Sequence,
+    average_heartrate: Sequence,
+    kilojoules: Sequence,
+    profile: AthleteProfile | None,
+) -> ActivityMetricsBatch:
+    n = len(sport_type)
+    sport = sport_buckets(sport_type)
+    seconds = np.nan_to_num(_float_column(moving_time_s), nan=0.0)
+    dist = np.nan_to_num(_float_column(distance_m), nan=0.0)
+    avg_watts = _float_column(average_watts)
+    weighted_watts = _float_column(weighted_average_watts)
+    avg_hr = _float_column(average_heartrate)
+    kj = _float_column(kilojoules)
+
+    ftp = float(getattr(profile, "ftp_watts", 0.0) or 0.0) if profile else 0.0
+    lthr = float(getattr(profile, "lthr_bpm", 0.0) or 0.0) if profile else 0.0
+    thr_pace = float(getattr(profile, "threshold_pace_sec_per_km", 0.0) or 0.0) if profile else 0.0
+
+    has_weighted = ~np.isnan(weighted_watts)
+    power = np.where(has_weighted, weighted_watts, avg_watts)
+    has_power = ~np.isnan(power)
+    has_hr = ~np.isnan(avg_hr)
+    is_cycling = sport == SPORT_CYCLING
+    is_running = sport == SPORT_RUNNING
+
+    tss = np.zeros(n, dtype=np.float64)
+    if_value = np.full(n, np.nan)
+    work_kj = np.full(n, np.nan)
+    ef = np.full(n, np.nan)
+    tss_method = np.zeros(n, dtype=np.int8)
+    if_method = np.zeros(n, dtype=np.int8)
+    ef_method = np.zeros(n, dtype=np.int8)
+
+    has_duration = seconds > 0
+    hours = seconds / 3600.0
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # ---- IF + TSS (mismo orden de prioridad que la versión escalar) ----
+        pending = has_duration.copy()
+
+        m_power = pending & is_cycling & has_power & (ftp > 0)
+        if_value[m_power] = power[m_power] / ftp
+        if_method[m_power] = np.where(has_weighted[m_power], 1, 2)
+        tss_method[m_power] = np.where(has_weighted[m_power], 1, 2)
+        pending &= ~m_power
+
+        m_pace = pending & is_running & (thr_pace > 0) & (dist > 0)
+        km = dist / 1000.0
+        m_pace_ok = m_pace & (km > 0)
+        pace = seconds / km
+        if_value[m_pace_ok] = thr_pace / pace[m_pace_ok]
+        if_method[m_pace_ok] = 3
+        tss_method[m_pace_ok] = 3
+        tss_method[m_pace & ~m_pace_ok] = 4
+        pending &= ~m_pace
+
+        m_hr = pending & has_hr & (lthr > 0)
+        if_value[m_hr] = avg_hr[m_hr] / lthr
+        if_method[m_hr] = 4
+        tss_method[m_hr] = 5
+        pending &= ~m_hr
+
+        fallback_if = np.select([is_cycling, is_running], [0.60, 0.55], default=0.50)
+        if_value[pending] = fallback_if[pending]
+        if_method[pending] = 5
+        tss_method[pending] = 6
+
+        m_tss = has_duration & ~np.isnan(if_value)
+        # `** 2` de Python usa pow() de libm y numpy x*x: pueden diferir en el último bit,
+        # así que elevamos igual que la versión escalar para que el resultado sea idéntico.
+        if_squared = np.array([v ** 2 for v in if_value[m_tss].tolist()], dtype=np.float64)
+        tss[m_tss] = hours[m_tss] * if_squared * 100.0
+        tss = np.where(tss > 0.0, tss, 0.0)
+
+        # ---- Work (kJ) ----
+        has_kj = has_duration & ~np.isnan(kj)
+        work_kj[has_kj] = kj[has_kj]
+        m_work = has_duration & ~has_kj & is_cycling & has_power
+        work_kj[m_work] = (power[m_work] * seconds[m_work]) / 1000.0
+
+        # ---- EF ----
+        m_ef = has_duration & has_hr & (avg_hr > 0)
+        m_ef_power = m_ef & is_cycling & ~np.isnan(avg_watts)
+        ef[m_ef_power] = avg_watts[m_ef_power] / avg_hr[m_ef_power]
+        ef_method[m_ef_power] = 1
+        m_ef_speed = m_ef & ~m_ef_power & (dist > 0)
+        ef[m_ef_speed] = (dist[m_ef_speed] / seconds[m_ef_speed]) / avg_hr[m_ef_speed]
+        ef_method[m_ef_speed] = 2
+
+    return ActivityMetricsBatch(
+        tss=tss,
+        if_value=if_value,
+        work_kj=work_kj,
+        ef=ef,
+        tss_method=tss_method,
+        if_method=if_method,
+        ef_method=ef_method,
+    )
+
+
+def apply_stream_intensity(
+    m: ActivityMetricsBatch,
+    sport_type: Sequence[str | None],
+    moving_time_s: Sequence,
+    segments: Sequence,
+    streams,
+    profile: AthleteProfile | None,
+) -> int:
+    """
+    Sustituye IF/TSS del batch por los calculados con streams cuando los hay:
+    - ciclismo con watts y FTP: IF = NP / FTP (power_tss_stream_np)
+    - carrera con velocity_smooth y ritmo umbral: IF = NGP / velocidad umbral,
+      con la velocidad ajustada a la pendiente por la altitud (pace_tss_stream_gap)
+    TSS = horas * IF^2 * 100, igual que el resto de métodos. `segments[i]` es el
+    StreamSegment de la fila i (o None) y `streams` el AthleteStreams del atleta.
+    Devuelve cuántas filas se han sustituido.
+    """
+    ftp = float(getattr(profile, "ftp_watts", 0.0) or 0.0) if profile else 0.0
+    thr_pace = float(getattr(profile, "threshold_pace_sec_per_km", 0.0) or 0.0) if profile else 0.0
+    if ftp <= 0 and thr_pace <= 0:
+        return 0
+
+    sport = sport_buckets(sport_type)
+    replaced = 0
+    for i, seg in enumerate(segments):
+        if seg is None:
+            continue
+        seconds = float(moving_time_s[i] or 0.0)
+        if seconds <= 0:
+            continue
+        time_s = streams.segment(seg, "time")
+
+        if sport[i] == SPORT_CYCLING and ftp > 0 and "watts" in seg.streams:
+            np_watts = normalized_power(streams.segment(seg, "watts"), time_s)
+            if np_watts is None:
+                continue
+            if_value, method = np_watts / ftp, (7, 6)
+        elif sport[i] == SPORT_RUNNING and thr_pace > 0 and "velocity_smooth" in seg.streams:
+            ngp = normalized_graded_speed(
+                streams.segment(seg, "velocity_smooth"), streams.segment(seg, "altitude"), time_s
+            )
+            if ngp is None:
+                continue
+            if_value, method = ngp / (1000.0 / thr_pace), (8, 7)
+        else:
+            continue
+
+        m.if_value[i] = if_value
+        m.tss[i] = (seconds / 3600.0) * if_value ** 2 * 100.0
+        m.tss_method[i], m.if_method[i] = method
+        replaced += 1
+    return replaced
+
+
 # ---------- helpers semanales ----------
 
 def week_start_monday(d: date) -> date:
@@ -227,83 +487,205 @@ def compute_weekly_summary(db: Session, athlete_id: int, from_day: date, to_day:
     return {"ramp_rate_7d": ramp_rate_7d, "weeks": weeks}
 
 
+# ---------- escritura de daily_metrics ----------
+
+DAILY_METRICS_UPDATE_COLS = (
+    "tss", "duration_s", "if_value", "work_kj", "ef", "ctl", "atl", "tsb", "updated_at",
+)
+
+
+# filas por INSERT / UPDATE multi-fila (~11 parámetros por fila; Postgres admite hasta 65535)
+UPSERT_CHUNK_ROWS = 1000
+
+
+def upsert_daily_metrics(db: Session, rows: list[dict]) -> int:
+    """
+    Upsert de una serie de daily_metrics en bloque: un INSERT ... VALUES multi-fila
+    por cada UPSERT_CHUNK_ROWS días. No se usa executemany: sin RETURNING, psycopg
+    manda una sentencia por fila (y cada una dispararía los triggers de sentencia).
+    """
+    if not rows:
+        return 0
+
+    for i in range(0, len(rows), UPSERT_CHUNK_ROWS):
+        stmt = insert(DailyMetric).values(rows[i: i + UPSERT_CHUNK_ROWS])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["athlete_id", "day"],
+            set_={c: stmt.excluded[c] for c in DAILY_METRICS_UPDATE_COLS},
+        )
+        db.execute(stmt)
+    for athlete_id in {r["athlete_id"] for r in rows}:
+        invalidate_on_commit(db, athlete_id)
+    return len(rows)
+
+
+def update_activities(db: Session, rows: list[dict]) -> None:
+    """
+    UPDATE por id de varias actividades, con valores distintos por fila (todas con
+    las mismas claves): un UPDATE ... FROM (VALUES ...) por cada UPSERT_CHUNK_ROWS
+    filas. El executemany de update(Activity) manda una sentencia por fila con
+    psycopg, y cada una dispararía los triggers de versión (data_version).
+    """
+    if not rows:
+        return
+    table = Activity.__table__
+    cols = [c for c in rows[0] if c != "id"]
+    now = datetime.utcnow()
+    for i in range(0, len(rows), UPSERT_CHUNK_ROWS):
+        v = values(
+            column("id", BigInteger), *[column(c, table.c[c].type) for c in cols], name="v"
+        ).data([(r["id"], *(r[c] for c in cols)) for r in rows[i: i + UPSERT_CHUNK_ROWS]])
+        # CAST: un NULL en VALUES no lleva tipo y Postgres lo tomaría como text
+        db.execute(
+            update(table)
+            .where(table.c.id == v.c.id)
+            .values({**{c: cast(v.c[c], table.c[c].type) for c in cols}, "updated_at": now})
+        )
+
+
 # ---------- rebuild principal ----------
 
-def rebuild_daily_metrics(
+ACTIVITY_METRIC_COLS = ("tss", "tss_method", "if_value", "if_method", "work_kj", "ef", "ef_method")
+
+
+def _apply_activity_metrics(
     db: Session,
     athlete_id: int,
-    day_from: date | None = None,
-    day_to: date | None = None,
-    force: bool = False,
-) -> dict:
-    profile = db.get(AthleteProfile, athlete_id)
-
-    # 1) todas las actividades del atleta
-    q_all = (
-        select(Activity)
+    profile: AthleteProfile | None,
+    day_from: date | None,
+    day_to: date | None,
+    force: bool,
+    activity_ids: Sequence[int] | None = None,
+) -> int:
+    """
+    Calcula tss/IF/work/EF de las actividades del rango (o de `activity_ids`) con el
+    motor batch (IF/TSS con streams si la actividad los tiene) y las escribe con un UPDATE por PK en bloque (sin hidratar objetos ORM).
+    Solo se escriben las filas cuyo resultado cambia: recalcular lo ya calculado no
+    genera escrituras.
+    """
+    q = (
+        select(
+            Activity.id,
+            Activity.sport_type,
+            Activity.moving_time_s,
+            Activity.distance_m,
+            Activity.average_watts,
+            Activity.weighted_average_watts,
+            Activity.average_heartrate,
+            Activity.kilojoules,
+            *[Activity.__table__.c[c] for c in ACTIVITY_METRIC_COLS],
+        )
         .where(Activity.athlete_id == athlete_id)
-        .order_by(Activity.start_date.asc())
     )
-    acts_all = db.execute(q_all).scalars().all()
+    if activity_ids is not None:
+        q = q.where(Activity.id.in_(activity_ids))
+    if day_from is not None:
+        q = q.where(Activity.day >= day_from)
+    if day_to is not None:
+        q = q.where(Activity.day <= day_to)
+    rows = db.execute(q).all()
+    if not rows:
+        return 0
 
-    if not acts_all:
-        return {
-            "athlete_id": athlete_id,
-            "updated_activities": 0,
-            "daily_rows": 0,
-            "range": None,
-            "note": "No hay actividades para este atleta.",
-        }
+    (ids, sport_type, moving_time_s, distance_m, average_watts, weighted_average_watts,
+     average_heartrate, kilojoules, *current) = zip(*rows)
+    current = dict(zip(ACTIVITY_METRIC_COLS, current))
 
-    # 2) rellenar day antes de filtrar
-    updated_days = 0
-    for a in acts_all:
-        if force or a.day is None:
-            a.day = compute_activity_day(a)
-            updated_days += 1
-        db.add(a)
+    if force:
+        idx = np.arange(len(rows))
+    else:
+        needs_work = (sport_buckets(sport_type) == SPORT_CYCLING) & np.isnan(_float_column(current["work_kj"]))
+        needs = (
+            np.isnan(_float_column(current["tss"]))
+            | np.isnan(_float_column(current["if_value"]))
+            | np.isnan(_float_column(current["ef"]))
+            | needs_work
+        )
+        idx = np.flatnonzero(needs)
+        if len(idx) == 0:
+            return 0
+
+    picked = idx.tolist()
+
+    def pick(col: Sequence) -> list:
+        return [col[i] for i in picked]
+
+    m = compute_activity_metrics_batch(
+        sport_type=pick(sport_type),
+        moving_time_s=pick(moving_time_s),
+        distance_m=pick(distance_m),
+        average_watts=pick(average_watts),
+        weighted_average_watts=pick(weighted_average_watts),
+        average_heartrate=pick(average_heartrate),
+        kilojoules=pick(kilojoules),
+        profile=profile,
+    )
+    picked_ids = pick(ids)
+    segs = {s.activity_id: s for s in stream_store.segments(db, athlete_id, activity_ids=picked_ids)}
+    if segs:
+        apply_stream_intensity(
+            m,
+            pick(sport_type),
+            pick(moving_time_s),
+            [segs.get(a) for a in picked_ids],
+            stream_store.open(athlete_id),
+            profile,
+        )
+    cols = m.to_columns()
+    updates = []
+    for n, i in enumerate(picked):
+        values = {k: v[n] for k, v in cols.items()}
+        if all(values[k] == current[k][i] for k in ACTIVITY_METRIC_COLS):
+            continue
+        updates.append({"id": ids[i], **values})
+    if updates:
+        update_activities(db, updates)
+        invalidate_on_commit(db, athlete_id)
+    return len(updates)
+
+
+def compute_metrics_for_activities(db: Session, athlete_id: int, activity_ids: Sequence[int]) -> int:
+    """
+    tss/IF/work/EF de actividades concretas (p. ej. las recién importadas), con commit.
+    Devuelve cuántas filas han cambiado.
+    """
+    if not activity_ids:
+        return 0
+    profile = db.get(AthleteProfile, athlete_id)
+    updated = _apply_activity_metrics(db, athlete_id, profile, None, None, force=True, activity_ids=activity_ids)
     db.commit()
+    return updated
 
-    # 3) filtrar por rango
-    acts = acts_all
-    if day_from:
-        acts = [a for a in acts if a.day is not None and a.day >= day_from]
-    if day_to:
-        acts = [a for a in acts if a.day is not None and a.day <= day_to]
-
-    if not acts:
-        return {
-            "athlete_id": athlete_id,
-            "updated_activities": updated_days,
-            "daily_rows": 0,
-            "range": {"from": str(day_from) if day_from else None, "to": str(day_to) if day_to else None},
-            "note": "No hay actividades en el rango indicado.",
-        }
 
-    # 4) calcular métricas por actividad
-    updated_activity_metrics = 0
-    for a in acts:
-        sport = _sport_bucket(a.sport_type)
-        needs_work = (sport == "cycling" and a.work_kj is None)
-        needs = force or (a.tss is None) or (a.if_value is None) or (a.ef is None) or needs_work
-        if needs:
-            m = compute_activity_metrics(a, profile)
-            a.tss = m.tss
-            a.tss_method = m.tss_method
-            a.if_value = m.if_value
-            a.if_method = m.if_method
-            a.work_kj = m.work_kj
-            a.ef = m.ef
-            a.ef_method = m.ef_method
-            updated_activity_metrics += 1
-        db.add(a)
+def compute_stream_metrics(db: Session, athlete_id: int, activity_ids: Sequence[int]) -> int:
+    """
+    Recalcula IF/TSS de actividades cuyos streams acaban de llegar y, si alguna
+    cambia, marca sucios los días desde la más antigua (con commit). Devuelve
+    cuántas filas han cambiado.
+    """
+    if not activity_ids:
+        return 0
+    profile = db.get(AthleteProfile, athlete_id)
+    updated = _apply_activity_metrics(db, athlete_id, profile, None, None, force=True, activity_ids=activity_ids)
+    if updated:
+        days = db.execute(select(Activity.day).where(Activity.id.in_(activity_ids))).scalars().all()
+        mark_dirty(db, athlete_id, days)
     db.commit()
+    return updated
 
-    # rango real
-    min_day = min(a.day for a in acts if a.day is not None)
-    max_day = max(a.day for a in acts if a.day is not None)
 
-    # 5) agregados diarios desde activities: tss, duración, work_kj, EF ponderado
+def _rebuild_daily_series(
+    db: Session,
+    athlete_id: int,
+    min_day: date,
+    max_day: date,
+    profile: AthleteProfile | None,
+) -> int:
+    """
+    Recalcula y hace upsert de daily_metrics para [min_day, max_day], sembrando
+    CTL/ATL con la última fila guardada antes de min_day.
+    """
+    # agregados diarios desde activities: tss, duración, work_kj, EF ponderado
     # EF ponderado por tiempo: sum(ef * secs) / sum(secs) usando solo filas con ef != NULL
     agg_q = (
         select(
@@ -362,17 +744,21 @@ def rebuild_daily_metrics(
         .limit(1)
     ).scalars().first()
 
-    ctl_prev = float(prev.ctl) if prev else 0.0
-    atl_prev = float(prev.atl) if prev else 0.0
-
-    CTL_TC = 42.0
-    ATL_TC = 7.0
+    ctl_tc, atl_tc = time_constants(profile)
+    load = compute_load(
+        np.array([daily_map[d]["tss"] if d in daily_map else 0.0 for d in days], dtype=np.float64),
+        ctl_tc=ctl_tc,
+        atl_tc=atl_tc,
+        ctl0=float(prev.ctl) if prev else 0.0,
+        atl0=float(prev.atl) if prev else 0.0,
+    )
+    ctl_list, atl_list, tsb_list = load.ctl.tolist(), load.atl.tolist(), load.tsb.tolist()
 
-    # upsert daily_metrics con nuevos campos
-    upserted = 0
+    # serie completa en memoria y un único upsert por lotes al final
+    series: list[dict] = []
     now = datetime.utcnow()
 
-    for d in days:
+    for i, d in enumerate(days):
         data = daily_map.get(d, None)
         tss = float(data["tss"]) if data else 0.0
         duration_s = int(data["duration_s"]) if data else 0
@@ -389,44 +775,96 @@ def rebuild_daily_metrics(
         if data and data["ef_weighted_secs"] > 0:
             ef = data["ef_weighted_sum"] / float(data["ef_weighted_secs"])
 
-        tsb = ctl_prev - atl_prev
-        ctl = ctl_prev + (tss - ctl_prev) / CTL_TC
-        atl = atl_prev + (tss - atl_prev) / ATL_TC
-
-        stmt = (
-            insert(DailyMetric)
-            .values(
-                athlete_id=athlete_id,
-                day=d,
-                tss=tss,
-                duration_s=duration_s,
-                if_value=if_value,
-                work_kj=work_kj,
-                ef=ef,
-                ctl=ctl,
-                atl=atl,
-                tsb=tsb,
-                updated_at=now,
-            )
-            .on_conflict_do_update(
-                index_elements=["athlete_id", "day"],
-                set_={
-                    "tss": tss,
-                    "duration_s": duration_s,
-                    "if_value": if_value,
-                    "work_kj": work_kj,
-                    "ef": ef,
-                    "ctl": ctl,
-                    "atl": atl,
-                    "tsb": tsb,
-                    "updated_at": now,
-                },
-            )
+        series.append(
+            {
+                "athlete_id": athlete_id,
+                "day": d,
+                "tss": tss,
+                "duration_s": duration_s,
+                "if_value": if_value,
+                "work_kj": work_kj,
+                "ef": ef,
+                "ctl": ctl_list[i],
+                "atl": atl_list[i],
+                "tsb": tsb_list[i],
+                "updated_at": now,
+            }
         )
-        db.execute(stmt)
-        upserted += 1
 
-        ctl_prev, atl_prev = ctl, atl
+    upserted = upsert_daily_metrics(db, series)
+
+    return upserted
+
+
+def rebuild_daily_metrics(
+    db: Session,
+    athlete_id: int,
+    day_from: date | None = None,
+    day_to: date | None = None,
+    force: bool = False,
+) -> dict:
+    profile = db.get(AthleteProfile, athlete_id)
+    dirty = get_dirty(db, athlete_id)
+
+    # 1) day de todas las actividades del atleta
+    acts_all = db.execute(
+        select(Activity.id, Activity.start_date, Activity.timezone, Activity.day)
+        .where(Activity.athlete_id == athlete_id)
+    ).all()
+
+    if not acts_all:
+        return {
+            "athlete_id": athlete_id,
+            "updated_activities": 0,
+            "daily_rows": 0,
+            "range": None,
+            "note": "No hay actividades para este atleta.",
+        }
+
+    # 2) rellenar day antes de filtrar
+    days: list[date] = []
+    day_updates: list[dict] = []
+    for a in acts_all:
+        d = a.day
+        if force or d is None:
+            d = compute_local_day(a.start_date, a.timezone)
+            day_updates.append({"id": a.id, "day": d})
+        days.append(d)
+    if day_updates:
+        update_activities(db, day_updates)
+        invalidate_on_commit(db, athlete_id)
+    db.commit()
+    updated_days = len(day_updates)
+
+    # 3) filtrar por rango
+    if day_from:
+        days = [d for d in days if d >= day_from]
+    if day_to:
+        days = [d for d in days if d <= day_to]
+
+    if not days:
+        return {
+            "athlete_id": athlete_id,
+            "updated_activities": updated_days,
+            "daily_rows": 0,
+            "range": {"from": str(day_from) if day_from else None, "to": str(day_to) if day_to else None},
+            "note": "No hay actividades en el rango indicado.",
+        }
+
+    # rango real
+    min_day = min(days)
+    max_day = max(days)
+
+    # 4) calcular métricas por actividad
+    updated_activity_metrics = _apply_activity_metrics(db, athlete_id, profile, min_day, max_day, force)
+    db.commit()
+
+    # 5) daily_metrics del rango
+    upserted = _rebuild_daily_series(db, athlete_id, min_day, max_day, profile)
+
+    # un rebuild sin rango cubre todo el histórico: la marca de días sucios ya no aplica
+    if dirty is not None and day_from is None and day_to is None:
+        clear_dirty(db, athlete_id, dirty.dirty_from, dirty.updated_at)
 
     db.commit()
 
@@ -441,3 +879,71 @@ def rebuild_daily_metrics(
         "range": {"from": str(min_day), "to": str(max_day)},
         "weekly_summary": weekly,
     }
+
+
+def rebuild_dirty_daily_metrics(db: Session, athlete_id: int) -> dict:
+    """
+    Rebuild incremental: recalcula solo desde el primer día marcado como sucio
+    (ver services/dirty_days.py) hasta el último día con datos, sembrando CTL/ATL
+    con la daily_metric guardada del día anterior.
+    """
+    # actividades antiguas sin day (importadas antes de que el importer lo rellenara)
+    undated = db.execute(
+        select(Activity.id, Activity.start_date, Activity.timezone)
+        .where(Activity.athlete_id == athlete_id, Activity.day.is_(None))
+    ).all()
+    if undated:
+        day_updates = [{"id": a.id, "day": compute_local_day(a.start_date, a.timezone)} for a in undated]
+        update_activities(db, day_updates)
+        mark_dirty(db, athlete_id, [u["day"] for u in day_updates])
+        invalidate_on_commit(db, athlete_id)
+        db.commit()
+
+    dirty = get_dirty(db, athlete_id)
+    if dirty is None:
+        return {
+            "athlete_id": athlete_id,
+            "mode": "incremental",
+            "updated_activities": 0,
+            "daily_rows": 0,
+            "range": None,
+            "note": "No hay días pendientes de recalcular.",
+        }
+
+    min_day = dirty.dirty_from
+    profile = db.get(AthleteProfile, athlete_id)
+
+    # todo lo que cae desde el día sucio se recalcula: puede haber cambiado la actividad o el perfil
+    updated_activity_metrics = _apply_activity_metrics(db, athlete_id, profile, min_day, None, force=True)
+    db.commit()
+
+    # hasta la última actividad o la última daily_metric guardada (CTL/ATL siguen decayendo)
+    last_activity = db.execute(
+        select(func.max(Activity.day)).where(Activity.athlete_id == athlete_id)
+    ).scalar()
+    last_stored = db.execute(
+        select(func.max(DailyMetric.day)).where(DailyMetric.athlete_id == athlete_id)
+    ).scalar()
+    candidates = [d for d in (last_stored, last_activity) if d is not None]
+    max_day = max(candidates, default=None)
+
+    upserted = 0
+    if max_day is not None and max_day >= min_day:
+        upserted = _rebuild_daily_series(db, athlete_id, min_day, max_day, profile)
+
+    clear_dirty(db, athlete_id, dirty.dirty_from, dirty.updated_at)
+    db.commit()
+
+    weekly = None
+    if upserted:
+        weekly = compute_weekly_summary(db, athlete_id, min_day, max_day)
+
+    return {
+        "athlete_id": athlete_id,
+        "mode": "incremental",
+        "updated_activities": updated_activity_metrics,
+        "updated_activity_metrics": updated_activity_metrics,
+        "daily_rows": upserted,
+        "range": {"from": str(min_day), "to": str(max_day)} if upserted else None,
+        "weekly_summary": weekly,
+    }
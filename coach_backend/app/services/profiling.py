@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+
+import orjson
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# raíz del paquete app: solo se guardan las muestras con algún frame nuestro
+# (descarta hilos del threadpool en reposo y el event loop esperando en select)
+APP_ROOT = str(Path(__file__).resolve().parents[1]) + os.sep
+SUFFIX = ".speedscope.json"
+_NAME = re.compile(r"^(?P<ts>\d{8}T\d{6}\.\d{6}Z)_(?P<route>[\w.-]+)_(?P<athlete>a\d+|-)" + re.escape(SUFFIX) + "$")
+_SLUG = re.compile(r"[^\w.]+")
+# hilos del threadpool de anyio/starlette (rutas y dependencias sync)
+WORKER_THREAD_NAME = "AnyIO worker thread"
+
+# True mientras se perfila la petición o el trabajo en curso: jobs.enqueue lo mira
+# para que el trabajo que encola una petición perfilada también se perfile
+profiling_var: ContextVar[bool] = ContextVar("profiling", default=False)
+
+
+class Sampler:
+    """
+    Perfilador de muestreo: un hilo aparte lee la pila del hilo `thread_id`
+    (sys._current_frames) cada `interval_s` y, con `with_workers`, también la de
+    los hilos del threadpool, donde corren las rutas y dependencias sync (cProfile
+    solo vería el hilo del event loop).
+
+    Perfilar una petición en la API recoge también lo que hagan a la vez otras
+    peticiones; cada hilo sale como un perfil aparte en speedscope.
+    """
+
+    def __init__(self, interval_s: float, thread_id: int, with_workers: bool = False):
+        self.interval_s = interval_s
+        self.thread_id = thread_id
+        self.with_workers = with_workers
+        self.frames: list[dict[str, Any]] = []
+        self._codes: dict[Any, tuple[int, bool]] = {}
+        self._samples: dict[int, list[list]] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def __enter__(self) -> Sampler:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def stop(self) -> None:
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval_s):
+            now = time.perf_counter()
+            self._sample((now - last) * 1000)
+            last = now
+
+    def _frame(self, code) -> tuple[int, bool]:
+        entry = self._codes.get(code)
+        if entry is None:
+            entry = (len(self.frames), code.co_filename.startswith(APP_ROOT))
+            self.frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+            self._codes[code] = entry
+        return entry
+
+    def _sample(self, weight_ms: float) -> None:
+        threads = {self.thread_id}
+        if self.with_workers:
+            threads.update(t.ident for t in threading.enumerate() if t.name == WORKER_THREAD_NAME)
+        for tid, frame in sys._current_frames().items():
+            if tid not in threads:
+                continue
+            stack, in_app = [], False
+            while frame is not None:
+                index, is_app = self._frame(frame.f_code)
+                stack.append(index)
+                in_app = in_app or is_app
+                frame = frame.f_back
+            if not in_app:
+                continue
+            stack.reverse()
+            samples = self._samples.setdefault(tid, [])
+            # muestras seguidas con la misma pila se juntan en una con más peso
+            if samples and samples[-1][0] == stack:
+                samples[-1][1] += weight_ms
+            else:
+                samples.append([stack, weight_ms])
+
+    def speedscope(self, name: str) -> dict[str, Any]:
+        """Perfil en el formato de fichero de speedscope (un perfil "sampled" por hilo)."""
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        profiles = []
+        for tid, samples in self._samples.items():
+            total = sum(w for _, w in samples)
+            profiles.append({
+                "type": "sampled",
+                "name": thread_names.get(tid, str(tid)),
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": total,
+                "samples": [s for s, _ in samples],
+                "weights": [w for _, w in samples],
+            })
+        profiles.sort(key=lambda p: p["endValue"], reverse=True)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "coach_ai",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self.frames},
+            "profiles": profiles,
+        }
+
+
+class ProfileStore:
+    """
+    Directorio anillo de perfiles: PROFILE_DIR/<fecha>_<ruta>_<a<atleta>|->.speedscope.json.
+    Al guardar uno se borran los más antiguos por encima de PROFILE_MAX_FILES. Lo
+    comparten la API y los workers de la máquina.
+    """
+
+    def __init__(self, root: str | os.PathLike | None = None, max_files: int | None = None):
+        self.root = Path(root or settings.PROFILE_DIR)
+        self.max_files = max_files or settings.PROFILE_MAX_FILES
+
+    def save(self, label: str, athlete_id: int | None, profile: dict[str, Any]) -> str:
+        self.root.mkdir(parents=True, exist_ok=True)
+        ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ")
+        athlete = f"a{athlete_id}" if athlete_id is not None else "-"
+        name = f"{ts}_{_SLUG.sub('-', label).strip('-') or 'root'}_{athlete}{SUFFIX}"
+        tmp = self.root / f".{name}.tmp"
+        tmp.write_bytes(orjson.dumps(profile))
+        tmp.replace(self.root / name)
+        self._trim()
+        return name
+
+    def _trim(self) -> None:
+        # el nombre empieza por la fecha: orden alfabético = orden de creación
+        files = sorted(self.root.glob(f"*{SUFFIX}"))
+        for f in files[: max(0, len(files) - self.max_files)]:
+            f.unlink(missing_ok=True)
+
+    def list(self, route: str | None = None, athlete_id: int | None = None) -> list[dict[str, Any]]:
+        """Perfiles guardados, del más nuevo al más viejo; `route` filtra por subcadena del nombre de la ruta."""
+        if not self.root.is_dir():
+            return []
+        out = []
+        for f in sorted(self.root.glob(f"*{SUFFIX}"), reverse=True):
+            m = _NAME.match(f.name)
+            if m is None:
+                continue
+            athlete = None if m["athlete"] == "-" else int(m["athlete"][1:])
+            if route is not None and route not in m["route"]:
+                continue
+            if athlete_id is not None and athlete != athlete_id:
+                continue
+            try:
+                size = f.stat().st_size
+            except FileNotFoundError:
+                continue
+            created = datetime.strptime(m["ts"], "%Y%m%dT%H%M%S.%fZ").replace(tzinfo=timezone.utc)
+            out.append({"name": f.name, "route": m["route"], "athlete_id": athlete, "created_at": created, "bytes": size})
+        return out
+
+    def path(self, name: str) -> Path | None:
+        """Fichero del perfil `name`, o None si no existe (o no es un nombre de perfil)."""
+        if _NAME.match(name) is None:
+            return None
+        path = self.root / name
+        return path if path.is_file() else None
+
+
+profile_store = ProfileStore()
+
+
+def request_sampler() -> Sampler:
+    """Sampler para una petición: el hilo actual (event loop) y los del threadpool."""
+    return Sampler(settings.PROFILE_SAMPLE_INTERVAL_MS / 1000, threading.get_ident(), with_workers=True)
+
+
+@contextmanager
+def profiled(label: str, athlete_id: int | None = None) -> Iterator[None]:
+    """Perfila el bloque en el hilo actual (trabajos del worker) y guarda el perfil."""
+    s = Sampler(settings.PROFILE_SAMPLE_INTERVAL_MS / 1000, threading.get_ident())
+    token = profiling_var.set(True)
+    try:
+        with s:
+            yield
+    finally:
+        profiling_var.reset(token)
+        save(s, label, athlete_id)
+
+
+def save(s: Sampler, label: str, athlete_id: int | None) -> str | None:
+    """Guarda el perfil de `s`; un fallo al escribir se registra y no rompe la petición o el trabajo."""
+    try:
+        name = profile_store.save(label, athlete_id, s.speedscope(label))
+    except OSError:
+        logger.exception("perfil de %s: no se pudo guardar", label)
+        return None
+    logger.info("perfil de %s (atleta %s): %s", label, athlete_id, name)
+    return name
@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Mapping, Protocol
+
+import orjson
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+
+# bytes que se suman a cada entrada además de clave y cuerpo (tupla, OrderedDict, set)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class CacheBackend(Protocol):
+    """
+    Almacén de respuestas serializadas por atleta. Cada atleta tiene una generación
+    que forma parte de la clave: invalidar es subir la generación, así que una
+    respuesta calculada con datos de antes de la invalidación se guarda bajo la
+    generación vieja y ya no se lee nunca.
+
+    Las rutas async leen y escriben con las variantes `a*`, que no bloquean el bucle
+    de eventos; las síncronas (rutas def, worker, invalidación tras commit) con las
+    normales.
+    """
+
+    def generation(self, athlete_id: int) -> int: ...
+
+    def get(self, athlete_id: int, generation: int, key: str) -> bytes | None: ...
+
+    def set(self, athlete_id: int, generation: int, key: str, body: bytes, ttl_s: float) -> None: ...
+
+    async def ageneration(self, athlete_id: int) -> int: ...
+
+    async def aget(self, athlete_id: int, generation: int, key: str) -> bytes | None: ...
+
+    async def aset(self, athlete_id: int, generation: int, key: str, body: bytes, ttl_s: float) -> None: ...
+
+    def invalidate(self, athlete_id: int) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def stats(self) -> dict[str, Any]: ...
+
+
+class MemoryBackend:
+    """
+    LRU en proceso con TTL y tope de memoria (bytes de claves + cuerpos). Es el
+    backend por defecto y el sustituto local del compartido: cada proceso de la API
+    tiene el suyo y solo ve las invalidaciones que pasan por él. Lo que escriben
+    otros procesos (worker) no llega aquí, pero las claves incluyen la versión de
+    datos del atleta (services/data_version.py) y esas entradas dejan de usarse.
+    """
+
+    def __init__(self, max_bytes: int, clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        # una entrada nunca ocupa más de 1/4 de la caché
+        self.max_entry_bytes = max_bytes // 4
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (athlete_id, generation, key) -> (expira, cuerpo, tamaño), de la menos a la más usada
+        self._entries: OrderedDict[tuple[int, int, str], tuple[float, bytes, int]] = OrderedDict()
+        self._by_athlete: dict[int, set[tuple[int, int, str]]] = {}
+        self._generations: dict[int, int] = {}
+        self._bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0,
+                         "invalidations": 0, "too_large": 0}
+
+    def generation(self, athlete_id: int) -> int:
+        return self._generations.get(athlete_id, 0)
+
+    def get(self, athlete_id: int, generation: int, key: str) -> bytes | None:
+        k = (athlete_id, generation, key)
+        with self._lock:
+            entry = self._entries.get(k)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            if entry[0] <= self._clock():
+                self._drop(k)
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(k)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def set(self, athlete_id: int, generation: int, key: str, body: bytes, ttl_s: float) -> None:
+        size = len(body) + len(key) + ENTRY_OVERHEAD_BYTES
+        k = (athlete_id, generation, key)
+        with self._lock:
+            if size > self.max_entry_bytes:
+                self.counters["too_large"] += 1
+                return
+            # invalidado mientras se calculaba: la respuesta puede ser anterior al cambio
+            if generation != self._generations.get(athlete_id, 0):
+                return
+            if k in self._entries:
+                self._drop(k)
+            self._entries[k] = (self._clock() + ttl_s, body, size)
+            self._by_athlete.setdefault(athlete_id, set()).add(k)
+            self._bytes += size
+            self.counters["stores"] += 1
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.counters["evictions"] += 1
+
+    # sin E/S y con el lock retenido un instante: en el propio bucle de eventos
+    async def ageneration(self, athlete_id: int) -> int:
+        return self.generation(athlete_id)
+
+    async def aget(self, athlete_id: int, generation: int, key: str) -> bytes | None:
+        return self.get(athlete_id, generation, key)
+
+    async def aset(self, athlete_id: int, generation: int, key: str, body: bytes, ttl_s: float) -> None:
+        self.set(athlete_id, generation, key, body, ttl_s)
+
+    def invalidate(self, athlete_id: int) -> None:
+        with self._lock:
+            self._generations[athlete_id] = self._generations.get(athlete_id, 0) + 1
+            for k in list(self._by_athlete.get(athlete_id, ())):
+                self._drop(k)
+            self.counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for athlete_id in self._by_athlete:
+                self._generations[athlete_id] = self._generations.get(athlete_id, 0) + 1
+            self._entries.clear()
+            self._by_athlete.clear()
+            self._bytes = 0
+
+    def _drop(self, k: tuple[int, int, str]) -> None:
+        _, _, size = self._entries.pop(k)
+        self._bytes -= size
+        keys = self._by_athlete.get(k[0])
+        if keys is not None:
+            keys.discard(k)
+            if not keys:
+                del self._by_athlete[k[0]]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "athletes": len(self._by_athlete),
+                **self.counters,
+            }
+
+
+class RedisBackend:
+    """
+    Backend compartido por todos los procesos (API y worker): una invalidación en
+    cualquiera de ellos vale para todos. La generación de cada atleta es un
+    contador INCR; el TTL lo aplica Redis y el tope de memoria y la expulsión LRU
+    también (maxmemory + maxmemory-policy allkeys-lru en el servidor), así que
+    `evictions` sale de INFO stats.
+
+    Dos clientes sobre la misma URL: el síncrono para rutas def, worker e
+    invalidaciones, y uno de redis.asyncio para las rutas async, que así no bloquean
+    el bucle de eventos mientras esperan a Redis.
+    """
+
+    def __init__(self, url: str, prefix: str = "coach:rc"):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError as e:
+            raise RuntimeError("RESPONSE_CACHE_URL necesita el paquete redis>=4.2 (pip install redis)") from e
+        self._r = redis.Redis.from_url(url)
+        self._ar = redis.asyncio.Redis.from_url(url)
+        self.prefix = prefix
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "too_large": 0}
+
+    def _gen_key(self, athlete_id: int) -> str:
+        return f"{self.prefix}:gen:{athlete_id}"
+
+    def _key(self, athlete_id: int, generation: int, key: str) -> str:
+        return f"{self.prefix}:{athlete_id}:{generation}:{key}"
+
+    def generation(self, athlete_id: int) -> int:
+        return int(self._r.get(self._gen_key(athlete_id)) or 0)
+
+    def get(self, athlete_id: int, generation: int, key: str) -> bytes | None:
+        body = self._r.get(self._key(athlete_id, generation, key))
+        self.counters["hits" if body is not None else "misses"] += 1
+        return body
+
+    def set(self, athlete_id: int, generation: int, key: str, body: bytes, ttl_s: float) -> None:
+        self._r.set(self._key(athlete_id, generation, key), body, px=int(ttl_s * 1000))
+        self.counters["stores"] += 1
+
+    async def ageneration(self, athlete_id: int) -> int:
+        return int(await self._ar.get(self._gen_key(athlete_id)) or 0)
+
+    async def aget(self, athlete_id: int, generation: int, key: str) -> bytes | None:
+        body = await self._ar.get(self._key(athlete_id, generation, key))
+        self.counters["hits" if body is not None else "misses"] += 1
+        return body
+
+    async def aset(self, athlete_id: int, generation: int, key: str, body: bytes, ttl_s: float) -> None:
+        await self._ar.set(self._key(athlete_id, generation, key), body, px=int(ttl_s * 1000))
+        self.counters["stores"] += 1
+
+    def invalidate(self, athlete_id: int) -> None:
+        self._r.incr(self._gen_key(athlete_id))
+        self.counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        for k in self._r.scan_iter(f"{self.prefix}:gen:*"):
+            self._r.incr(k)
+
+    def stats(self) -> dict[str, Any]:
+        info = self._r.info()
+        return {
+            "backend": "redis",
+            "bytes": info.get("used_memory"),
+            "max_bytes": info.get("maxmemory"),
+            "evictions": info.get("evicted_keys"),
+            "expired": info.get("expired_keys"),
+            **self.counters,
+        }
+
+
+def _render(payload: Any) -> bytes:
+    if isinstance(payload, bytes):
+        return payload
+    # mismas opciones que ORJSONResponse
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _response(body: bytes, headers: Mapping[str, str] | None, status: str | None = None) -> Response:
+    headers = {**(headers or {})}
+    if status is not None:
+        headers["X-Cache"] = status
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def cache_key(endpoint: str, params: Mapping[str, Any]) -> str:
+    """`endpoint?a=1&b=2` con los parámetros ordenados (los None no cuentan)."""
+    query = "&".join(f"{k}={v}" for k, v in sorted(params.items()) if v is not None)
+    return f"{endpoint}?{query}"
+
+
+class ResponseCache:
+    """
+    Caché de respuestas JSON de los endpoints del dashboard. Guarda el cuerpo ya
+    serializado, así que un acierto no toca la BD ni vuelve a serializar.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl_s: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl_s = ttl_s
+        self.enabled = enabled
+
+    def response(
+        self,
+        athlete_id: int,
+        endpoint: str,
+        params: Mapping[str, Any],
+        build: Callable[[], Any],
+        headers: Mapping[str, str] | None = None,
+    ) -> Response:
+        """
+        Respuesta cacheada de `endpoint` con `params` o, si no está, la que devuelve
+        `build()`: un payload, o bytes si ya viene serializado. Puede lanzar
+        HTTPException (los errores no se cachean).
+        """
+        if not self.enabled:
+            return _response(_render(build()), headers)
+        key, generation, body = self._lookup(athlete_id, endpoint, params)
+        if body is not None:
+            return _response(body, headers, "HIT")
+        return self._store(athlete_id, generation, key, _render(build()), headers)
+
+    async def aresponse(
+        self,
+        athlete_id: int,
+        endpoint: str,
+        params: Mapping[str, Any],
+        build: Callable[[], Awaitable[Any]],
+        headers: Mapping[str, str] | None = None,
+    ) -> Response:
+        """Como response, para rutas async: `build` es una corrutina y el backend se usa con sus variantes a*."""
+        if not self.enabled:
+            return _response(_render(await build()), headers)
+        key = cache_key(endpoint, params)
+        generation = await self.backend.ageneration(athlete_id)
+        body = await self.backend.aget(athlete_id, generation, key)
+        if body is not None:
+            return _response(body, headers, "HIT")
+        body = _render(await build())
+        await self.backend.aset(athlete_id, generation, key, body, self.ttl_s)
+        return _response(body, headers, "MISS")
+
+    def _lookup(self, athlete_id: int, endpoint: str, params: Mapping[str, Any]) -> tuple[str, int, bytes | None]:
+        key = cache_key(endpoint, params)
+        generation = self.backend.generation(athlete_id)
+        return key, generation, self.backend.get(athlete_id, generation, key)
+
+    def _store(
+        self, athlete_id: int, generation: int, key: str, body: bytes, headers: Mapping[str, str] | None
+    ) -> Response:
+        self.backend.set(athlete_id, generation, key, body, self.ttl_s)
+        return _response(body, headers, "MISS")
+
+    def invalidate(self, athlete_id: int) -> None:
+        self.backend.invalidate(athlete_id)
+
+    def stats(self) -> dict[str, Any]:
+        return {"enabled": self.enabled, "ttl_s": self.ttl_s, **self.backend.stats()}
+
+
+_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        if settings.RESPONSE_CACHE_URL:
+            backend: CacheBackend = RedisBackend(settings.RESPONSE_CACHE_URL)
+        else:
+            backend = MemoryBackend(settings.RESPONSE_CACHE_MAX_MB * 1024 * 1024)
+        _cache = ResponseCache(backend, settings.RESPONSE_CACHE_TTL_S, settings.RESPONSE_CACHE_ENABLED)
+    return _cache
+
+
+# ---------- invalidación al hacer commit ----------
+
+_PENDING = "response_cache_invalidate"
+
+
+def invalidate_on_commit(db: Session, athlete_id: int) -> None:
+    """
+    Los datos del atleta han cambiado en esta transacción: sus respuestas
+    cacheadas se invalidan cuando haga commit (no antes, o una lectura concurrente
+    volvería a cachear los datos viejos; y no si hace rollback).
+    """
+    db.info.setdefault(_PENDING, set()).add(athlete_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    athlete_ids = session.info.pop(_PENDING, None)
+    if athlete_ids:
+        cache = get_response_cache()
+        for athlete_id in athlete_ids:
+            cache.invalidate(athlete_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_on_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING, None)
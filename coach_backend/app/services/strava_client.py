@@ -1,12 +1,64 @@
 from __future__ import annotations
-import time
+import asyncio
+from collections import deque
+from typing import AsyncIterator
+
 import httpx
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
 from app.core.config import settings
-from app.models.athlete_token import AthleteToken
+from app.services.strava_rate_limit import StravaRateLimiter, get_rate_limiter
+from app.services.strava_tokens import token_cache
+
+
+STRAVA_BASE = settings.STRAVA_BASE_URL.rstrip("/")
+
+# reintentos de una petición que Strava rechaza con 429 (cada uno espera al limitador)
+MAX_RATE_LIMIT_RETRIES = 3
+
+HTTP_TIMEOUT = httpx.Timeout(30.0)
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+
+# Clientes HTTP compartidos por proceso: reutilizan conexiones (keep-alive) en
+# vez de abrir una conexión + handshake TLS por llamada.
+_http: httpx.Client | None = None
+_async_http: httpx.AsyncClient | None = None
 
 
-STRAVA_BASE = "https://www.strava.com"
+def get_http() -> httpx.Client:
+    global _http
+    if _http is None:
+        _http = httpx.Client(timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+    return _http
+
+
+def get_async_http() -> httpx.AsyncClient:
+    global _async_http
+    if _async_http is None:
+        _async_http = httpx.AsyncClient(http2=True, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+    return _async_http
+
+
+async def close_http_clients() -> None:
+    global _http, _async_http
+    if _async_http is not None:
+        await _async_http.aclose()
+        _async_http = None
+    if _http is not None:
+        _http.close()
+        _http = None
+
+
+def refresh_access_token(refresh_token: str) -> dict:
+    r = get_http().post(f"{STRAVA_BASE}/oauth/token", data={
+        "client_id": settings.STRAVA_CLIENT_ID,
+        "client_secret": settings.STRAVA_CLIENT_SECRET,
+        "refresh_token": refresh_token,
+        "grant_type": "refresh_token",
+    })
+    r.raise_for_status()
+    return r.json()
 
 
 class StravaClient:
@@ -32,43 +84,184 @@ class StravaClient:
             "code": code,
             "grant_type": "authorization_code",
         }
-        r = httpx.post(url, data=data, timeout=30)
+        r = get_http().post(url, data=data)
         r.raise_for_status()
         return r.json()
 
     def refresh_access_token(self, refresh_token: str) -> dict:
-        url = f"{STRAVA_BASE}/oauth/token"
-        data = {
-            "client_id": settings.STRAVA_CLIENT_ID,
-            "client_secret": settings.STRAVA_CLIENT_SECRET,
-            "refresh_token": refresh_token,
-            "grant_type": "refresh_token",
-        }
-        r = httpx.post(url, data=data, timeout=30)
-        r.raise_for_status()
-        return r.json()
+        return refresh_access_token(refresh_token)
 
     def get_valid_access_token(self, athlete_id: int) -> str:
-        token_row = self.db.get(AthleteToken, athlete_id)
-        if not token_row:
-            raise ValueError("No hay tokens guardados para este athlete_id. Autoriza primero.")
-
-        now = int(time.time())
-        if token_row.expires_at <= now + 60:
-            payload = self.refresh_access_token(token_row.refresh_token)
-            token_row.access_token = payload["access_token"]
-            token_row.refresh_token = payload["refresh_token"]
-            token_row.expires_at = payload["expires_at"]
-            self.db.add(token_row)
-            self.db.commit()
-            self.db.refresh(token_row)
-
-        return token_row.access_token
-
-    def list_activities(self, access_token: str, page: int = 1, per_page: int = 200) -> list[dict]:
+        # caché en proceso + renovación single-flight (ver services/strava_tokens.py)
+        return token_cache.get(athlete_id, refresh_access_token)
+
+    def list_activities(
+        self,
+        access_token: str,
+        page: int = 1,
+        per_page: int = 200,
+        after: int | None = None,
+    ) -> list[dict]:
         url = f"{STRAVA_BASE}/api/v3/athlete/activities"
         headers = {"Authorization": f"Bearer {access_token}"}
         params = {"page": page, "per_page": per_page}
-        r = httpx.get(url, headers=headers, params=params, timeout=30)
+        if after is not None:
+            params["after"] = after
+        r = get_http().get(url, headers=headers, params=params)
+        # sin cola (cliente síncrono), pero el uso cuenta para el presupuesto compartido
+        get_rate_limiter().observe(r.headers, r.status_code)
+        r.raise_for_status()
+        return r.json()
+
+
+class AsyncStravaClient:
+    """
+    Versión async de StravaClient sobre un httpx.AsyncClient compartido (HTTP/2,
+    keep-alive). La BD sigue siendo síncrona: se usa desde el threadpool.
+
+    Las llamadas a la API pasan por el limitador compartido (StravaRateLimiter),
+    en la cola del atleta de get_valid_access_token. Si el presupuesto no vuelve
+    a tiempo lanzan StravaRateLimited.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        http: httpx.AsyncClient | None = None,
+        limiter: StravaRateLimiter | None = None,
+    ):
+        self.db = db
+        self.http = http or get_async_http()
+        self.limiter = limiter or get_rate_limiter()
+        self.athlete_id: int | None = None
+
+    async def _api_get(self, path: str, access_token: str, params: dict) -> httpx.Response:
+        url = f"{STRAVA_BASE}{path}"
+        headers = {"Authorization": f"Bearer {access_token}"}
+        for _ in range(MAX_RATE_LIMIT_RETRIES):
+            async with self.limiter.slot(self.athlete_id) as done:
+                r = await self.http.get(url, headers=headers, params=params)
+                done(r)
+            if r.status_code != 429:
+                break
+        else:
+            # Strava sigue rechazando: se difiere el trabajo hasta el reinicio, no falla
+            raise self.limiter.throttled(r.headers)
+        if r.status_code == 401 and self.athlete_id is not None:
+            # token revocado o rotado fuera: la próxima vez se relee de la BD
+            token_cache.invalidate(self.athlete_id)
+        r.raise_for_status()
+        return r
+
+    async def _post_token(self, data: dict) -> dict:
+        r = await self.http.post(f"{STRAVA_BASE}/oauth/token", data=data)
         r.raise_for_status()
         return r.json()
+
+    async def exchange_code(self, code: str) -> dict:
+        return await self._post_token({
+            "client_id": settings.STRAVA_CLIENT_ID,
+            "client_secret": settings.STRAVA_CLIENT_SECRET,
+            "code": code,
+            "grant_type": "authorization_code",
+        })
+
+    async def refresh_access_token(self, refresh_token: str) -> dict:
+        return await self._post_token({
+            "client_id": settings.STRAVA_CLIENT_ID,
+            "client_secret": settings.STRAVA_CLIENT_SECRET,
+            "refresh_token": refresh_token,
+            "grant_type": "refresh_token",
+        })
+
+    async def get_valid_access_token(self, athlete_id: int) -> str:
+        self.athlete_id = athlete_id
+        # con el token en caché no hay BD ni threadpool; si hay que leerlo o renovarlo,
+        # el camino síncrono (con sus locks) va al threadpool
+        token = token_cache.peek(athlete_id)
+        if token is not None:
+            return token
+        return await run_in_threadpool(token_cache.get, athlete_id, refresh_access_token)
+
+    async def list_activities(
+        self,
+        access_token: str,
+        page: int = 1,
+        per_page: int = 200,
+        after: int | None = None,
+    ) -> list[dict]:
+        params = {"page": page, "per_page": per_page}
+        if after is not None:
+            # epoch (s): solo actividades con start_date posterior
+            params["after"] = after
+        r = await self._api_get("/api/v3/athlete/activities", access_token, params)
+        return r.json()
+
+    async def get_activity_streams(
+        self,
+        access_token: str,
+        strava_activity_id: int,
+        keys: tuple[str, ...],
+    ) -> dict[str, list] | None:
+        """
+        Streams de una actividad a resolución completa, {tipo: valores}.
+        None si Strava no tiene streams para ella (actividad manual, borrada...).
+        """
+        params = {"keys": ",".join(keys), "key_by_type": "true"}
+        try:
+            r = await self._api_get(f"/api/v3/activities/{strava_activity_id}/streams", access_token, params)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return None
+            raise
+        payload = r.json()
+        # key_by_type=true => {"watts": {"data": [...], ...}, ...}
+        return {k: v.get("data") for k, v in payload.items() if isinstance(v, dict)}
+
+    async def iter_activity_pages(
+        self,
+        access_token: str,
+        per_page: int = 200,
+        concurrency: int = 4,
+        after: int | None = None,
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Páginas de actividades en orden, con hasta `concurrency` peticiones en vuelo.
+        Para al recibir la primera página incompleta (las posteriores en vuelo se cancelan).
+        """
+        in_flight: deque[asyncio.Task] = deque()
+        next_page = 1
+
+        def schedule() -> None:
+            nonlocal next_page
+            in_flight.append(asyncio.create_task(self.list_activities(access_token, page=next_page, per_page=per_page, after=after)))
+            next_page += 1
+
+        for _ in range(max(1, concurrency)):
+            schedule()
+
+        try:
+            while in_flight:
+                items = await in_flight.popleft()
+                if items:
+                    yield items
+                if len(items) < per_page:
+                    break
+                schedule()
+        finally:
+            for task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def list_all_activities(
+        self,
+        access_token: str,
+        per_page: int = 200,
+        concurrency: int = 4,
+        after: int | None = None,
+    ) -> list[dict]:
+        activities: list[dict] = []
+        async for items in self.iter_activity_pages(access_token, per_page=per_page, concurrency=concurrency, after=after):
+            activities.extend(items)
+        return activities
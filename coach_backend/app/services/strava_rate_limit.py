@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Hashable, Mapping
+
+from app.core.config import settings
+
+
+SHORT_WINDOW_S = 15 * 60
+DAILY_WINDOW_S = 24 * 60 * 60
+
+# Las llamadas que hacemos son de lectura: si Strava manda el límite de lectura
+# (más estricto) usamos ese; si no, el general.
+LIMIT_HEADERS = (
+    ("X-ReadRateLimit-Limit", "X-ReadRateLimit-Usage"),
+    ("X-RateLimit-Limit", "X-RateLimit-Usage"),
+)
+
+
+class StravaRateLimited(Exception):
+    """No queda presupuesto de API y la ventana no se reinicia dentro del margen de espera."""
+
+    def __init__(self, retry_at: float, window: str):
+        self.retry_at = retry_at
+        self.window = window
+        super().__init__(f"Límite de Strava ({window}) agotado hasta {int(retry_at)}")
+
+    @property
+    def retry_after_s(self) -> int:
+        return max(1, int(self.retry_at - time.time()) + 1)
+
+
+@dataclass
+class RateWindow:
+    """
+    Presupuesto de una ventana de Strava. Las ventanas son fijas en UTC: la de 15 min
+    se reinicia en :00/:15/:30/:45 y la diaria a medianoche, así que el "bucket" se
+    rellena entero en cada reinicio. `usage` viene de las cabeceras de cada respuesta.
+    """
+    name: str
+    period_s: int
+    limit: int
+    usage: int = 0
+    resets_at: float = 0.0
+
+    def roll(self, now: float) -> None:
+        if now >= self.resets_at:
+            self.usage = 0
+            self.resets_at = (now // self.period_s + 1) * self.period_s
+
+
+def parse_rate_headers(headers: Mapping[str, str]) -> tuple[tuple[int, int], tuple[int, int]] | None:
+    """((limit_15min, limit_diario), (uso_15min, uso_diario)) o None si no vienen."""
+    for limit_h, usage_h in LIMIT_HEADERS:
+        limit, usage = headers.get(limit_h), headers.get(usage_h)
+        if not limit or not usage:
+            continue
+        try:
+            l15, lday = (int(v) for v in limit.split(",")[:2])
+            u15, uday = (int(v) for v in usage.split(",")[:2])
+        except ValueError:
+            continue
+        return (l15, lday), (u15, uday)
+    return None
+
+
+class StravaRateLimiter:
+    """
+    Planificador de peticiones a la API de Strava compartido por todo el proceso.
+
+    - Cada petición toma un hueco con `slot(athlete_id)`; si no queda presupuesto en
+      alguna ventana espera a su reinicio, o lanza StravaRateLimited si el reinicio
+      queda más lejos que `max_wait_s` (el llamante difiere el trabajo).
+    - Los huecos se reparten por turnos entre atletas (round-robin), de modo que un
+      import largo no deja sin servicio a los demás.
+    - Tras cada respuesta, `observe` ajusta el uso con las cabeceras de Strava, que
+      incluyen también el consumo de otros procesos con la misma aplicación.
+    """
+
+    def __init__(
+        self,
+        short_limit: int,
+        daily_limit: int,
+        reserve: int = 0,
+        max_wait_s: float = SHORT_WINDOW_S,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.short = RateWindow("15min", SHORT_WINDOW_S, short_limit)
+        self.daily = RateWindow("daily", DAILY_WINDOW_S, daily_limit)
+        self.reserve = reserve
+        self.max_wait_s = max_wait_s
+        self.clock = clock
+
+        self._in_flight = 0
+        self._queues: dict[Hashable, deque[asyncio.Future]] = {}
+        self._ring: deque[Hashable] = deque()
+        self._timer: asyncio.TimerHandle | None = None
+
+        self.counters = {"granted": 0, "waited": 0, "deferred": 0, "throttled_429": 0}
+
+    # --- presupuesto ---
+
+    def _windows(self) -> tuple[RateWindow, RateWindow]:
+        now = self.clock()
+        self.short.roll(now)
+        self.daily.roll(now)
+        return self.short, self.daily
+
+    def _available(self, w: RateWindow) -> int:
+        return w.limit - w.usage - self._in_flight - self.reserve
+
+    def _blocking_window(self) -> RateWindow | None:
+        """La ventana agotada que más tarda en reiniciarse (None si hay presupuesto)."""
+        blocked = [w for w in self._windows() if self._available(w) <= 0]
+        return max(blocked, key=lambda w: w.resets_at) if blocked else None
+
+    # --- cola justa por atleta ---
+
+    def _has_waiters(self) -> bool:
+        return any(self._queues.values())
+
+    def _next_waiter(self) -> asyncio.Future | None:
+        while self._ring:
+            key = self._ring.popleft()
+            q = self._queues.get(key)
+            while q and q[0].done():       # cancelados mientras esperaban
+                q.popleft()
+            if not q:
+                self._queues.pop(key, None)
+                continue
+            fut = q.popleft()
+            if q:
+                self._ring.append(key)
+            else:
+                self._queues.pop(key, None)
+            return fut
+        return None
+
+    def _dispatch(self) -> None:
+        while self._has_waiters():
+            blocking = self._blocking_window()
+            if blocking is not None:
+                self._schedule_wakeup(blocking.resets_at)
+                return
+            fut = self._next_waiter()
+            if fut is None:
+                return
+            self._in_flight += 1
+            self.counters["granted"] += 1
+            fut.set_result(None)
+
+    def _schedule_wakeup(self, at: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(0.0, at - self.clock())
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    # --- API ---
+
+    async def acquire(self, key: Hashable) -> None:
+        if not self._has_waiters():
+            blocking = self._blocking_window()
+            if blocking is None:
+                self._in_flight += 1
+                self.counters["granted"] += 1
+                return
+        else:
+            blocking = self._blocking_window()
+
+        if blocking is not None and blocking.resets_at - self.clock() > self.max_wait_s:
+            self.counters["deferred"] += 1
+            raise StravaRateLimited(blocking.resets_at, blocking.name)
+
+        fut = asyncio.get_running_loop().create_future()
+        q = self._queues.get(key)
+        if q is None:
+            q = self._queues[key] = deque()
+            self._ring.append(key)
+        q.append(fut)
+        self.counters["waited"] += 1
+        self._dispatch()
+
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # concedido justo antes de cancelar: devolvemos el hueco
+            if fut.done() and not fut.cancelled():
+                self._in_flight = max(0, self._in_flight - 1)
+                self._dispatch()
+            raise
+
+    def release(self, headers: Mapping[str, str] | None = None, status_code: int | None = None) -> None:
+        self._in_flight = max(0, self._in_flight - 1)
+        self.observe(headers, status_code)
+        if self._has_waiters():
+            self._dispatch()
+
+    def observe(self, headers: Mapping[str, str] | None, status_code: int | None = None) -> None:
+        """
+        Actualiza el uso con una respuesta. Las respuestas pueden llegar desordenadas,
+        así que el uso nunca baja dentro de la ventana. Sin cabeceras (error de red...)
+        contamos la petición nosotros. Un 429 agota la ventana que lo provoca.
+        """
+        short, daily = self._windows()
+        parsed = parse_rate_headers(headers) if headers is not None else None
+        if parsed is not None:
+            (l15, lday), (u15, uday) = parsed
+            short.limit, daily.limit = l15, lday
+            short.usage, daily.usage = max(short.usage, u15), max(daily.usage, uday)
+        else:
+            short.usage += 1
+            daily.usage += 1
+
+        if status_code == 429:
+            self.counters["throttled_429"] += 1
+            if daily.usage >= daily.limit:
+                daily.usage = daily.limit
+            else:
+                short.usage = max(short.usage, short.limit)
+
+    def throttled(self, headers: Mapping[str, str]) -> StravaRateLimited:
+        """
+        Excepción para un 429 que sigue tras los reintentos: hasta el reinicio de la
+        ventana agotada según las cabeceras (la diaria si su uso llega al límite), o
+        hasta Retry-After si es posterior.
+        """
+        short, daily = self._windows()
+        parsed = parse_rate_headers(headers)
+        if parsed is not None:
+            (_, lday), (_, uday) = parsed
+            window = daily if uday >= lday else short
+        else:
+            window = daily if daily.usage >= daily.limit else short
+        retry_at = window.resets_at
+        retry_after = headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            retry_at = max(retry_at, self.clock() + int(retry_after))
+        self.counters["deferred"] += 1
+        return StravaRateLimited(retry_at, window.name)
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable) -> AsyncIterator[Callable[..., None]]:
+        """
+        Hueco para una petición. Devuelve `done(response)` para registrar las cabeceras;
+        si no se llama (excepción), el hueco se libera contando la petición como hecha.
+        """
+        await self.acquire(key)
+        released = False
+
+        def done(response) -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.release(response.headers, response.status_code)
+
+        try:
+            yield done
+        finally:
+            if not released:
+                self.release()
+
+    def snapshot(self) -> dict:
+        short, daily = self._windows()
+        return {
+            "windows": {
+                w.name: {
+                    "limit": w.limit,
+                    "usage": w.usage,
+                    "remaining": max(0, w.limit - w.usage),
+                    "available": max(0, self._available(w)),
+                    "resets_at": int(w.resets_at),
+                }
+                for w in (short, daily)
+            },
+            "in_flight": self._in_flight,
+            "queued": {str(k): sum(1 for f in q if not f.done()) for k, q in self._queues.items() if q},
+            "reserve": self.reserve,
+            "counters": dict(self.counters),
+        }
+
+
+_limiter: StravaRateLimiter | None = None
+
+
+def get_rate_limiter() -> StravaRateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = StravaRateLimiter(
+            short_limit=settings.STRAVA_RATE_LIMIT_15MIN,
+            daily_limit=settings.STRAVA_RATE_LIMIT_DAILY,
+            reserve=settings.STRAVA_RATE_LIMIT_RESERVE,
+            max_wait_s=settings.STRAVA_RATE_LIMIT_MAX_WAIT_S,
+        )
+    return _limiter
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.models.strava_sync_state import StravaSyncState
+from app.db.session import SessionLocal
+from app.services.activity_importer import parse_dt, upsert_activities_written
+from app.services.metrics_calculator import compute_metrics_for_activities
+from app.services.strava_client import AsyncStravaClient
+
+PER_PAGE = 200
+PAGE_CONCURRENCY = 4
+# páginas en espera entre etapas del pipeline de import
+PIPELINE_QUEUE_SIZE = 2
+
+
+@dataclass
+class SyncPlan:
+    full: bool
+    # epoch (s) para el parámetro `after` de Strava; None => todo el histórico
+    after: int | None
+
+
+def get_sync_state(db: Session, athlete_id: int) -> StravaSyncState | None:
+    return db.execute(
+        select(StravaSyncState).where(StravaSyncState.athlete_id == athlete_id)
+    ).scalars().first()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def plan_sync(state: StravaSyncState | None, force_full: bool = False, now: datetime | None = None) -> SyncPlan:
+    """
+    Decide si el sync es completo o incremental.
+
+    Completo si se pide, si nunca se ha sincronizado o si el último completo tiene
+    más de STRAVA_FULL_SYNC_DAYS. Si no, solo lo posterior al cursor, menos un
+    margen de STRAVA_SYNC_OVERLAP_HOURS para actividades que llegan tarde a Strava
+    (subidas desde el reloj horas después) con start_date anterior al cursor.
+    """
+    now = now or _utcnow()
+    if force_full or state is None or state.last_start_date is None or state.last_full_sync_at is None:
+        return SyncPlan(full=True, after=None)
+
+    if _as_utc(state.last_full_sync_at) <= now - timedelta(days=settings.STRAVA_FULL_SYNC_DAYS):
+        return SyncPlan(full=True, after=None)
+
+    after = _as_utc(state.last_start_date) - timedelta(hours=settings.STRAVA_SYNC_OVERLAP_HOURS)
+    return SyncPlan(full=False, after=int(after.timestamp()))
+
+
+def newest_start_date(activities: list[dict], current: datetime | None = None) -> datetime | None:
+    newest = _as_utc(current) if current else None
+    for a in activities:
+        start = parse_dt(a["start_date"])
+        if newest is None or start > newest:
+            newest = start
+    return newest
+
+
+def record_sync(
+    db: Session,
+    athlete_id: int,
+    last_start_date: datetime | None,
+    full: bool,
+    now: datetime | None = None,
+) -> None:
+    """
+    Guarda el cursor tras un sync terminado sin errores. No hace commit.
+    El cursor nunca retrocede (GREATEST) aunque dos syncs se solapen.
+    """
+    now = now or _utcnow()
+    values = {"athlete_id": athlete_id, "last_start_date": last_start_date, "last_sync_at": now}
+    if full:
+        values["last_full_sync_at"] = now
+
+    stmt = insert(StravaSyncState).values(**values)
+    set_ = {
+        "last_start_date": func.greatest(StravaSyncState.last_start_date, stmt.excluded.last_start_date),
+        "last_sync_at": stmt.excluded.last_sync_at,
+    }
+    if full:
+        set_["last_full_sync_at"] = stmt.excluded.last_full_sync_at
+    db.execute(stmt.on_conflict_do_update(index_elements=["athlete_id"], set_=set_))
+
+
+# fin de flujo entre etapas del pipeline
+_END = object()
+
+
+def _compute_metrics(athlete_id: int, activity_ids: list[int]) -> int:
+    # sesión propia: corre en otro hilo a la vez que el upsert
+    with SessionLocal() as db:
+        return compute_metrics_for_activities(db, athlete_id, activity_ids)
+
+
+async def _run_stages(*stages) -> None:
+    """
+    Ejecuta las etapas a la vez; si una falla se cancelan las demás (que pueden
+    estar esperando en una cola que ya nadie va a llenar o vaciar) y se propaga
+    su excepción tal cual (sin ExceptionGroup, para que el llamante pueda capturarla).
+    """
+    tasks = [asyncio.create_task(stage) for stage in stages]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def sync_activities(
+    db: Session,
+    athlete_id: int,
+    full: bool = False,
+    on_progress: Callable[[dict], None] | None = None,
+) -> dict:
+    """
+    Importa de Strava las actividades del atleta: incrementales desde el cursor o
+    todo el histórico (ver plan_sync).
+
+    Pipeline de tres etapas unidas por colas acotadas (PIPELINE_QUEUE_SIZE):
+        descarga de páginas -> upsert (+ commit) -> tss/IF/EF de las filas escritas
+    Mientras una página se guarda, las siguientes se siguen descargando y las
+    métricas de la anterior se calculan en otra sesión, así que el tiempo total
+    tiende a max(red, BD) en vez de a la suma. Las colas acotadas frenan la
+    descarga si la BD no da abasto.
+
+    Si el presupuesto de la API se agota propaga StravaRateLimited: lo guardado se
+    queda y, como el cursor no avanza, el siguiente sync lo retoma.
+    """
+    client = AsyncStravaClient(db)
+    access_token = await client.get_valid_access_token(athlete_id)
+
+    state = await run_in_threadpool(get_sync_state, db, athlete_id)
+    plan = plan_sync(state, force_full=full)
+    newest = state.last_start_date if state else None
+
+    # un sync incremental suele caber en una página: sin peticiones especulativas
+    concurrency = PAGE_CONCURRENCY if plan.full else 1
+
+    progress = {
+        "athlete_id": athlete_id,
+        "mode": "full" if plan.full else "incremental",
+        "after": plan.after,
+        "fetched": 0,
+        "saved_or_updated": 0,
+        "metrics_updated": 0,
+        "pages": 0,
+    }
+
+    pages: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    written: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    async def fetch_stage() -> None:
+        async for items in client.iter_activity_pages(
+            access_token, per_page=PER_PAGE, concurrency=concurrency, after=plan.after
+        ):
+            progress["pages"] += 1
+            progress["fetched"] += len(items)
+            await pages.put(items)
+        await pages.put(_END)
+
+    async def upsert_stage() -> None:
+        nonlocal newest
+        while (items := await pages.get()) is not _END:
+            ids = await run_in_threadpool(upsert_activities_written, db, athlete_id, items)
+            newest = newest_start_date(items, newest)
+            progress["saved_or_updated"] += len(ids)
+            if ids:
+                await written.put(ids)
+            if on_progress is not None:
+                await run_in_threadpool(on_progress, dict(progress))
+        await written.put(_END)
+
+    async def metrics_stage() -> None:
+        while (ids := await written.get()) is not _END:
+            progress["metrics_updated"] += await run_in_threadpool(_compute_metrics, athlete_id, ids)
+
+    await _run_stages(fetch_stage(), upsert_stage(), metrics_stage())
+
+    # el cursor solo avanza si se han procesado todas las páginas
+    await run_in_threadpool(record_sync, db, athlete_id, newest, plan.full)
+    await run_in_threadpool(db.commit)
+    return progress
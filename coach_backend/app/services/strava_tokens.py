@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.models.athlete_token import AthleteToken
+
+
+# renovamos el access token si caduca en menos de esto
+REFRESH_MARGIN_S = 60
+
+
+@dataclass(frozen=True)
+class CachedToken:
+    access_token: str
+    expires_at: int
+
+    def valid(self, now: float) -> bool:
+        return self.expires_at > now + REFRESH_MARGIN_S
+
+
+class StravaTokenCache:
+    """
+    Caché en proceso de access tokens de Strava por atleta.
+
+    - Con el token en caché y lejos de caducar no se toca la BD.
+    - Renovación single-flight: un lock por atleta hace que solo un hilo renueve
+      mientras los demás esperan y reutilizan su resultado. Strava rota el refresh
+      token en cada renovación, así que dos renovaciones en paralelo dejarían a
+      una de ellas con un refresh token ya invalidado.
+    - Entre procesos/nodos, un advisory lock de Postgres por atleta serializa la
+      lectura + renovación + escritura de athlete_tokens; quien entra después ve
+      el token ya renovado y no vuelve a renovar.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._tokens: dict[int, CachedToken] = {}
+        self._locks: dict[int, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self.counters = {"hits": 0, "db_reads": 0, "refreshes": 0}
+
+    def _lock_for(self, athlete_id: int) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(athlete_id)
+            if lock is None:
+                lock = self._locks[athlete_id] = threading.Lock()
+            return lock
+
+    def peek(self, athlete_id: int) -> str | None:
+        """Access token en caché si sigue siendo válido (sin BD ni locks)."""
+        cached = self._tokens.get(athlete_id)
+        if cached is not None and cached.valid(time.time()):
+            self.counters["hits"] += 1
+            return cached.access_token
+        return None
+
+    def put(self, athlete_id: int, access_token: str, expires_at: int) -> None:
+        self._tokens[athlete_id] = CachedToken(access_token, int(expires_at))
+
+    def invalidate(self, athlete_id: int) -> None:
+        self._tokens.pop(athlete_id, None)
+
+    def get(self, athlete_id: int, refresh: Callable[[str], dict]) -> str:
+        """
+        Access token válido del atleta. `refresh(refresh_token)` llama a Strava y
+        devuelve su payload (access_token, refresh_token, expires_at).
+        """
+        token = self.peek(athlete_id)
+        if token is not None:
+            return token
+
+        with self._lock_for(athlete_id):
+            # otro hilo puede haberlo renovado mientras esperábamos el lock
+            token = self.peek(athlete_id)
+            if token is not None:
+                return token
+            return self._load_or_refresh(athlete_id, refresh)
+
+    def _load_or_refresh(self, athlete_id: int, refresh: Callable[[str], dict]) -> str:
+        # sesión propia: el commit de la renovación no debe arrastrar nada del llamante
+        with self.session_factory() as db:
+            db.execute(select(func.pg_advisory_xact_lock(func.hashtextextended(f"strava_token:{athlete_id}", 0))))
+            self.counters["db_reads"] += 1
+            row = db.get(AthleteToken, athlete_id)
+            if not row:
+                raise ValueError("No hay tokens guardados para este athlete_id. Autoriza primero.")
+
+            if row.expires_at <= time.time() + REFRESH_MARGIN_S:
+                payload = refresh(row.refresh_token)
+                self.counters["refreshes"] += 1
+                row.access_token = payload["access_token"]
+                row.refresh_token = payload["refresh_token"]
+                row.expires_at = int(payload["expires_at"])
+
+            access_token, expires_at = row.access_token, row.expires_at
+            # el commit libera el advisory lock
+            db.commit()
+
+        self.put(athlete_id, access_token, expires_at)
+        return access_token
+
+
+token_cache = StravaTokenCache()
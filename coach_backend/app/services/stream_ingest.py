@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Callable
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.db.session import SessionLocal
+from app.models.activity import Activity
+from app.models.activity_stream_index import ActivityStreamIndex
+from app.services.metrics_calculator import compute_stream_metrics
+from app.services.stream_store import STREAM_TYPES, stream_store
+from app.services.strava_client import AsyncStravaClient
+
+# descargas de streams en vuelo por atleta (cada una pasa por el limitador de Strava)
+STREAM_CONCURRENCY = 4
+
+
+def _pending_query(athlete_id: int):
+    return (
+        select(Activity.id, Activity.strava_activity_id)
+        .outerjoin(ActivityStreamIndex, ActivityStreamIndex.activity_id == Activity.id)
+        .where(
+            Activity.athlete_id == athlete_id,
+            ActivityStreamIndex.activity_id.is_(None),
+            Activity.moving_time_s > 0,
+        )
+    )
+
+
+def pending_activities(db: Session, athlete_id: int, limit: int) -> list[tuple[int, int]]:
+    """(id, strava_activity_id) de actividades sin streams, de la más antigua a la más nueva."""
+    q = _pending_query(athlete_id).order_by(Activity.start_date, Activity.id).limit(limit)
+    return [tuple(r) for r in db.execute(q).all()]
+
+
+def count_pending(db: Session, athlete_id: int) -> int:
+    return db.execute(select(func.count()).select_from(_pending_query(athlete_id).subquery())).scalar()
+
+
+def _write(athlete_id: int, activity_id: int, streams: dict) -> int:
+    # sesión propia por escritura: write() toma un advisory lock y hace commit
+    with SessionLocal() as db:
+        return stream_store.write(db, athlete_id, activity_id, streams)
+
+
+async def ingest_streams(
+    db: Session,
+    athlete_id: int,
+    limit: int,
+    on_progress: Callable[[dict], None] | None = None,
+) -> dict:
+    """
+    Descarga de Strava los streams de hasta `limit` actividades que aún no los
+    tienen y los guarda en el stream store. Las descargas van en paralelo
+    (STREAM_CONCURRENCY) pero se escriben por orden de fecha, para que los
+    segmentos de una temporada queden contiguos en los ficheros. Al final (aunque
+    haya una excepción) se recalcula IF/TSS de las actividades con streams
+    escritas (NP / GAP).
+    """
+    pending = await run_in_threadpool(pending_activities, db, athlete_id, limit)
+    progress = {"athlete_id": athlete_id, "activities": 0, "samples": 0, "without_streams": 0, "metrics_updated": 0}
+    if not pending:
+        progress["remaining"] = 0
+        return progress
+
+    client = AsyncStravaClient(db)
+    access_token = await client.get_valid_access_token(athlete_id)
+
+    todo = deque(pending)
+    in_flight: deque[tuple[int, asyncio.Task]] = deque()
+    with_streams: list[int] = []
+
+    def schedule() -> None:
+        activity_id, strava_id = todo.popleft()
+        task = asyncio.create_task(client.get_activity_streams(access_token, strava_id, STREAM_TYPES))
+        in_flight.append((activity_id, task))
+
+    try:
+        for _ in range(min(STREAM_CONCURRENCY, len(todo))):
+            schedule()
+        while in_flight:
+            activity_id, task = in_flight.popleft()
+            streams = await task
+            if todo:
+                schedule()
+            samples = await run_in_threadpool(_write, athlete_id, activity_id, streams or {})
+            progress["activities"] += 1
+            progress["samples"] += samples
+            if samples:
+                with_streams.append(activity_id)
+            else:
+                progress["without_streams"] += 1
+            if on_progress is not None:
+                await run_in_threadpool(on_progress, dict(progress))
+    finally:
+        for _, task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*(t for _, t in in_flight), return_exceptions=True)
+        # también si el bucle se corta (StravaRateLimited, error de Strava...): lo ya
+        # escrito sale de pending_activities y no volvería a pasar por aquí
+        progress["metrics_updated"] = await run_in_threadpool(compute_stream_metrics, db, athlete_id, with_streams)
+
+    progress["remaining"] = await run_in_threadpool(count_pending, db, athlete_id)
+    return progress
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import numpy as np
+
+from app.services.stream_store import MISSING_INT
+
+
+# Ventana de la media móvil de NP / NGP (s)
+ROLLING_WINDOW_S = 30
+# Huecos en el stream de tiempo más largos que esto son paradas (autopausa): no se
+# rellenan. Los más cortos se rellenan con ceros (1 Hz) como hace el cálculo estándar de NP.
+STOP_GAP_S = 60
+# Semiventana (s) para la pendiente en GAP: altitud y distancia a ±k segundos
+GRADE_HALF_WINDOW_S = 5
+# Rango de pendientes del modelo de coste de Minetti
+MAX_GRADE = 0.45
+
+
+def _as_float(values: np.ndarray) -> np.ndarray:
+    """Copia en float64 con "sin dato" (-1 en enteras, NaN en float) como NaN."""
+    x = np.asarray(values, dtype=np.float64)
+    if np.asarray(values).dtype.kind in "iu":
+        x[x == MISSING_INT] = np.nan
+    return x
+
+
+def resample_1hz(time_s: np.ndarray | None, *columns: np.ndarray) -> list[np.ndarray]:
+    """
+    Columnas a 1 Hz según el stream de tiempo: los huecos de hasta STOP_GAP_S se
+    expanden (muestras nuevas = NaN) y los más largos se tratan como pausa (1 s).
+    Sin stream de tiempo se asume que ya es 1 Hz.
+    """
+    cols = [_as_float(c) for c in columns]
+    if time_s is None or len(time_s) < 2:
+        return cols
+    dt = np.diff(np.asarray(time_s, dtype=np.int64))
+    step = np.where((dt > 0) & (dt <= STOP_GAP_S), dt, 1)
+    if (step == 1).all():
+        return cols
+    pos = np.concatenate(([0], np.cumsum(step)))
+    out = []
+    for c in cols:
+        full = np.full(int(pos[-1]) + 1, np.nan)
+        full[pos] = c
+        out.append(full)
+    return out
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """Media móvil por sumas acumuladas: len(x) - window + 1 valores, O(n)."""
+    if len(x) < window:
+        return np.empty(0)
+    c = np.cumsum(np.concatenate(([0.0], x)))
+    return (c[window:] - c[:-window]) / window
+
+
+def _fourth_power_mean(x: np.ndarray) -> float | None:
+    r = rolling_mean(x, ROLLING_WINDOW_S)
+    if len(r) == 0:
+        return None
+    value = float(np.mean(r ** 4) ** 0.25)
+    return value if value > 0 else None
+
+
+def normalized_power(watts: np.ndarray, time_s: np.ndarray | None = None) -> float | None:
+    """
+    Normalized Power: media móvil de 30 s a 1 Hz, media de la 4ª potencia y raíz
+    cuarta. Los huecos cortos y las muestras sin dato cuentan como 0 W.
+    None si la actividad dura menos que la ventana.
+    """
+    (w,) = resample_1hz(time_s, watts)
+    return _fourth_power_mean(np.nan_to_num(w, nan=0.0))
+
+
+def minetti_cost_factor(grade: np.ndarray) -> np.ndarray:
+    """
+    Coste energético de correr con pendiente `grade` respecto al llano (Minetti et al.
+    2002): Cr(i) = 155.4i^5 - 30.4i^4 - 43.3i^3 + 46.3i^2 + 19.5i + 3.6 J/kg/m.
+    """
+    i = np.clip(grade, -MAX_GRADE, MAX_GRADE)
+    cr = ((((155.4 * i - 30.4) * i - 43.3) * i + 46.3) * i + 19.5) * i + 3.6
+    return cr / 3.6
+
+
+def grade_adjusted_speed(
+    velocity: np.ndarray,
+    altitude: np.ndarray | None,
+    time_s: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Velocidad ajustada a la pendiente (GAP, m/s) a 1 Hz. La pendiente es
+    Δaltitud / Δdistancia entre t-k y t+k (k = GRADE_HALF_WINDOW_S), con la distancia
+    integrada de velocity_smooth. Sin altitud, GAP = velocidad.
+    """
+    if altitude is None:
+        (v,) = resample_1hz(time_s, velocity)
+        return np.nan_to_num(v, nan=0.0)
+
+    v, alt = resample_1hz(time_s, velocity, altitude)
+    v = np.nan_to_num(v, nan=0.0)
+    ok = ~np.isnan(alt)
+    if not ok.any():
+        return v
+    # altitud sin dato: interpolada entre las muestras válidas
+    idx = np.arange(len(alt))
+    alt = np.interp(idx, idx[ok], alt[ok])
+
+    dist = np.cumsum(v)
+    k = GRADE_HALF_WINDOW_S
+    hi = np.minimum(idx + k, len(v) - 1)
+    lo = np.maximum(idx - k, 0)
+    d_dist = dist[hi] - dist[lo]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grade = np.where(d_dist > 1.0, (alt[hi] - alt[lo]) / d_dist, 0.0)
+    return v * minetti_cost_factor(grade)
+
+
+def normalized_graded_speed(
+    velocity: np.ndarray,
+    altitude: np.ndarray | None,
+    time_s: np.ndarray | None = None,
+) -> float | None:
+    """NGP como velocidad (m/s): mismo promedio que NP sobre la velocidad GAP."""
+    return _fourth_power_mean(grade_adjusted_speed(velocity, altitude, time_s))
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.models.activity import Activity
+from app.models.activity_stream_index import ActivityStreamIndex
+
+
+# Columnas que guardamos y su tipo en disco. Todas las columnas de un atleta van
+# alineadas: la muestra i de cada fichero es el mismo instante.
+STREAM_DTYPES: dict[str, np.dtype] = {
+    "time": np.dtype("<i4"),             # s desde el inicio (int16 no llega a 9 h)
+    "watts": np.dtype("<i2"),
+    "heartrate": np.dtype("<i2"),
+    "cadence": np.dtype("<i2"),          # tal cual la da Strava (en carrera, por pierna)
+    "velocity_smooth": np.dtype("<f4"),  # m/s
+    "altitude": np.dtype("<f4"),         # m
+}
+STREAM_TYPES = tuple(STREAM_DTYPES)
+
+# valor "sin dato": -1 en las enteras, NaN en las float
+MISSING_INT = -1
+
+
+def _missing(dtype: np.dtype):
+    return np.nan if dtype.kind == "f" else MISSING_INT
+
+
+@dataclass(frozen=True)
+class StreamSegment:
+    activity_id: int
+    start_date: datetime
+    day: date | None
+    offset: int
+    length: int
+    streams: tuple[str, ...]
+
+
+class AthleteStreams:
+    """
+    Streams de un atleta abiertos con numpy.memmap (solo lectura). Las columnas y los
+    segmentos son vistas sobre el fichero: no se copia nada hasta que se opera con ellos.
+    Los ficheros solo crecen, así que una instancia ve los datos que había al abrirla.
+    """
+
+    def __init__(self, root: Path, athlete_id: int):
+        self.athlete_id = athlete_id
+        self.path = root / str(athlete_id)
+        self._columns: dict[str, np.ndarray] = {}
+
+    def column(self, stream_type: str) -> np.ndarray:
+        if stream_type not in STREAM_DTYPES:
+            raise ValueError(f"stream desconocido: {stream_type}")
+        col = self._columns.get(stream_type)
+        if col is None:
+            dtype = STREAM_DTYPES[stream_type]
+            f = self.path / f"{stream_type}.bin"
+            n = f.stat().st_size // dtype.itemsize if f.exists() else 0
+            # memmap no admite ficheros vacíos
+            col = np.memmap(f, dtype=dtype, mode="r", shape=(n,)) if n else np.empty(0, dtype=dtype)
+            self._columns[stream_type] = col
+        return col
+
+    def segment(self, seg: StreamSegment, stream_type: str) -> np.ndarray | None:
+        """Vista del stream de una actividad; None si Strava no lo tenía."""
+        if stream_type not in seg.streams:
+            return None
+        return self.column(stream_type)[seg.offset: seg.offset + seg.length]
+
+    def segments(self, segs: list[StreamSegment], stream_type: str) -> list[np.ndarray | None]:
+        return [self.segment(s, stream_type) for s in segs]
+
+    def span(self, segs: list[StreamSegment], stream_type: str) -> np.ndarray:
+        """
+        Un stream de varios segmentos seguidos (p. ej. una temporada) como un solo array.
+        Si los segmentos están contiguos en el fichero (lo normal: se ingieren por orden
+        de fecha) es una vista sin copia; si no, se concatenan. Los segmentos sin ese
+        stream aportan "sin dato".
+        """
+        if not segs:
+            return np.empty(0, dtype=STREAM_DTYPES[stream_type])
+        col = self.column(stream_type)
+        start = segs[0].offset
+        contiguous = all(b.offset == a.offset + a.length for a, b in zip(segs, segs[1:]))
+        if contiguous:
+            return col[start: segs[-1].offset + segs[-1].length]
+        return np.concatenate([col[s.offset: s.offset + s.length] for s in segs])
+
+
+class StreamStore:
+    """
+    Ficheros columnares por atleta en STREAMS_DIR/<athlete_id>/<stream>.bin, de solo
+    añadir, más el índice activity_stream_index en Postgres (actividad -> offset, length).
+
+    Escritura: bajo un advisory lock por atleta, el siguiente offset es el final del
+    último segmento del índice. Los datos se escriben ahí (pisando restos de una
+    escritura a medias), se hace fsync y solo entonces se confirma la fila del índice.
+    Reimportar una actividad añade un segmento nuevo; el viejo queda sin referencias.
+    """
+
+    def __init__(self, root: str | os.PathLike | None = None):
+        self.root = Path(root or settings.STREAMS_DIR)
+
+    def open(self, athlete_id: int) -> AthleteStreams:
+        return AthleteStreams(self.root, athlete_id)
+
+    def _next_offset(self, db: Session, athlete_id: int) -> int:
+        return db.execute(
+            select(func.coalesce(func.max(ActivityStreamIndex.offset + ActivityStreamIndex.length), 0))
+            .where(ActivityStreamIndex.athlete_id == athlete_id)
+        ).scalar()
+
+    def write(self, db: Session, athlete_id: int, activity_id: int, streams: dict[str, list | np.ndarray]) -> int:
+        """
+        Guarda los streams de una actividad y hace commit. `streams` es
+        {tipo: valores}; los tipos que falten se rellenan con "sin dato".
+        Devuelve el nº de muestras.
+        """
+        present = [t for t in STREAM_TYPES if streams.get(t) is not None and len(streams[t])]
+        length = max((len(streams[t]) for t in present), default=0)
+
+        db.execute(select(func.pg_advisory_xact_lock(func.hashtextextended(f"streams:{athlete_id}", 0))))
+        offset = self._next_offset(db, athlete_id)
+
+        if length:
+            self.path_for(athlete_id).mkdir(parents=True, exist_ok=True)
+            for stream_type, dtype in STREAM_DTYPES.items():
+                col = np.full(length, _missing(dtype), dtype=dtype)
+                if stream_type in present:
+                    values = np.asarray(streams[stream_type], dtype=np.float64)[:length]
+                    if dtype.kind != "f":
+                        info = np.iinfo(dtype)
+                        values = np.where(np.isnan(values), MISSING_INT, np.clip(np.rint(values), info.min, info.max))
+                    col[: len(values)] = values
+                self._write_column(athlete_id, stream_type, offset, col)
+
+        stmt = insert(ActivityStreamIndex).values(
+            activity_id=activity_id,
+            athlete_id=athlete_id,
+            offset=offset,
+            length=length,
+            streams=present,
+            updated_at=datetime.utcnow(),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["activity_id"],
+            set_={
+                "offset": stmt.excluded.offset,
+                "length": stmt.excluded.length,
+                "streams": stmt.excluded.streams,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        db.execute(stmt)
+        # el commit libera el advisory lock
+        db.commit()
+        return length
+
+    def path_for(self, athlete_id: int) -> Path:
+        return self.root / str(athlete_id)
+
+    def _write_column(self, athlete_id: int, stream_type: str, offset: int, col: np.ndarray) -> None:
+        f = self.path_for(athlete_id) / f"{stream_type}.bin"
+        with open(f, "r+b" if f.exists() else "w+b") as fh:
+            fh.seek(offset * col.dtype.itemsize)
+            fh.write(col.tobytes())
+            fh.truncate()
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def segments(
+        self,
+        db: Session,
+        athlete_id: int,
+        day_from: date | None = None,
+        day_to: date | None = None,
+        activity_ids: Sequence[int] | None = None,
+    ) -> list[StreamSegment]:
+        """Segmentos con datos del atleta (opcionalmente por rango de días o actividades), por fecha."""
+        q = (
+            select(
+                ActivityStreamIndex.activity_id,
+                Activity.start_date,
+                Activity.day,
+                ActivityStreamIndex.offset,
+                ActivityStreamIndex.length,
+                ActivityStreamIndex.streams,
+            )
+            .join(Activity, Activity.id == ActivityStreamIndex.activity_id)
+            .where(ActivityStreamIndex.athlete_id == athlete_id, ActivityStreamIndex.length > 0)
+            .order_by(Activity.start_date)
+        )
+        if day_from is not None:
+            q = q.where(Activity.day >= day_from)
+        if day_to is not None:
+            q = q.where(Activity.day <= day_to)
+        if activity_ids is not None:
+            q = q.where(ActivityStreamIndex.activity_id.in_(activity_ids))
+        return [
+            StreamSegment(r.activity_id, r.start_date, r.day, r.offset, r.length, tuple(r.streams))
+            for r in db.execute(q).all()
+        ]
+
+
+stream_store = StreamStore()
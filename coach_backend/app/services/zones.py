@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Iterable, Sequence
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.activity import Activity
+from app.models.activity_stream_index import ActivityStreamIndex
+from app.models.activity_zones import ActivityZones
+from app.models.athlete_profile import AthleteProfile
+from app.models.daily_zones import DailyZones
+from app.services.metrics_calculator import SPORT_RUNNING, sport_buckets
+from app.services.stream_metrics import resample_1hz
+from app.services.stream_store import AthleteStreams, StreamSegment, stream_store
+
+
+# Límites superiores de cada zona (la última no tiene) como fracción del umbral.
+# HR: zonas de Coggan sobre LTHR (5)
+HR_ZONE_EDGES = (0.68, 0.83, 0.94, 1.05)
+# Potencia: zonas de Coggan sobre FTP (7)
+POWER_ZONE_EDGES = (0.55, 0.75, 0.90, 1.05, 1.20, 1.50)
+# Ritmo: zonas de Friel sobre el ritmo umbral (5), como fracción de la velocidad
+# umbral (ritmo 129% / 114% / 106% / 99% del umbral)
+PACE_ZONE_EDGES = (1 / 1.29, 1 / 1.14, 1 / 1.06, 1 / 0.99)
+
+ZONE_KINDS = ("hr", "power", "pace")
+# umbral del perfil del que depende cada tipo de zona
+ZONE_THRESHOLDS = {"hr": "lthr_bpm", "power": "ftp_watts", "pace": "threshold_pace_sec_per_km"}
+
+# actividades por tanda al recalcular
+ZONE_BATCH = 200
+
+
+def zone_bounds(profile: AthleteProfile | None) -> dict[str, np.ndarray | None]:
+    """Límites absolutos por tipo (bpm, W, m/s); None si falta el umbral."""
+    lthr = float(getattr(profile, "lthr_bpm", 0.0) or 0.0) if profile else 0.0
+    ftp = float(getattr(profile, "ftp_watts", 0.0) or 0.0) if profile else 0.0
+    thr_pace = float(getattr(profile, "threshold_pace_sec_per_km", 0.0) or 0.0) if profile else 0.0
+    return {
+        "hr": np.asarray(HR_ZONE_EDGES) * lthr if lthr > 0 else None,
+        "power": np.asarray(POWER_ZONE_EDGES) * ftp if ftp > 0 else None,
+        "pace": np.asarray(PACE_ZONE_EDGES) * (1000.0 / thr_pace) if thr_pace > 0 else None,
+    }
+
+
+def time_in_zones(
+    values: np.ndarray,
+    bounds: np.ndarray,
+    time_s: np.ndarray | None = None,
+    positive_only: bool = False,
+) -> np.ndarray:
+    """
+    Segundos en cada zona (len(bounds) + 1) a 1 Hz: searchsorted + bincount sobre
+    todo el stream de una vez. Las muestras sin dato no cuentan; con
+    `positive_only` tampoco las <= 0 (parado, en ritmo).
+    """
+    (x,) = resample_1hz(time_s, values)
+    ok = ~np.isnan(x)
+    if positive_only:
+        ok &= x > 0
+    zone = np.searchsorted(bounds, x[ok], side="right")
+    return np.bincount(zone, minlength=len(bounds) + 1)
+
+
+def activity_zones(
+    streams: AthleteStreams,
+    seg: StreamSegment,
+    sport: int,
+    bounds: dict[str, np.ndarray | None],
+) -> dict[str, np.ndarray | None]:
+    time_s = streams.segment(seg, "time")
+    out: dict[str, np.ndarray | None] = {k: None for k in ZONE_KINDS}
+    if bounds["hr"] is not None and "heartrate" in seg.streams:
+        out["hr"] = time_in_zones(streams.segment(seg, "heartrate"), bounds["hr"], time_s, positive_only=True)
+    if bounds["power"] is not None and "watts" in seg.streams:
+        out["power"] = time_in_zones(streams.segment(seg, "watts"), bounds["power"], time_s)
+    if bounds["pace"] is not None and sport == SPORT_RUNNING and "velocity_smooth" in seg.streams:
+        out["pace"] = time_in_zones(streams.segment(seg, "velocity_smooth"), bounds["pace"], time_s, positive_only=True)
+    return out
+
+
+def _lock(db: Session, athlete_id: int) -> None:
+    db.execute(select(func.pg_advisory_xact_lock(func.hashtextextended(f"zones:{athlete_id}", 0))))
+
+
+def _as_list(z: np.ndarray | None) -> list[int] | None:
+    return None if z is None else z.tolist()
+
+
+def _sum(arrays: Iterable[list[int] | None]) -> list[int] | None:
+    arrays = [a for a in arrays if a is not None]
+    if not arrays:
+        return None
+    return np.sum(np.asarray(arrays, dtype=np.int64), axis=0).tolist()
+
+
+def rollup_days(db: Session, athlete_id: int, days: Iterable[date | None]) -> int:
+    """
+    Rehace daily_zones de `days` sumando las activity_zones de sus actividades.
+    No hace commit.
+    """
+    days = sorted({d for d in days if d is not None})
+    if not days:
+        return 0
+    rows = db.execute(
+        select(Activity.day, ActivityZones.hr_s, ActivityZones.power_s, ActivityZones.pace_s)
+        .join(Activity, Activity.id == ActivityZones.activity_id)
+        .where(ActivityZones.athlete_id == athlete_id, Activity.day.in_(days))
+    ).all()
+    by_day: dict[date, list] = {}
+    for r in rows:
+        by_day.setdefault(r.day, []).append(r)
+
+    db.execute(
+        DailyZones.__table__.delete()
+        .where(DailyZones.athlete_id == athlete_id, DailyZones.day.in_([d for d in days if d not in by_day]))
+    )
+    if not by_day:
+        return 0
+    now = datetime.utcnow()
+    stmt = insert(DailyZones)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["athlete_id", "day"],
+        set_={
+            "hr_s": stmt.excluded.hr_s,
+            "power_s": stmt.excluded.power_s,
+            "pace_s": stmt.excluded.pace_s,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt, [
+        {
+            "athlete_id": athlete_id,
+            "day": d,
+            "hr_s": _sum(r.hr_s for r in day_rows),
+            "power_s": _sum(r.power_s for r in day_rows),
+            "pace_s": _sum(r.pace_s for r in day_rows),
+            "updated_at": now,
+        }
+        for d, day_rows in by_day.items()
+    ])
+    return len(by_day)
+
+
+def compute_zones(
+    db: Session,
+    athlete_id: int,
+    activity_ids: Sequence[int],
+    profile: AthleteProfile | None = None,
+) -> int:
+    """
+    Tiempo en zona de `activity_ids` (las que tengan streams) desde el stream store
+    local, con commit: guarda activity_zones y rehace daily_zones de sus días.
+    Devuelve cuántas actividades se han procesado.
+    """
+    if not activity_ids:
+        return 0
+    segs = stream_store.segments(db, athlete_id, activity_ids=activity_ids)
+    if not segs:
+        return 0
+    if profile is None:
+        profile = db.get(AthleteProfile, athlete_id)
+    bounds = zone_bounds(profile)
+
+    ids = [s.activity_id for s in segs]
+    sport_of = dict(db.execute(select(Activity.id, Activity.sport_type).where(Activity.id.in_(ids))).all())
+    sports = sport_buckets([sport_of[i] for i in ids])
+    streams = stream_store.open(athlete_id)
+
+    now = datetime.utcnow()
+    rows = []
+    for n, seg in enumerate(segs):
+        z = activity_zones(streams, seg, sports[n], bounds)
+        rows.append({
+            "activity_id": seg.activity_id,
+            "athlete_id": athlete_id,
+            "hr_s": _as_list(z["hr"]),
+            "power_s": _as_list(z["power"]),
+            "pace_s": _as_list(z["pace"]),
+            **{col: getattr(profile, col, None) if profile else None for col in ZONE_THRESHOLDS.values()},
+            "updated_at": now,
+        })
+
+    _lock(db, athlete_id)
+    stmt = insert(ActivityZones)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["activity_id"],
+        set_={c: stmt.excluded[c] for c in rows[0] if c not in ("activity_id", "athlete_id")},
+    )
+    db.execute(stmt, rows)
+    rollup_days(db, athlete_id, (s.day for s in segs))
+    db.commit()
+    return len(segs)
+
+
+def _with_streams(athlete_id: int):
+    return (
+        select(ActivityStreamIndex.activity_id)
+        .where(ActivityStreamIndex.athlete_id == athlete_id, ActivityStreamIndex.length > 0)
+        .order_by(ActivityStreamIndex.offset)
+    )
+
+
+def update_missing_zones(db: Session, athlete_id: int) -> int:
+    """Zonas de las actividades con streams que aún no las tienen (por tandas)."""
+    profile = db.get(AthleteProfile, athlete_id)
+    done = 0
+    while True:
+        ids = db.execute(
+            _with_streams(athlete_id)
+            .outerjoin(ActivityZones, ActivityZones.activity_id == ActivityStreamIndex.activity_id)
+            .where(ActivityZones.activity_id.is_(None))
+            .limit(ZONE_BATCH)
+        ).scalars().all()
+        if not ids:
+            return done
+        n = compute_zones(db, athlete_id, ids, profile)
+        if n == 0:
+            return done
+        done += n
+
+
+def rezone_athlete(db: Session, athlete_id: int) -> dict:
+    """
+    Recalcula el tiempo en zona de todas las actividades con streams con los
+    umbrales actuales del perfil (tras cambiar FTP / LTHR / ritmo umbral). Solo lee
+    los streams locales: no hay peticiones a Strava.
+    """
+    profile = db.get(AthleteProfile, athlete_id)
+    ids = db.execute(_with_streams(athlete_id)).scalars().all()
+    done = 0
+    for i in range(0, len(ids), ZONE_BATCH):
+        done += compute_zones(db, athlete_id, ids[i: i + ZONE_BATCH], profile)
+    return {
+        "athlete_id": athlete_id,
+        "activities": done,
+        **{col: getattr(profile, col, None) if profile else None for col in ZONE_THRESHOLDS.values()},
+    }
+
+
+def zones_for_range(db: Session, athlete_id: int, day_from: date | None, day_to: date | None) -> dict:
+    """daily_zones del rango y su total, con los límites de zona actuales del perfil."""
+    q = select(DailyZones).where(DailyZones.athlete_id == athlete_id).order_by(DailyZones.day)
+    if day_from is not None:
+        q = q.where(DailyZones.day >= day_from)
+    if day_to is not None:
+        q = q.where(DailyZones.day <= day_to)
+    rows = db.execute(q).scalars().all()
+
+    bounds = zone_bounds(db.get(AthleteProfile, athlete_id))
+    return {
+        "athlete_id": athlete_id,
+        "from_day": day_from,
+        "to_day": day_to,
+        "bounds": {
+            "hr_bpm": _rounded(bounds["hr"], 0),
+            "power_w": _rounded(bounds["power"], 0),
+            "pace_sec_per_km": _rounded(None if bounds["pace"] is None else 1000.0 / bounds["pace"], 0),
+        },
+        "total": {f"{k}_s": _sum(getattr(r, f"{k}_s") for r in rows) for k in ZONE_KINDS},
+        "days": [
+            {"day": r.day, "hr_s": r.hr_s, "power_s": r.power_s, "pace_s": r.pace_s}
+            for r in rows
+        ],
+    }
+
+
+def _rounded(values: np.ndarray | None, digits: int) -> list[float] | None:
+    return None if values is None else [round(float(v), digits) for v in values]
@@ -0,0 +1,88 @@
+"""
+Benchmark de escritura de daily_metrics: upsert fila a fila (implementación
+anterior del rebuild) frente a upsert_daily_metrics (en bloque).
+
+Uso (desde coach_backend/, con DATABASE_URL apuntando a una BD de pruebas):
+    python -m scripts.bench_daily_metrics_upsert --days 1800 --repeat 3
+
+Escribe filas de un athlete_id ficticio y las borra al terminar.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+
+from app.db.session import SessionLocal
+from app.models.daily_metrics import DailyMetric
+from app.services.metrics_calculator import DAILY_METRICS_UPDATE_COLS, upsert_daily_metrics
+
+
+def _series(athlete_id: int, n_days: int) -> list[dict]:
+    now = datetime.utcnow()
+    start = date(2020, 1, 1)
+    return [
+        {
+            "athlete_id": athlete_id,
+            "day": start + timedelta(days=i),
+            "tss": float(i % 150),
+            "duration_s": 3600,
+            "if_value": 0.75,
+            "work_kj": 800.0,
+            "ef": None,
+            "ctl": 50.0,
+            "atl": 60.0,
+            "tsb": -10.0,
+            "updated_at": now,
+        }
+        for i in range(n_days)
+    ]
+
+
+def _per_row(db, rows: list[dict]) -> None:
+    for r in rows:
+        stmt = (
+            insert(DailyMetric)
+            .values(**r)
+            .on_conflict_do_update(
+                index_elements=["athlete_id", "day"],
+                set_={c: r[c] for c in DAILY_METRICS_UPDATE_COLS},
+            )
+        )
+        db.execute(stmt)
+    db.commit()
+
+
+def _bulk(db, rows: list[dict]) -> None:
+    upsert_daily_metrics(db, rows)
+    db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=1800)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--athlete-id", type=int, default=-1, help="athlete_id ficticio para el benchmark")
+    args = parser.parse_args()
+
+    rows = _series(args.athlete_id, args.days)
+    db = SessionLocal()
+    try:
+        for name, fn in (("per_row", _per_row), ("bulk", _bulk)):
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                fn(db, rows)
+                best = min(best, time.perf_counter() - t0)
+            print(f"{name:>8}: {args.days} filas en {best:.3f}s -> {args.days / best:,.0f} filas/s")
+    finally:
+        db.execute(delete(DailyMetric).where(DailyMetric.athlete_id == args.athlete_id))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
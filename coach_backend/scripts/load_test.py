@@ -0,0 +1,103 @@
+"""
+Prueba de carga de las rutas de lectura del dashboard: N clientes concurrentes
+(por defecto 500) pidiendo en bucle durante un tiempo fijo.
+
+Uso (desde coach_backend/, con la API levantada):
+    uvicorn app.main:app --port 8000
+    python -m scripts.load_test --base-url http://127.0.0.1:8000 --athletes 93,77 --clients 500 --duration 30
+
+Para medir el acceso a BD y no la caché de respuestas, levantar la API con
+RESPONSE_CACHE_ENABLED=false. Comparar rutas sync y async = misma prueba contra
+las dos versiones del código.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+
+DEFAULT_PATHS = (
+    "/athletes/{athlete_id}/activities?limit=50",
+    "/athletes/{athlete_id}/daily-metrics/latest",
+    "/athletes/{athlete_id}/daily-metrics?resolution=week",
+    "/athletes/{athlete_id}/metrics/ctl-atl/last-7-days",
+    "/athletes/{athlete_id}/profile",
+    "/races?athlete_id={athlete_id}",
+)
+
+
+async def _client(
+    http: httpx.AsyncClient,
+    urls: list[str],
+    deadline: float,
+    latencies: list[float],
+    statuses: Counter,
+) -> None:
+    while time.perf_counter() < deadline:
+        url = random.choice(urls)
+        t0 = time.perf_counter()
+        try:
+            r = await http.get(url)
+            statuses[r.status_code] += 1
+        except httpx.HTTPError as e:
+            statuses[type(e).__name__] += 1
+            continue
+        latencies.append(time.perf_counter() - t0)
+
+
+def _pct(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+async def run(base_url: str, athletes: list[int], paths: list[str], clients: int, duration: float) -> dict:
+    urls = [p.format(athlete_id=a) for a in athletes for p in paths]
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as http:
+        # calentamiento: conexiones de los pools y caché de versiones
+        await asyncio.gather(*(http.get(u) for u in urls))
+        t0 = time.perf_counter()
+        deadline = t0 + duration
+        await asyncio.gather(*(_client(http, urls, deadline, latencies, statuses) for _ in range(clients)))
+        elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "clients": clients,
+        "duration_s": round(elapsed, 1),
+        "requests": len(latencies),
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+        "p50_ms": round(_pct(latencies, 50) * 1000, 1),
+        "p95_ms": round(_pct(latencies, 95) * 1000, 1),
+        "p99_ms": round(_pct(latencies, 99) * 1000, 1),
+        "statuses": dict(statuses),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--athletes", default="93", help="ids separados por comas")
+    parser.add_argument("--path", action="append", help="ruta con {athlete_id} (repetible); por defecto las del dashboard")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args()
+
+    athletes = [int(a) for a in args.athletes.split(",") if a.strip()]
+    result = asyncio.run(run(args.base_url, athletes, args.path or list(DEFAULT_PATHS), args.clients, args.duration))
+    for k, v in result.items():
+        print(f"{k:>12}: {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Doble local de la API de Strava para probar imports y el limitador de peticiones
+sin gastar presupuesto real.
+
+Uso (desde coach_backend/):
+    STUB_ACTIVITIES=3000 STUB_LIMIT_15MIN=20 STUB_LIMIT_DAILY=200 \\
+        uvicorn scripts.strava_stub:app --port 8765
+    # y en el backend:
+    STRAVA_BASE_URL=http://127.0.0.1:8765
+
+Emula:
+- POST /oauth/token: cualquier código o refresh_token vale.
+- GET /api/v3/athlete/activities: page / per_page / after sobre actividades sintéticas.
+- GET /api/v3/activities/{id}/streams: streams sintéticos a 1 Hz (key_by_type).
+- Cabeceras X-RateLimit-Limit / X-RateLimit-Usage con ventanas fijas en UTC
+  (15 min y diaria) y 429 al superarlas, como Strava.
+- STUB_LATENCY_MS añade latencia por petición.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse
+
+N_ACTIVITIES = int(os.getenv("STUB_ACTIVITIES", "500"))
+LIMIT_15MIN = int(os.getenv("STUB_LIMIT_15MIN", "100"))
+LIMIT_DAILY = int(os.getenv("STUB_LIMIT_DAILY", "1000"))
+LATENCY_S = float(os.getenv("STUB_LATENCY_MS", "0")) / 1000.0
+
+app = FastAPI(title="Strava stub")
+
+_usage = {"short": [0.0, 0], "daily": [0.0, 0]}   # ventana -> [inicio, uso]
+
+
+def _activities(n: int) -> list[dict]:
+    start = datetime(2022, 1, 1, 7, 0, tzinfo=timezone.utc)
+    sports = ("Ride", "Run", "Swim", "VirtualRide")
+    out = []
+    for i in range(n):
+        sport = sports[i % len(sports)]
+        out.append({
+            "id": 10_000_000 + i,
+            "name": f"{sport} #{i}",
+            "sport_type": sport,
+            "type": sport,
+            "start_date": (start + timedelta(hours=13 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "timezone": "(GMT+01:00) Europe/Madrid",
+            "distance": 20000.0 + (i % 50) * 100,
+            "moving_time": 3600 + (i % 30) * 60,
+            "elapsed_time": 3900 + (i % 30) * 60,
+            "total_elevation_gain": float(i % 400),
+            "average_speed": 5.5,
+            "max_speed": 12.0,
+            "average_heartrate": 140.0 + i % 20,
+            "max_heartrate": 175.0,
+            "average_watts": 190.0 if "Ride" in sport else None,
+            "weighted_average_watts": 205.0 if "Ride" in sport else None,
+            "kilojoules": 700.0 if "Ride" in sport else None,
+            "average_cadence": 85.0,
+            "trainer": sport == "VirtualRide",
+            "commute": False,
+            "manual": False,
+            "private": False,
+        })
+    return out
+
+
+ACTIVITIES = _activities(N_ACTIVITIES)
+BY_ID = {a["id"]: a for a in ACTIVITIES}
+# Strava lista las actividades de más nueva a más antigua; con `after`, de más antigua a más nueva
+ACTIVITIES_DESC = ACTIVITIES[::-1]
+
+
+def _consume() -> tuple[dict, bool]:
+    now = time.time()
+    ok = True
+    for name, period, limit in (("short", 900, LIMIT_15MIN), ("daily", 86400, LIMIT_DAILY)):
+        window_start = now // period * period
+        if _usage[name][0] != window_start:
+            _usage[name] = [window_start, 0]
+        if _usage[name][1] >= limit:
+            ok = False
+    if ok:
+        _usage["short"][1] += 1
+        _usage["daily"][1] += 1
+    headers = {
+        "X-RateLimit-Limit": f"{LIMIT_15MIN},{LIMIT_DAILY}",
+        "X-RateLimit-Usage": f"{_usage['short'][1]},{_usage['daily'][1]}",
+    }
+    return headers, ok
+
+
+@app.post("/oauth/token")
+def token():
+    return {
+        "access_token": "stub-access",
+        "refresh_token": "stub-refresh",
+        "expires_at": int(time.time()) + 6 * 3600,
+        "athlete": {"id": 1},
+    }
+
+
+@app.get("/api/v3/athlete/activities")
+async def athlete_activities(
+    page: int = Query(1, ge=1),
+    per_page: int = Query(30, ge=1, le=200),
+    after: int | None = Query(None),
+):
+    if LATENCY_S:
+        await asyncio.sleep(LATENCY_S)
+
+    headers, ok = _consume()
+    if not ok:
+        return JSONResponse({"message": "Rate Limit Exceeded"}, status_code=429, headers=headers)
+
+    if after is None:
+        source = ACTIVITIES_DESC
+    else:
+        cutoff = datetime.fromtimestamp(after, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        source = [a for a in ACTIVITIES if a["start_date"] > cutoff]
+
+    items = source[(page - 1) * per_page: page * per_page]
+    return JSONResponse(items, headers=headers)
+
+
+def _synthetic_streams(a: dict, keys: list[str]) -> dict:
+    n = int(a["moving_time"])
+    ride = "Ride" in a["sport_type"]
+    series = {
+        "time": list(range(n)),
+        "heartrate": [int(120 + 30 * math.sin(t / 600.0) + (t % 7)) for t in range(n)],
+        "velocity_smooth": [round(5.0 + 2.0 * math.sin(t / 300.0), 3) for t in range(n)],
+        "altitude": [round(100.0 + 50.0 * math.sin(t / 900.0), 1) for t in range(n)],
+        "cadence": [85 if ride else 88] * n,
+    }
+    if ride:
+        series["watts"] = [int(200 + 80 * math.sin(t / 120.0) + (t % 13)) for t in range(n)]
+    return {
+        k: {"type": k, "data": v, "series_type": "time", "original_size": n, "resolution": "high"}
+        for k, v in series.items()
+        if k in keys
+    }
+
+
+@app.get("/api/v3/activities/{activity_id}/streams")
+async def activity_streams(activity_id: int, keys: str = Query("time"), key_by_type: bool = Query(True)):
+    if LATENCY_S:
+        await asyncio.sleep(LATENCY_S)
+
+    headers, ok = _consume()
+    if not ok:
+        return JSONResponse({"message": "Rate Limit Exceeded"}, status_code=429, headers=headers)
+
+    a = BY_ID.get(activity_id)
+    if a is None:
+        raise HTTPException(status_code=404, detail="Record Not Found")
+    return JSONResponse(_synthetic_streams(a, keys.split(",")), headers=headers)
@@ -0,0 +1,150 @@
+"""
+Paginación por cursor de GET /athletes/{id}/activities: el cursor va y vuelve sin
+perder nada, las filas con el mismo start_date se desempatan por id sin repetirse
+ni saltarse, y un cursor roto o editado a mano da 400.
+"""
+import asyncio
+import base64
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.routes import activities as routes
+from app.api.routes.activities import decode_cursor, encode_cursor
+from app.models.activity import Activity
+from app.services.data_version import DataVersion
+from app.services.response_cache import MemoryBackend, ResponseCache
+
+ATHLETE = 1
+
+
+def b64(payload: bytes) -> str:
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    for start in (datetime(2024, 3, 5, 7, 30), datetime(2024, 3, 5, 7, 30, 0, 123456), datetime(1999, 12, 31)):
+        for activity_id in (1, 42, 2**63 - 1):
+            assert decode_cursor(encode_cursor(start, activity_id)) == (start, activity_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "no es base64!",
+    "ñ",
+    b64(b"\xff\xfe"),
+    b64(b"not json"),
+    b64(b'{"a": 1}'),
+    b64(b"[]"),
+    b64(b'["2024-03-05T07:30:00"]'),
+    b64(b'["2024-03-05T07:30:00", 1, 2]'),
+    b64(b'["ayer", 1]'),
+    b64(b"[20240305, 1]"),
+    b64(b'[null, 1]'),
+    b64(b'["2024-03-05T07:30:00", "1"]'),
+    b64(b'["2024-03-05T07:30:00", 1.5]'),
+    b64(b'["2024-03-05T07:30:00", true]'),
+    b64(b'["2024-03-05T07:30:00", null]'),
+    b64(b'["2024-03-05T07:30:00", 0]'),
+    b64(b'["2024-03-05T07:30:00", -1]'),
+    b64(b'["2024-03-05T07:30:00", 9223372036854775808]'),
+    b64(b'["2024-03-05T07:30:00+02:00", 1]'),
+])
+def test_malformed_or_tampered_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+# --- paginación contra Postgres ---
+
+
+@pytest.fixture
+def schema_url():
+    """Esquema temporal con la tabla activities (TEST_DATABASE_URL; si no está, se saltan)."""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL no definida")
+    schema = f"test_cursor_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(url)
+    with admin.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={schema}"})
+    Activity.__table__.create(engine)
+    try:
+        yield url, schema, engine
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache(monkeypatch):
+    monkeypatch.setattr(routes, "get_response_cache", lambda: ResponseCache(MemoryBackend(0), 0, enabled=False))
+
+
+def insert_activities(engine, start_dates):
+    with engine.begin() as conn:
+        conn.execute(Activity.__table__.insert(), [
+            {"athlete_id": ATHLETE, "strava_activity_id": n, "name": f"a{n}", "sport_type": "Ride",
+             "start_date": s, "timezone": "", "distance_m": 0.0, "moving_time_s": 0, "elapsed_time_s": 0,
+             "total_elevation_gain_m": 0.0, "trainer": False, "created_at": s, "updated_at": s}
+            for n, s in enumerate(start_dates)
+        ])
+        rows = conn.execute(text("SELECT id, start_date FROM activities ORDER BY start_date DESC, id DESC")).all()
+    return [r.id for r in rows]
+
+
+def list_pages(url, schema, limit, first_cursor=None):
+    async def run():
+        engine = create_async_engine(url, connect_args={"options": f"-csearch_path={schema}"})
+        Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+        pages, cursor = [], first_cursor
+        try:
+            async with Session() as db:
+                while True:
+                    response = await routes.list_activities(
+                        ATHLETE, from_day=None, to_day=None, limit=limit, offset=0, cursor=cursor,
+                        fields="id,name", db=db, version=DataVersion(ATHLETE, 1, None),
+                    )
+                    body = orjson.loads(response.body)
+                    pages.append(body)
+                    cursor = body["next_cursor"]
+                    if cursor is None:
+                        return pages
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_pages_tie_break_equal_start_dates(schema_url):
+    url, schema, engine = schema_url
+    t = datetime(2024, 3, 5, 7, 30)
+    # cinco actividades a la misma hora entre otras: una página cae a mitad del empate
+    expected = insert_activities(engine, [t + timedelta(hours=1), t, t, t, t, t, t - timedelta(hours=1)])
+
+    for limit in (1, 2, 3, 7, 50):
+        pages = list_pages(url, schema, limit)
+        ids = [a["id"] for p in pages for a in p["activities"]]
+        assert ids == expected, limit
+        assert all(p["count"] <= limit for p in pages)
+        # start_date e id se usan para el cursor pero no se devuelven si no se piden
+        assert all(set(a) == {"id", "name"} for p in pages for a in p["activities"])
+
+
+def test_tampered_cursor_through_route_is_400(schema_url):
+    url, schema, engine = schema_url
+    insert_activities(engine, [datetime(2024, 3, 5)])
+    with pytest.raises(HTTPException) as e:
+        list_pages(url, schema, 10, first_cursor=b64(json.dumps(["2024-03-05T00:00:00", 2**70]).encode()))
+    assert e.value.status_code == 400
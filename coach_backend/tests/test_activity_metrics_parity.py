@@ -0,0 +1,86 @@
+"""
+El motor batch (compute_activity_metrics_batch) debe dar exactamente lo mismo que
+compute_activity_metrics, actividad a actividad: mismos valores (sin tolerancia) y
+mismos métodos.
+"""
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.metrics_calculator import (
+    compute_activity_metrics,
+    compute_activity_metrics_batch,
+)
+
+SPORTS = [
+    None, "", "Ride", "VirtualRide", "EBikeRide", "GravelRide", "MountainBikeRide",
+    "Run", "TrailRun", "VirtualRun", "Swim", "Walk", "Hike", "WeightTraining", "Workout",
+]
+
+PROFILES = [
+    None,
+    SimpleNamespace(ftp_watts=None, lthr_bpm=None, threshold_pace_sec_per_km=None),
+    SimpleNamespace(ftp_watts=0.0, lthr_bpm=0.0, threshold_pace_sec_per_km=0.0),
+    SimpleNamespace(ftp_watts=260.0, lthr_bpm=None, threshold_pace_sec_per_km=None),
+    SimpleNamespace(ftp_watts=None, lthr_bpm=165.0, threshold_pace_sec_per_km=None),
+    SimpleNamespace(ftp_watts=None, lthr_bpm=None, threshold_pace_sec_per_km=270.0),
+    SimpleNamespace(ftp_watts=310.5, lthr_bpm=171.0, threshold_pace_sec_per_km=245.0),
+]
+
+FIELDS = (
+    "sport_type", "moving_time_s", "distance_m", "average_watts",
+    "weighted_average_watts", "average_heartrate", "kilojoules",
+)
+
+
+def _maybe(rng: random.Random, value, p_none: float = 0.3):
+    return None if rng.random() < p_none else value
+
+
+def _activity(rng: random.Random) -> SimpleNamespace:
+    return SimpleNamespace(
+        sport_type=rng.choice(SPORTS),
+        moving_time_s=rng.choice([None, 0, -30, 1, rng.randint(60, 6 * 3600), rng.randint(60, 6 * 3600)]),
+        distance_m=rng.choice([None, 0.0, rng.uniform(0.5, 200_000.0), rng.uniform(0.5, 200_000.0)]),
+        average_watts=_maybe(rng, rng.choice([0.0, rng.uniform(50, 450)])),
+        weighted_average_watts=_maybe(rng, rng.uniform(50, 500), p_none=0.5),
+        average_heartrate=_maybe(rng, rng.choice([0.0, rng.uniform(80, 195)])),
+        kilojoules=_maybe(rng, rng.uniform(10, 5000), p_none=0.6),
+    )
+
+
+def _batch(activities, profile):
+    columns = {f: [getattr(a, f) for a in activities] for f in FIELDS}
+    return compute_activity_metrics_batch(**columns, profile=profile)
+
+
+@pytest.mark.parametrize("profile_index", range(len(PROFILES)))
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_matches_scalar(seed, profile_index):
+    rng = random.Random(seed * 100 + profile_index)
+    profile = PROFILES[profile_index]
+    activities = [_activity(rng) for _ in range(500)]
+
+    batch = _batch(activities, profile)
+
+    assert len(batch) == len(activities)
+    for i, a in enumerate(activities):
+        assert batch.row(i) == compute_activity_metrics(a, profile), (i, vars(a))
+
+
+def test_to_columns_matches_rows():
+    rng = random.Random(42)
+    profile = PROFILES[-1]
+    activities = [_activity(rng) for _ in range(200)]
+
+    batch = _batch(activities, profile)
+    columns = batch.to_columns()
+
+    for i in range(len(activities)):
+        row = vars(batch.row(i))
+        assert {k: columns[k][i] for k in columns} == row
+
+
+def test_empty_batch():
+    assert len(_batch([], PROFILES[-1])) == 0
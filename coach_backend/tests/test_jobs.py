@@ -0,0 +1,187 @@
+import os
+import time
+import uuid
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, text, update
+from sqlalchemy.orm import sessionmaker
+
+from app.models.job import Job
+from app.services import jobs
+from app.services.jobs import (
+    KIND_METRICS_REBUILD,
+    KIND_METRICS_REBUILD_ALL,
+    KIND_STRAVA_IMPORT,
+    STATUS_DEFERRED,
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    STATUS_RUNNING,
+)
+
+
+@pytest.fixture
+def Session():
+    """
+    Sesiones contra un esquema temporal con la tabla jobs. Necesita un Postgres:
+    TEST_DATABASE_URL=postgresql+psycopg://... (si no está, se saltan los tests).
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL no definida")
+    schema = f"test_jobs_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(url)
+    with admin.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={schema}"})
+    Job.__table__.create(engine)
+    try:
+        yield sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
+
+
+def _age_heartbeat(db, job_id, seconds):
+    db.execute(update(Job).where(Job.id == job_id).values(heartbeat_at=Job.heartbeat_at - timedelta(seconds=seconds)))
+    db.commit()
+
+
+def test_enqueue_merges_duplicates(Session):
+    with Session() as db:
+        first, created = jobs.enqueue(db, KIND_METRICS_REBUILD, 1, {"incremental": True, "from_day": "2024-03-10"})
+        assert created
+        merged, created = jobs.enqueue(db, KIND_METRICS_REBUILD, 1, {"force": True, "from_day": "2024-01-01"})
+        assert not created and merged.id == first.id
+        assert merged.params == {"incremental": False, "force": True, "from_day": "2024-01-01", "to_day": None}
+
+        other, created = jobs.enqueue(db, KIND_METRICS_REBUILD, 2, {})
+        assert created and other.id != first.id
+        assert db.query(Job).count() == 2
+
+
+def test_enqueue_merges_jobs_without_athlete(Session):
+    with Session() as db:
+        a, created_a = jobs.enqueue(db, KIND_METRICS_REBUILD_ALL, None, {"athlete_ids": [3], "incremental": True})
+        b, created_b = jobs.enqueue(db, KIND_METRICS_REBUILD_ALL, None, {"athlete_ids": [1, 3]})
+        assert created_a and not created_b and a.id == b.id
+        assert b.params["athlete_ids"] == [1, 3]
+        assert b.params["incremental"] is False
+
+
+def test_claim_skips_locked_rows(Session):
+    with Session() as db:
+        j1 = jobs.enqueue(db, KIND_STRAVA_IMPORT, 1)[0].id
+        j2 = jobs.enqueue(db, KIND_STRAVA_IMPORT, 2)[0].id
+
+    with Session() as holder, Session() as db:
+        # otro worker tiene j1 bloqueado a mitad de su transacción
+        holder.execute(text("SELECT id FROM jobs WHERE id = :id FOR UPDATE"), {"id": j1})
+        db.execute(text("SET lock_timeout = '2s'"))
+        claimed = jobs.claim(db, "w2")
+        assert claimed.id == j2
+        assert claimed.status == STATUS_RUNNING and claimed.worker == "w2" and claimed.attempts == 1
+        holder.rollback()
+        assert jobs.claim(db, "w2").id == j1
+        assert jobs.claim(db, "w2") is None
+
+
+def test_claim_waits_for_running_job_of_same_athlete(Session):
+    with Session() as db:
+        jobs.enqueue(db, KIND_METRICS_REBUILD, 1)
+        running = jobs.claim(db, "w1")
+        queued, _ = jobs.enqueue(db, KIND_METRICS_REBUILD, 1, {"force": True})
+        assert queued.id != running.id
+        assert jobs.claim(db, "w2") is None
+
+        assert jobs.finish(db, running.id, "w1", {"ok": True})
+        assert jobs.claim(db, "w2").id == queued.id
+
+
+def test_only_the_owner_can_finish(Session):
+    with Session() as db:
+        jobs.enqueue(db, KIND_STRAVA_IMPORT, 1)
+        job = jobs.claim(db, "w1")
+        assert not jobs.report_progress(db, job.id, "w2", {"pages": 1})
+        assert not jobs.finish(db, job.id, "w2", {"ok": True})
+        assert not jobs.fail(db, job.id, "w2", "boom")
+        assert jobs.report_progress(db, job.id, "w1", {"pages": 1})
+        assert jobs.finish(db, job.id, "w1", {"ok": True})
+        db.refresh(job)
+        assert job.status == STATUS_DONE and job.result == {"ok": True} and job.progress == {"pages": 1}
+        # ya terminado: un segundo finish/fail no lo pisa
+        assert not jobs.fail(db, job.id, "w1", "boom")
+
+
+def test_stale_job_is_requeued_and_old_worker_cannot_overwrite(Session):
+    with Session() as db:
+        jobs.enqueue(db, KIND_STRAVA_IMPORT, 1, {"full": True})
+        job = jobs.claim(db, "w1")
+        _age_heartbeat(db, job.id, 120)
+
+        assert jobs.requeue_stale(db, stale_after_s=60, max_attempts=3) == 1
+        db.refresh(job)
+        assert job.status == STATUS_QUEUED and job.worker is None
+
+        again = jobs.claim(db, "w2")
+        assert again.id == job.id and again.attempts == 2
+        # el worker que se dio por caído termina tarde: no cuenta
+        assert not jobs.finish(db, job.id, "w1", {"from": "w1"})
+        assert not jobs.heartbeat(db, job.id, "w1")
+        assert jobs.finish(db, job.id, "w2", {"from": "w2"})
+        db.refresh(job)
+        assert job.result == {"from": "w2"}
+
+
+def test_heartbeat_keeps_job_alive(Session):
+    with Session() as db:
+        jobs.enqueue(db, KIND_STRAVA_IMPORT, 1)
+        job = jobs.claim(db, "w1")
+        _age_heartbeat(db, job.id, 120)
+        assert jobs.heartbeat(db, job.id, "w1")
+        assert jobs.requeue_stale(db, stale_after_s=60, max_attempts=3) == 0
+        db.refresh(job)
+        assert job.status == STATUS_RUNNING and job.worker == "w1"
+
+
+def test_stale_job_merges_into_queued_duplicate(Session):
+    with Session() as db:
+        jobs.enqueue(db, KIND_STRAVA_IMPORT, 1, {"full": True})
+        stale = jobs.claim(db, "w1")
+        queued, _ = jobs.enqueue(db, KIND_STRAVA_IMPORT, 1, {"full": False})
+        _age_heartbeat(db, stale.id, 120)
+
+        assert jobs.requeue_stale(db, stale_after_s=60, max_attempts=3) == 1
+        db.refresh(stale)
+        db.refresh(queued)
+        assert stale.status == STATUS_DEFERRED and stale.result == {"next_job_id": queued.id}
+        assert queued.params == {"full": True}
+
+
+def test_stale_job_fails_after_max_attempts(Session):
+    with Session() as db:
+        jobs.enqueue(db, KIND_STRAVA_IMPORT, 1)
+        job = jobs.claim(db, "w1")
+        _age_heartbeat(db, job.id, 120)
+        assert jobs.requeue_stale(db, stale_after_s=60, max_attempts=1) == 1
+        db.refresh(job)
+        assert job.status == STATUS_FAILED and "sin latido" in job.error
+
+
+def test_worker_heartbeat_thread(Session, monkeypatch):
+    from app.cli import worker as worker_mod
+
+    monkeypatch.setattr(worker_mod, "SessionLocal", Session)
+    monkeypatch.setattr(worker_mod.settings, "JOB_HEARTBEAT_S", 0.05)
+    w = worker_mod.Worker()
+    with Session() as db:
+        jobs.enqueue(db, KIND_STRAVA_IMPORT, 1)
+        job = jobs.claim(db, w.name)
+        _age_heartbeat(db, job.id, 120)
+        with w._heartbeat(job.id):
+            time.sleep(0.3)
+        assert jobs.requeue_stale(db, stale_after_s=60, max_attempts=3) == 0
+    w.loop.close()
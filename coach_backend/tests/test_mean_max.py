@@ -0,0 +1,211 @@
+"""
+Curvas de máximos medios: mean_max (sumas acumuladas) contra una versión directa
+ventana a ventana, y curve_for_window (envolventes mensuales + días sueltos de los
+extremos) contra el máximo de las curvas de las actividades del rango.
+"""
+import math
+import os
+import uuid
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.models.activity import Activity
+from app.models.activity_curve import ActivityCurve
+from app.models.athlete_curve_month import AthleteCurveMonth
+from app.services import mean_max as mm
+from app.services.mean_max import CURVE_DURATIONS_S, curve_for_window, mean_max, update_curves
+from app.services.stream_metrics import STOP_GAP_S
+from app.services.stream_store import StreamSegment
+
+ATHLETE = 1
+
+
+def brute_mean_max(values, time_s=None, durations=CURVE_DURATIONS_S):
+    """Serie a 1 Hz muestra a muestra y media de cada ventana con np.convolve."""
+    x = []
+    for i, v in enumerate(values):
+        if time_s is not None and i > 0:
+            dt = time_s[i] - time_s[i - 1]
+            if 0 < dt <= STOP_GAP_S:
+                x.extend([0.0] * (dt - 1))
+        x.append(0.0 if v is None or v != v else float(v))
+    x = np.asarray(x)
+    return [
+        float(np.convolve(x, np.ones(d), "valid").max() / d) if d <= len(x) else math.nan
+        for d in durations
+    ]
+
+
+def assert_curve(got, expected, abs_tol):
+    assert len(got) == len(expected)
+    for g, e in zip(got, expected):
+        if e is None or e != e:
+            assert g is None or g != g
+        else:
+            assert g == pytest.approx(e, abs=abs_tol)
+
+
+# --- mean_max ---
+
+
+def test_mean_max_matches_brute_force():
+    rng = np.random.default_rng(7)
+    for n in (1, 2, 9, 60, 599, 1800):
+        values = rng.uniform(0, 600, n)
+        assert_curve(mean_max(values).tolist(), brute_mean_max(values), 1e-3 * 600)
+
+
+def test_mean_max_with_gaps_and_missing_samples():
+    rng = np.random.default_rng(11)
+    n = 900
+    steps = rng.choice([1, 1, 1, 2, 5, STOP_GAP_S, STOP_GAP_S + 1, 600], n - 1)
+    time_s = np.concatenate(([0], np.cumsum(steps)))
+    values = rng.uniform(0, 400, n)
+    values[rng.choice(n, 50, replace=False)] = np.nan
+    got = mean_max(values, time_s).tolist()
+    assert_curve(got, brute_mean_max(values.tolist(), time_s.tolist()), 1e-3 * 400)
+
+
+def test_mean_max_short_activity_is_nan_beyond_its_length():
+    curve = mean_max(np.array([100.0, 300.0, 200.0]))
+    assert curve[:3].tolist() == pytest.approx([300.0, 250.0, 200.0])
+    assert np.isnan(curve[3:]).all()
+
+
+# --- envolventes mensuales y curve_for_window ---
+
+
+@pytest.fixture
+def Session():
+    """Sesiones contra un esquema temporal (TEST_DATABASE_URL; si no está, se saltan)."""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL no definida")
+    schema = f"test_curves_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(url)
+    with admin.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_engine(url, connect_args={"options": f"-csearch_path={schema}"})
+    for model in (Activity, ActivityCurve, AthleteCurveMonth):
+        model.__table__.create(engine)
+    try:
+        yield sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
+
+
+class FakeStreams:
+    """stream_store de prueba: la potencia de cada actividad en memoria."""
+
+    def __init__(self):
+        self.watts: dict[int, np.ndarray] = {}
+        self.days: dict[int, date] = {}
+
+    def segments(self, db, athlete_id, activity_ids):
+        return [
+            StreamSegment(i, datetime.combine(self.days[i], datetime.min.time()), self.days[i], 0, len(w), ("watts",))
+            for i, w in self.watts.items() if i in activity_ids
+        ]
+
+    def open(self, athlete_id):
+        return self
+
+    def segment(self, seg, name):
+        return self.watts[seg.activity_id] if name == "watts" else None
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeStreams()
+    monkeypatch.setattr(mm, "stream_store", store)
+    return store
+
+
+def add_activity(db, store, rng, day, n):
+    a = Activity(athlete_id=ATHLETE, strava_activity_id=int(rng.integers(1 << 40)), sport_type="Ride",
+                 start_date=datetime.combine(day, datetime.min.time()), day=day)
+    db.add(a)
+    db.flush()
+    store.watts[a.id] = rng.uniform(50, 500, n)
+    store.days[a.id] = day
+    return a.id
+
+
+def expected_window(store, day_from, day_to):
+    curves = [
+        brute_mean_max(w) for i, w in store.watts.items()
+        if (day_from is None or store.days[i] >= day_from) and (day_to is None or store.days[i] <= day_to)
+    ]
+    if not curves:
+        return None
+    return [max((c[j] for c in curves if c[j] == c[j]), default=math.nan) for j in range(len(CURVE_DURATIONS_S))]
+
+
+WINDOWS = [
+    (None, None),
+    (date(2024, 2, 1), date(2024, 2, 29)),      # un mes exacto: solo envolvente
+    (date(2024, 1, 15), date(2024, 3, 10)),     # mes completo + extremos sueltos
+    (date(2024, 1, 31), date(2024, 2, 1)),      # dos días a caballo de dos meses
+    (date(2024, 2, 10), date(2024, 2, 10)),     # un solo día
+    (date(2024, 2, 11), date(2024, 2, 19)),     # sin actividades
+    (None, date(2024, 1, 31)),
+    (date(2024, 3, 1), None),
+    (date(2023, 12, 31), date(2024, 4, 1)),     # extremos justo fuera de meses completos
+]
+
+
+def check_windows(db, store):
+    for day_from, day_to in WINDOWS:
+        out = curve_for_window(db, ATHLETE, day_from, day_to)
+        expected = expected_window(store, day_from, day_to)
+        if expected is None:
+            assert out["power_w"] is None, (day_from, day_to)
+        else:
+            assert_curve(out["power_w"], expected, 0.06)
+
+
+def test_curve_for_window_matches_brute_force(Session, store):
+    rng = np.random.default_rng(3)
+    days = [date(2024, 1, 1), date(2024, 1, 15), date(2024, 1, 31), date(2024, 2, 1), date(2024, 2, 10),
+            date(2024, 2, 10), date(2024, 2, 29), date(2024, 3, 1), date(2024, 3, 10), date(2024, 3, 31)]
+    with Session() as db:
+        ids = [add_activity(db, store, rng, d, int(rng.integers(5, 1500))) for d in days]
+        db.commit()
+        assert update_curves(db, ATHLETE, ids) == len(ids)
+        check_windows(db, store)
+
+        out = curve_for_window(db, ATHLETE, date(2024, 1, 15), date(2024, 3, 10))
+        assert (out["months"], out["edge_activities"]) == (1, 4)
+        out = curve_for_window(db, ATHLETE, date(2024, 2, 1), date(2024, 2, 29))
+        assert (out["months"], out["edge_activities"]) == (1, 0)
+
+
+def test_month_envelope_merges_new_and_recomputed_activities(Session, store):
+    rng = np.random.default_rng(5)
+    with Session() as db:
+        first = [add_activity(db, store, rng, date(2024, 2, d), 900) for d in (3, 17)]
+        db.commit()
+        update_curves(db, ATHLETE, first)
+
+        # actividad nueva en un mes con envolvente: máximo con lo guardado
+        new = add_activity(db, store, rng, date(2024, 2, 20), 1200)
+        db.commit()
+        update_curves(db, ATHLETE, [new])
+        month = db.get(AthleteCurveMonth, (ATHLETE, date(2024, 2, 1)))
+        assert month.activities == 3
+        assert_curve(month.power, expected_window(store, None, None), 0.05)
+
+        # actividad recalculada con valores más bajos: el mes se rehace y baja
+        store.watts[new] = store.watts[new] / 10
+        update_curves(db, ATHLETE, [new])
+        db.refresh(month)
+        assert month.activities == 3
+        assert_curve(month.power, expected_window(store, None, None), 0.05)
+        check_windows(db, store)
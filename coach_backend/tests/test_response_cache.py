@@ -0,0 +1,145 @@
+import asyncio
+
+import orjson
+
+from app.services.response_cache import ENTRY_OVERHEAD_BYTES, MemoryBackend, ResponseCache
+
+
+class Clock:
+    """Reloj de prueba que solo avanza a mano."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def entry_bytes(key: str, body: bytes) -> int:
+    return len(key) + len(body) + ENTRY_OVERHEAD_BYTES
+
+
+BODY = b"x" * 100
+
+
+def test_lru_evicts_least_recently_used():
+    size = entry_bytes("k0", BODY)
+    cache = MemoryBackend(max_bytes=4 * size)
+    for n in range(4):
+        cache.set(1, 0, f"k{n}", BODY, ttl_s=60)
+    # k0 se lee: pasa a ser la más reciente y la expulsada es k1
+    assert cache.get(1, 0, "k0") == BODY
+    cache.set(1, 0, "k4", BODY, ttl_s=60)
+    assert cache.get(1, 0, "k1") is None
+    assert all(cache.get(1, 0, k) == BODY for k in ("k0", "k2", "k3", "k4"))
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 4 and stats["bytes"] == 4 * size
+
+
+def test_ttl_expiry():
+    clock = Clock()
+    cache = MemoryBackend(max_bytes=10_000, clock=clock)
+    cache.set(1, 0, "short", BODY, ttl_s=5)
+    cache.set(1, 0, "long", BODY, ttl_s=60)
+    clock.now += 4.9
+    assert cache.get(1, 0, "short") == BODY
+    clock.now += 0.1
+    assert cache.get(1, 0, "short") is None
+    assert cache.get(1, 0, "long") == BODY
+    stats = cache.stats()
+    assert stats["expired"] == 1 and stats["entries"] == 1 and stats["bytes"] == entry_bytes("long", BODY)
+
+
+def test_byte_cap():
+    cache = MemoryBackend(max_bytes=2_000)
+    # más de 1/4 de la caché: no se guarda
+    cache.set(1, 0, "big", b"x" * 500, ttl_s=60)
+    assert cache.get(1, 0, "big") is None
+    assert cache.stats()["too_large"] == 1
+
+    for n in range(50):
+        cache.set(n % 3, 0, f"k{n}", b"y" * (50 + n), ttl_s=60)
+        assert cache.stats()["bytes"] <= 2_000
+    # sobrescribir una clave no cuenta sus bytes dos veces
+    cache.set(0, 0, "same", BODY, ttl_s=60)
+    before = cache.stats()["bytes"]
+    cache.set(0, 0, "same", BODY, ttl_s=60)
+    assert cache.stats()["bytes"] == before
+
+
+def test_generation_invalidation():
+    cache = MemoryBackend(max_bytes=10_000)
+    gen = cache.generation(1)
+    cache.set(1, gen, "a", BODY, ttl_s=60)
+    cache.set(2, cache.generation(2), "a", BODY, ttl_s=60)
+
+    cache.invalidate(1)
+    new_gen = cache.generation(1)
+    assert new_gen == gen + 1
+    assert cache.get(1, gen, "a") is None and cache.get(1, new_gen, "a") is None
+    # las entradas del atleta se liberan; las de otros siguen
+    assert cache.stats()["entries"] == 1
+    assert cache.get(2, cache.generation(2), "a") == BODY
+
+    # respuesta calculada antes de la invalidación: no se guarda
+    cache.set(1, gen, "a", b"old", ttl_s=60)
+    assert cache.get(1, gen, "a") is None and cache.stats()["entries"] == 1
+
+    cache.clear()
+    assert cache.generation(2) == 1 and cache.stats()["bytes"] == 0
+
+
+def test_aresponse_hit_and_miss():
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return {"n": len(builds)}
+
+    async def run():
+        cache = ResponseCache(MemoryBackend(10_000), ttl_s=60)
+        first = await cache.aresponse(1, "dashboard", {"v": 1}, build, {"ETag": "x"})
+        second = await cache.aresponse(1, "dashboard", {"v": 1}, build)
+        cache.invalidate(1)
+        third = await cache.aresponse(1, "dashboard", {"v": 1}, build)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert (first.headers["X-Cache"], second.headers["X-Cache"], third.headers["X-Cache"]) == ("MISS", "HIT", "MISS")
+    assert first.headers["ETag"] == "x"
+    assert orjson.loads(second.body) == {"n": 1} and orjson.loads(third.body) == {"n": 2}
+
+
+class AsyncOnlyBackend(MemoryBackend):
+    """Backend remoto de prueba: las llamadas síncronas bloquearían el bucle de eventos."""
+
+    def generation(self, athlete_id):
+        raise AssertionError("llamada síncrona desde una ruta async")
+
+    def get(self, athlete_id, generation, key):
+        raise AssertionError("llamada síncrona desde una ruta async")
+
+    def set(self, athlete_id, generation, key, body, ttl_s):
+        raise AssertionError("llamada síncrona desde una ruta async")
+
+    async def ageneration(self, athlete_id):
+        return super().generation(athlete_id)
+
+    async def aget(self, athlete_id, generation, key):
+        return super().get(athlete_id, generation, key)
+
+    async def aset(self, athlete_id, generation, key, body, ttl_s):
+        super().set(athlete_id, generation, key, body, ttl_s)
+
+
+def test_aresponse_uses_async_backend_calls():
+    async def build():
+        return {"ok": True}
+
+    async def run():
+        cache = ResponseCache(AsyncOnlyBackend(10_000), ttl_s=60)
+        await cache.aresponse(1, "activities", {"v": 1}, build)
+        return await cache.aresponse(1, "activities", {"v": 1}, build)
+
+    assert asyncio.run(run()).headers["X-Cache"] == "HIT"
+
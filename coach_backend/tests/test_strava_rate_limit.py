@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services import strava_client
+from app.services.strava_client import AsyncStravaClient
+from app.services.strava_rate_limit import SHORT_WINDOW_S, StravaRateLimited, StravaRateLimiter
+
+
+class Clock:
+    """Reloj de pared de prueba: avanza con el tiempo real desde `start` (las esperas son cortas)."""
+
+    def __init__(self, start: float):
+        self.offset = start - time.monotonic()
+
+    def __call__(self) -> float:
+        return time.monotonic() + self.offset
+
+
+def near_reset(seconds_left: float) -> Clock:
+    """Reloj a `seconds_left` del próximo reinicio de la ventana de 15 min (lejos del diario)."""
+    window_end = 1_000 * 86_400 + 10 * SHORT_WINDOW_S
+    return Clock(window_end - seconds_left)
+
+
+def exhaust(limiter: StravaRateLimiter) -> None:
+    limiter.observe({"X-RateLimit-Limit": "10,1000", "X-RateLimit-Usage": "10,20"})
+
+
+def test_grants_immediately_within_budget():
+    async def run():
+        limiter = StravaRateLimiter(10, 1000, clock=near_reset(600))
+        for _ in range(10):
+            await limiter.acquire(1)
+        assert limiter.counters == {"granted": 10, "waited": 0, "deferred": 0, "throttled_429": 0}
+
+    asyncio.run(run())
+
+
+def test_window_reset_releases_waiters():
+    async def run():
+        limiter = StravaRateLimiter(10, 1000, clock=near_reset(0.05))
+        exhaust(limiter)
+        t0 = time.monotonic()
+        await asyncio.wait_for(limiter.acquire(1), timeout=2)
+        assert time.monotonic() - t0 >= 0.04
+        assert limiter.counters["waited"] == 1
+        # ventana nueva: el uso de Strava vuelve a empezar
+        assert limiter.snapshot()["windows"]["15min"]["usage"] == 0
+
+    asyncio.run(run())
+
+
+def test_round_robin_between_athletes():
+    async def run():
+        limiter = StravaRateLimiter(10, 1000, clock=near_reset(0.05))
+        exhaust(limiter)
+        order = []
+
+        async def request(athlete_id):
+            await limiter.acquire(athlete_id)
+            order.append(athlete_id)
+
+        # el atleta 1 encola un import largo antes de que lleguen los demás
+        tasks = [asyncio.create_task(request(1)) for _ in range(4)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(request(2)) for _ in range(2)]
+        tasks += [asyncio.create_task(request(3))]
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=2)
+        assert order == [1, 2, 3, 1, 2, 1, 1]
+
+    asyncio.run(run())
+
+
+def test_reserve_is_not_granted():
+    async def run():
+        limiter = StravaRateLimiter(10, 1000, reserve=3, max_wait_s=60, clock=near_reset(600))
+        limiter.observe({"X-RateLimit-Limit": "10,1000", "X-RateLimit-Usage": "5,20"})
+        await limiter.acquire(1)
+        await limiter.acquire(1)
+        # 5 usadas + 2 en curso + 3 de reserva: no queda nada hasta el reinicio
+        with pytest.raises(StravaRateLimited):
+            await limiter.acquire(1)
+        assert limiter.snapshot()["windows"]["15min"]["available"] == 0
+
+    asyncio.run(run())
+
+
+def test_defers_when_reset_is_beyond_max_wait():
+    async def run():
+        clock = near_reset(600)
+        limiter = StravaRateLimiter(10, 1000, max_wait_s=60, clock=clock)
+        exhaust(limiter)
+        with pytest.raises(StravaRateLimited) as e:
+            await limiter.acquire(1)
+        assert e.value.window == "15min"
+        assert e.value.retry_at == pytest.approx(clock() + 600, abs=1)
+        assert limiter.counters["deferred"] == 1
+
+    asyncio.run(run())
+
+
+def test_daily_window_blocks_until_midnight():
+    async def run():
+        limiter = StravaRateLimiter(10, 1000, max_wait_s=SHORT_WINDOW_S, clock=near_reset(600))
+        limiter.observe({"X-RateLimit-Limit": "10,1000", "X-RateLimit-Usage": "1,1000"})
+        with pytest.raises(StravaRateLimited) as e:
+            await limiter.acquire(1)
+        assert e.value.window == "daily"
+        assert e.value.retry_at % 86_400 == 0
+
+    asyncio.run(run())
+
+
+def test_client_defers_when_strava_keeps_returning_429(monkeypatch):
+    monkeypatch.setattr(strava_client, "MAX_RATE_LIMIT_RETRIES", 1)
+    calls = []
+
+    def strava(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(
+            429,
+            headers={"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "100,1000", "Retry-After": "5"},
+            json={"message": "Rate Limit Exceeded"},
+        )
+
+    async def run():
+        clock = near_reset(600)
+        limiter = StravaRateLimiter(100, 1000, clock=clock)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(strava)) as http:
+            client = AsyncStravaClient(db=None, http=http, limiter=limiter)
+            client.athlete_id = 7
+            with pytest.raises(StravaRateLimited) as e:
+                await client.list_activities("token")
+        # el uso diario llega al límite: se difiere hasta medianoche, no 5 s
+        assert e.value.window == "daily"
+        assert e.value.retry_at % 86_400 == 0
+        assert limiter.counters["throttled_429"] == 1
+
+    asyncio.run(run())
+    assert calls == ["/api/v3/athlete/activities"]
+
+
+def test_client_retries_429_after_reset(monkeypatch):
+    responses = iter([
+        httpx.Response(429, headers={"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "100,20"}),
+        httpx.Response(200, headers={"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "1,21"}, json=[{"id": 1}]),
+    ])
+
+    async def run():
+        limiter = StravaRateLimiter(100, 1000, clock=near_reset(0.05))
+        async with httpx.AsyncClient(transport=httpx.MockTransport(lambda _: next(responses))) as http:
+            client = AsyncStravaClient(db=None, http=http, limiter=limiter)
+            client.athlete_id = 7
+            assert await asyncio.wait_for(client.list_activities("token"), timeout=2) == [{"id": 1}]
+        assert limiter.counters["waited"] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from app.services import stream_ingest
+from app.services.strava_rate_limit import StravaRateLimited
+
+
+class FakeClient:
+    """Strava de prueba: streams para las dos primeras actividades y luego sin presupuesto."""
+
+    def __init__(self, db):
+        pass
+
+    async def get_valid_access_token(self, athlete_id):
+        return "token"
+
+    async def get_activity_streams(self, access_token, strava_id, types):
+        if strava_id >= 1003:
+            raise StravaRateLimited(0.0, "15min")
+        return {"watts": [200] * 10}
+
+
+def test_stream_metrics_computed_for_written_activities_when_loop_stops(monkeypatch):
+    written, computed = [], []
+    monkeypatch.setattr(stream_ingest, "AsyncStravaClient", FakeClient)
+    monkeypatch.setattr(stream_ingest, "STREAM_CONCURRENCY", 1)
+    monkeypatch.setattr(
+        stream_ingest, "pending_activities", lambda db, athlete_id, limit: [(1, 1001), (2, 1002), (3, 1003), (4, 1004)]
+    )
+    monkeypatch.setattr(stream_ingest, "_write", lambda athlete_id, activity_id, streams: written.append(activity_id) or 10)
+    monkeypatch.setattr(
+        stream_ingest, "compute_stream_metrics", lambda db, athlete_id, ids: computed.extend(ids) or len(ids)
+    )
+
+    with pytest.raises(StravaRateLimited):
+        asyncio.run(stream_ingest.ingest_streams(None, 7, limit=10))
+    assert written == [1, 2]
+    assert computed == [1, 2]
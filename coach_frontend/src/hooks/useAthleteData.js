@@ -22,16 +22,15 @@ export const useAthleteData = (athleteId) => {
     }
 
     try {
-      const [metrics, history, activities] = await Promise.all([
-        athleteService.getLatestMetrics(athleteId),
-        athleteService.getHistory(athleteId),
-        athleteService.getActivities(athleteId),
-      ]);
+      // latest + historial + actividades recientes en una sola petición
+      const dashboard = await athleteService.getDashboard(athleteId, {
+        sections: ['latest', 'history', 'activities'],
+      });
 
       setData({ 
-        metrics, 
-        history, 
-        activities, 
+        metrics: dashboard.latest, 
+        history: dashboard.history || [], 
+        activities: dashboard.activities || [], 
         loading: false, 
         error: null 
       });
@@ -7,6 +7,8 @@ const ActivitiesPage = ({ onActivityClick }) => {
   const [activities, setActivities] = useState([]);
   const [limit, setLimit] = useState(10);
   const [page, setPage] = useState(0); 
+  // cursors[i] = cursor para pedir la página i (la 0 no lleva)
+  const [cursors, setCursors] = useState([null]);
   const [loading, setLoading] = useState(true);
   const [hasMore, setHasMore] = useState(true);
   const [ATHLETE_ID] = useState(localStorage.getItem('athlete_id') || 0); // ID de atleta fijo para pruebas
@@ -16,16 +18,19 @@ const ActivitiesPage = ({ onActivityClick }) => {
     const loadHistory = async () => {
       try {
         setLoading(true);
-        const offset = page * limit;
-        
-        // Ajustado para pasar los parámetros correctamente al servicio
-        // athleteId, limit, offset
-        const data = await athleteService.getActivities(ATHLETE_ID, limit, true, offset);
+        const data = await athleteService.getActivitiesPage(ATHLETE_ID, limit, cursors[page]);
         console.log("Historial cargado:", data);
         
-        setActivities(data);
-        // Si la respuesta trae menos elementos que el límite, no hay más páginas
-        setHasMore(data.length === limit);
+        setActivities(data.activities);
+        // Sin next_cursor no hay más páginas
+        setHasMore(Boolean(data.next_cursor));
+        if (data.next_cursor) {
+          setCursors(prev => {
+            const next = prev.slice(0, page + 1);
+            next[page + 1] = data.next_cursor;
+            return next;
+          });
+        }
       } catch (error) {
         console.error("Error cargando historial:", error);
       } finally {
@@ -38,6 +43,7 @@ const ActivitiesPage = ({ onActivityClick }) => {
 
   const handleLimitChange = (e) => {
     setLimit(Number(e.target.value));
+    setCursors([null]);
     setPage(0);
   };
 
@@ -42,6 +42,26 @@ const request = async (endpoint, options = {}) => {
   return response.json();
 };
 
+// Sondea un job de la cola hasta que termina. Si se aplaza (límite de Strava),
+// sigue con el job que lo sustituye.
+const JOB_POLL_MS = 1000;
+
+const waitForJob = async (jobId, { timeoutMs = 10 * 60 * 1000 } = {}) => {
+  const deadline = Date.now() + timeoutMs;
+  let id = jobId;
+  while (Date.now() < deadline) {
+    const job = await request(`/jobs/${id}`);
+    if (job.status === 'done') return job;
+    if (job.status === 'failed') throw new Error(job.error || 'Error en el trabajo');
+    if (job.status === 'deferred' && job.result?.next_job_id) {
+      id = job.result.next_job_id;
+      continue;
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS));
+  }
+  throw new Error('El trabajo está tardando demasiado');
+};
+
 // src/services/api.js
 
 const request_delete = async (endpoint, options = {}) => {
@@ -117,21 +137,37 @@ export const authService = {
 
 // --- SERVICIOS DE ATLETA ---
 export const athleteService = {
+  // Todo el dashboard en una petición: { latest, history, activities, weekly }.
+  // sections limita las secciones (p. ej. ['latest', 'history'])
+  getDashboard: async (athleteId, { sections = null, historyDays = 7, activitiesDays = 7, activitiesLimit = 50 } = {}) => {
+    const params = new URLSearchParams({
+      history_days: historyDays,
+      activities_days: activitiesDays,
+      activities_limit: activitiesLimit,
+    });
+    if (sections) params.set('sections', sections.join(','));
+    return request(`/athletes/${athleteId}/dashboard?${params}`);
+  },
+
   // Datos para las cajas de arriba (Latest)
   getLatestMetrics: async (athleteId) => {
     return request(`/athletes/${athleteId}/daily-metrics/latest`);
   },
 
-  // Datos para el gráfico (Historial de los últimos 7 días)
-  getMetricsHistory: async (athleteId) => {
+  // Datos para el gráfico: por defecto los últimos 7 días. Para rangos largos,
+  // resolution 'week' | 'month' agrega en el servidor (tss suma, ctl/atl del último día)
+  getMetricsHistory: async (athleteId, fromDay = null, toDay = null, resolution = 'day') => {
     const today = new Date();
     const sevenDaysAgo = new Date();
     sevenDaysAgo.setDate(today.getDate() - 7);
 
-    const fromDay = formatDate(sevenDaysAgo);
-    const toDay = formatDate(today);
-
-    return request(`/athletes/${athleteId}/daily-metrics/?from_day=${fromDay}&to_day=${toDay}`);
+    const params = new URLSearchParams({
+      from_day: fromDay || formatDate(sevenDaysAgo),
+      to_day: toDay || formatDate(today),
+      resolution,
+    });
+    const data = await request(`/athletes/${athleteId}/daily-metrics?${params}`);
+    return data.metrics || [];
   },
 
   // Datos para la tabla de actividades
@@ -151,19 +187,29 @@ export const athleteService = {
     return data.activities; 
   },
 
+  // Historial paginado por cursor: devuelve { activities, next_cursor } (null = última página)
+  getActivitiesPage: async (athleteId, limit = 50, cursor = null) => {
+    const params = new URLSearchParams({ limit });
+    if (cursor) params.set('cursor', cursor);
+    return request(`/athletes/${athleteId}/activities?${params}`);
+  },
+
+  // Import y rebuild se encolan (202 + job): esperamos a que el worker los termine
   importActivities: async (athleteId) => {
-    return request(`/strava/${athleteId}/import-activities`, { method: 'POST' });
+    const job = await request(`/strava/${athleteId}/import-activities`, { method: 'POST' });
+    return waitForJob(job.id);
   },
 
   rebuildMetrics: async (athleteId) => {
-    const today = formatDate(new Date());
-    const lastWeek = new Date();
-    lastWeek.setDate(lastWeek.getDate() - 7);
-    const fromDay = formatDate(lastWeek);
-
-    return request(`/metrics/${athleteId}/rebuild?from_day=${fromDay}&to_day=${today}&force=true`, { 
+    // Solo recalcula desde el primer día que ha cambiado desde el último rebuild
+    const job = await request(`/metrics/${athleteId}/rebuild?incremental=true`, { 
       method: 'POST' 
     });
+    return waitForJob(job.id);
+  },
+
+  getJob: async (jobId) => {
+    return request(`/jobs/${jobId}`);
   },
 
   getHistory: async (athleteId) => {